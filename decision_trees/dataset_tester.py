@@ -3,13 +3,13 @@ import time
 import numpy as np
 from sklearn import metrics
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.tree import DecisionTreeClassifier
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
 
 from decision_trees.utils.constants import ClassifierType
 from decision_trees.vhdl_generators.tree import Tree
 from decision_trees.vhdl_generators.random_forest import RandomForest
 from decision_trees.utils.convert_to_fixed_point import quantize_data
-from decision_trees.utils.constants import get_classifier
+from decision_trees.utils.constants import get_classifier, is_regressor
 
 
 def test_dataset(number_of_bits_per_feature: int,
@@ -43,22 +43,30 @@ def test_dataset(number_of_bits_per_feature: int,
     print("own clf with train and test data quantized:")
     report_performance(my_clf, clf_type, test_target, my_clf_test_predicted_quantized)
 
-    differences_scikit_my = np.sum(test_predicted_quantized != my_clf_test_predicted_quantized)
+    if is_regressor(clf_type):
+        # values of the leaves of the own regressor are stored as float32
+        differences_scikit_my = np.sum(~np.isclose(test_predicted_quantized, my_clf_test_predicted_quantized,
+                                                   rtol=1e-5))
+    else:
+        differences_scikit_my = np.sum(test_predicted_quantized != my_clf_test_predicted_quantized)
     print(f"Number of differences between scikit_qunatized and my_quantized: {differences_scikit_my}")
 
     # check if own classifier works the same as scikit one
-    _compare_with_own_classifier(
-        [test_predicted, test_predicted_quantized, my_clf_test_predicted_quantized],
-        ["scikit", "scikit_quantized", "own_clf_quantized"],
-        test_target, flag_save_details_to_file=True, path="./../../data/"
-    )
+    # (not for the regressors - their predictions are almost never equal to the target, the differences between
+    # scikit and own regressor are counted above and the errors are reported by report_performance)
+    if not is_regressor(clf_type):
+        _compare_with_own_classifier(
+            [test_predicted, test_predicted_quantized, my_clf_test_predicted_quantized],
+            ["scikit", "scikit_quantized", "own_clf_quantized"],
+            test_target, flag_save_details_to_file=True, path="./../../data/"
+        )
 
     # optionally check the performance of the scikit classifier for reference (does not work for own classifier)
     _test_classification_performance(clf, test_data, 10, 10)
 
 
 def report_performance(clf, clf_type: ClassifierType, expected: np.ndarray, predicted: np.ndarray):
-    if clf_type == ClassifierType.RANDOM_FOREST_REGRESSOR:
+    if is_regressor(clf_type):
         _report_regressor(expected, predicted)
     else:
         _report_classifier(clf, expected, predicted)
@@ -105,6 +113,12 @@ def generate_my_classifier(clf, number_of_features, number_of_bits_per_feature:
     elif isinstance(clf, RandomForestClassifier):
         print("Creating random forest classifier!")
         my_clf = RandomForest("RandomForestClassifier", number_of_features, number_of_bits_per_feature)
+    elif isinstance(clf, DecisionTreeRegressor):
+        print("Creating decision tree regressor!")
+        my_clf = Tree("DecisionTreeRegressor", number_of_features, number_of_bits_per_feature)
+    elif isinstance(clf, RandomForestRegressor):
+        print("Creating random forest regressor!")
+        my_clf = RandomForest("RandomForestRegressor", number_of_features, number_of_bits_per_feature)
     else:
         print("Unknown type of classifier!")
         raise ValueError("Unknown type of classifier!")
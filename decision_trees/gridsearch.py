@@ -13,7 +13,7 @@ from decision_trees.own_parfit.parfit import bestFit
 
 from decision_trees.utils.constants import ClassifierType
 from decision_trees.utils.constants import GridSearchType
-from decision_trees.utils.constants import get_classifier, get_tuned_parameters
+from decision_trees.utils.constants import get_classifier, get_tuned_parameters, is_regressor
 from decision_trees.utils.convert_to_fixed_point import quantize_data
 
 
@@ -73,7 +73,7 @@ def _scikit_gridsearch(
         clf_type: ClassifierType
 ):
     # perform grid search to find best parameters
-    scores = ['neg_mean_squared_error'] if clf_type == ClassifierType.RANDOM_FOREST_REGRESSOR else ['f1_weighted']
+    scores = ['neg_mean_squared_error'] if is_regressor(clf_type) else ['f1_weighted']
     # alternatives: http://scikit-learn.org/stable/modules/model_evaluation.html#common-cases-predefined-values
 
     tuned_parameters = get_tuned_parameters(clf_type)
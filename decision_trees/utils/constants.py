@@ -2,13 +2,18 @@ from typing import Dict
 from enum import Enum, auto
 
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.tree import DecisionTreeClassifier
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
 
 
 class ClassifierType(Enum):
     DECISION_TREE = auto()
     RANDOM_FOREST = auto()
     RANDOM_FOREST_REGRESSOR = auto()
+    DECISION_TREE_REGRESSOR = auto()
+
+
+def is_regressor(clf_type: ClassifierType) -> bool:
+    return clf_type in (ClassifierType.DECISION_TREE_REGRESSOR, ClassifierType.RANDOM_FOREST_REGRESSOR)
 
 
 class GridSearchType(Enum):
@@ -24,6 +29,8 @@ def get_classifier(clf_type: ClassifierType):
         clf = RandomForestClassifier(n_estimators=100, max_depth=None, n_jobs=3, random_state=42)
     elif clf_type == ClassifierType.RANDOM_FOREST_REGRESSOR:
         clf = RandomForestRegressor(n_estimators=100, max_depth=None, n_jobs=3, random_state=42)
+    elif clf_type == ClassifierType.DECISION_TREE_REGRESSOR:
+        clf = DecisionTreeRegressor(max_depth=None, splitter="random", random_state=42)
     else:
         raise ValueError("Unknown classifier type specified")
 
@@ -7,8 +7,93 @@ def convert_to_fixed_point(float_value: float, n_bits: int) -> float:
     return np.round(float_value * f) * (1.0 / f)
 
 
+# integer representation of the fixed point values - the value is equal to code / 2^n_bits
+# values are expected to be normalised to the [0, 1] range, so the codes are in the [0, 2^n_bits] range
+def get_code_dtype(n_bits: int) -> np.dtype:
+    # smallest unsigned type that can hold 2^n_bits (the code of 1.0)
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if (1 << n_bits) <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+
+    return np.dtype(np.uint64)
+
+
+def get_max_code(n_bits: int) -> int:
+    # highest code of the features of the hardware (unsigned numbers of n_bits bits) - the comparisions with
+    # the thresholds not lower than it are always true and do not need a comparator
+    return (1 << n_bits) - 1
+
+
+def get_threshold_code_dtype(n_bits: int) -> np.dtype:
+    # thresholds could be outside of the [0, 1] range, so signed type is used for them
+    for dtype in (np.int8, np.int16, np.int32):
+        if (1 << n_bits) <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+
+    return np.dtype(np.int64)
+
+
+def convert_to_fixed_point_code(float_value, n_bits: int):
+    return np.round(np.asarray(float_value, dtype=np.float64) * (1 << n_bits)).astype(np.int64)
+
+
+def convert_threshold_to_fixed_point_code(threshold, n_bits: int) -> np.ndarray:
+    # highest code not greater than the threshold - for the quantized values (codes) x <= threshold is the same
+    # as x <= code, while the rounded threshold can be higher than the threshold (e.g. the thresholds of scikit
+    # are in the middle between two quantized values) and change the result of the comparision
+    return np.floor(np.asarray(threshold, dtype=np.float64) * (1 << n_bits)).astype(np.int64)
+
+
+# signed fixed point values with n_bits bits (e.g. the values of the leaves of the regression trees) -
+# the value is equal to code / 2^fraction_bits, the number of the fraction bits is chosen for the range of the values
+def get_fraction_bits(max_abs_value: float, n_bits: int) -> int:
+    # highest number of the fraction bits for which the code of max_abs_value still fits in n_bits
+    # (can be negative for the values that do not fit in n_bits even without the fraction)
+    max_code = (1 << (n_bits - 1)) - 1
+    if max_abs_value <= 0:
+        return n_bits - 1
+
+    fraction_bits = int(np.floor(np.log2(max_code / max_abs_value)))
+    while np.round(max_abs_value * 2.0 ** fraction_bits) > max_code:
+        fraction_bits -= 1
+
+    return fraction_bits
+
+
+def convert_to_signed_fixed_point_code(float_value, fraction_bits: int, n_bits: int) -> np.ndarray:
+    # values outside of the range are saturated
+    max_code = (1 << (n_bits - 1)) - 1
+    codes = np.round(np.asarray(float_value, dtype=np.float64) * 2.0 ** fraction_bits)
+
+    return np.clip(codes, -max_code, max_code).astype(np.int64)
+
+
+def _limit_to_range(data: np.ndarray, number_of_bits: int, flag_saturate: bool) -> np.ndarray:
+    # out of range policy of quantize_data and quantize_data_to_codes - the data outside of the [0, 1] range is
+    # not accepted, unless flag_saturate is set, then the values are saturated to the range of the features
+    # of the hardware, [0, get_max_code / 2^number_of_bits] (so 1.0 is saturated to the highest code),
+    # the classifiers converted to vhdl should be trained on the data saturated in the same way
+    data = np.asarray(data)
+    if flag_saturate:
+        return np.clip(data, 0.0, get_max_code(number_of_bits) / float(1 << number_of_bits))
+
+    if np.any(data < 0) or np.any(data > 1):
+        raise ValueError("Data has to be normalised to [0, 1] range before quantization")
+
+    return data
+
+
+def quantize_data_to_codes(data: np.ndarray, number_of_bits: int, flag_saturate: bool = False) -> np.ndarray:
+    # same quantization as in quantize_data, but the data is kept as integer codes (4-8 times less memory)
+    data = _limit_to_range(data, number_of_bits, flag_saturate)
+
+    return convert_to_fixed_point_code(data, number_of_bits).astype(get_code_dtype(number_of_bits))
+
+
 def quantize_data(train_data: np.ndarray, test_data: np.ndarray, number_of_bits: int,
-                  flag_save_details_to_file: bool = False, path: str = "./"):
+                  flag_save_details_to_file: bool = False, path: str = "./", flag_saturate: bool = False):
+    train_data = _limit_to_range(train_data, number_of_bits, flag_saturate)
+    test_data = _limit_to_range(test_data, number_of_bits, flag_saturate)
     train_data_quantized = np.array([convert_to_fixed_point(x, number_of_bits) for x in train_data])
     test_data_quantized = np.array([convert_to_fixed_point(x, number_of_bits) for x in test_data])
 
@@ -27,6 +112,26 @@ def test_convert_to_fixed_point():
     assert convert_to_fixed_point(1 / 3, 3) == 0.375
 
 
+def test_convert_to_fixed_point_code():
+    assert convert_to_fixed_point_code(1 / 3, 2) == 1
+    assert convert_to_fixed_point_code(1 / 3, 3) == 3
+    assert quantize_data_to_codes(np.array([0.0, 1.0]), 8).dtype == np.uint16
+    assert quantize_data_to_codes(np.array([-0.5, 1.0]), 8, flag_saturate=True).tolist() == [0, 255]
+    assert quantize_data(np.array([[1.0]]), np.array([[0.5]]), 2, flag_saturate=True)[0].tolist() == [[0.75]]
+
+
+def test_convert_threshold_to_fixed_point_code():
+    assert convert_threshold_to_fixed_point_code(35.5 / 64, 6) == 35
+    assert convert_threshold_to_fixed_point_code(36 / 64, 6) == 36
+    assert convert_threshold_to_fixed_point_code(-0.5 / 64, 6) == -1
+
+
+def test_convert_to_signed_fixed_point_code():
+    assert get_fraction_bits(1.0, 8) == 6
+    assert get_fraction_bits(300.0, 8) == -2
+    assert convert_to_signed_fixed_point_code([-0.5, 0.25, 5.0], 6, 8).tolist() == [-32, 16, 127]
+
+
 if __name__ == "__main__":
     value = 13 / 16
     print(value)
@@ -1,18 +1,43 @@
 import abc
+import contextlib
+
+import numpy as np
+
+from decision_trees.utils.convert_to_fixed_point import quantize_data_to_codes, get_max_code
+from decision_trees.vhdl_generators import vhdl_writer
+
+# suffixes of the files used by the testbench (one line of '0' / '1' characters per clock cycle)
+STIMULUS_FILE_SUFFIX = "_stimulus.txt"
+EXPECTED_FILE_SUFFIX = "_expected.txt"
+# number of lines converted to text at once
+LINES_BLOCK_SIZE = 65536
 
 
 class VHDLCreator:
     __metaclass__ = abc.ABCMeta
 
     def __init__(self, filename: str, entity_name: str, number_of_features: int, number_of_bits_per_feature: int):
-        self.current_indent = 0
-
-        self.filename = filename
+        # VHDLWriter of the file that is currently generated
+        self._writer = None
 
         self.FILE_EXTENSION = ".vhd"
         self.TESTBENCH_PREFIX = "tb_"
         self.CUSTOM_TYPES_POSTFIX = "_types"
 
+        self.set_names(filename, entity_name)
+
+        self._number_of_bits_per_feature = number_of_bits_per_feature
+        self._number_of_features = number_of_features
+
+        # features available on the input bus of the generated vhdl, if None - only the features compared
+        # by the classifier (used_features) are used
+        self.input_features = None
+        # number of samples classified in parallel (see number_of_lanes)
+        self._number_of_lanes = 1
+
+    def set_names(self, filename: str, entity_name: str):
+        self.filename = filename
+
         self._param_entity_name = entity_name
         self._param_testbench_entity_name = self.TESTBENCH_PREFIX + entity_name
 
@@ -21,129 +46,535 @@ class VHDLCreator:
         self._filename_testbench = self.TESTBENCH_PREFIX + self.filename + self.FILE_EXTENSION
         self._custom_type_name = self.filename + "_t"
 
-        # TODO - maybe this part can be found automatically
-        self._number_of_bits_for_class_index = 32
-        self._number_of_bits_per_feature = number_of_bits_per_feature
-        self._number_of_features = number_of_features
-
-    def _insert_text_line_with_indent(self, text_to_insert) -> str:
-        text = ""
-        # apply current indent
-        text += "\t" * self.current_indent
-        text += text_to_insert
-        text += "\n"
-        return text
-
-    def _add_headers(self) -> str:
-        text = ""
-        text += self._insert_text_line_with_indent("library IEEE;")
-        text += self._insert_text_line_with_indent("use IEEE.STD_LOGIC_1164.ALL;")
-        text += self._insert_text_line_with_indent("use IEEE.NUMERIC_STD.ALL;")
-        text += self._insert_text_line_with_indent("")
-
-        text += self._add_additional_headers()
-        text += self._insert_text_line_with_indent("")
-
-        return text
+    @property
+    def number_of_lanes(self) -> int:
+        # with more than 1 lane the datapath of the classifier is replicated in a generate loop, the constants
+        # of the architecture (e.g. the ROM of RomTree) are declared once and shared by all the lanes;
+        # input and output ports are widened - lane k uses the k-th part of the input and of the output
+        return self._number_of_lanes
+
+    @number_of_lanes.setter
+    def number_of_lanes(self, number_of_lanes: int):
+        if number_of_lanes < 1:
+            raise ValueError("Number of lanes has to be at least 1!")
+        self._number_of_lanes = number_of_lanes
+
+    @property
+    def _lane_input_width(self) -> int:
+        return len(self.used_features) * self._number_of_bits_per_feature
+
+    @property
+    def _input_name(self) -> str:
+        # signal with the input of one lane, used by the architecture of the classifier
+        return "input" if self.number_of_lanes == 1 else "laneInput"
+
+    @property
+    def _output_name(self) -> str:
+        return "output" if self.number_of_lanes == 1 else "laneOutput"
+
+    @property
+    def _number_of_bits_for_class_index(self) -> int:
+        # enough bits for the index of the last class
+        return max((self.number_of_classes - 1).bit_length(), 1)
+
+    @property
+    def _number_of_bits_for_output(self) -> int:
+        # width of the output of one lane - the class index, or the value of the regression
+        return self._number_of_bits_for_class_index
+
+    @property
+    @abc.abstractmethod
+    def number_of_classes(self) -> int:
+        return
 
     @abc.abstractmethod
-    def _add_additional_headers(self) -> str:
+    def _find_used_features(self) -> np.ndarray:
         return
 
-    def _add_entity(self) -> str:
-        text = ""
+    @property
+    @abc.abstractmethod
+    def latency(self) -> int:
+        # number of clock cycles from the input to the output of the generated vhdl
+        return
 
-        text += self._insert_text_line_with_indent("entity " + self._param_entity_name + " is")
-        text += self._add_entity_generics_section()
-        text += self._add_entity_port_section()
-        text += self._insert_text_line_with_indent("end " + self._param_entity_name + ";")
-        text += self._insert_text_line_with_indent("")
+    @abc.abstractmethod
+    def predict(self, input_data: np.ndarray) -> np.ndarray:
+        return
 
-        return text
+    def predict_output_codes(self, input_data: np.ndarray) -> np.ndarray:
+        # values on the output of the generated vhdl - the classes, or the fixed point codes of the regression
+        return self.predict(input_data)
+
+    @staticmethod
+    def _features_with_comparators(features: np.ndarray, values_codes: np.ndarray,
+                                   number_of_bits_per_feature: int) -> np.ndarray:
+        # splits with the thresholds outside of the range of the features do not use the feature
+        # (see _add_process_compare)
+        values_codes = np.asarray(values_codes)
+        flag_comparator = (values_codes >= 0) & (values_codes < get_max_code(number_of_bits_per_feature))
+        return np.unique(np.asarray(features)[flag_comparator]).astype(np.intp)
+
+    @property
+    def used_features(self) -> np.ndarray:
+        # indices of the original features, in the order in which they are placed on the input bus
+        # (feature used_features[k] occupies bits from k*number_of_bits_per_feature)
+        if self.input_features is not None:
+            return np.asarray(self.input_features, dtype=np.intp)
+        return self._find_used_features()
+
+    def select_input_features(self, input_data: np.ndarray) -> np.ndarray:
+        # keeps only the features sent to the generated hardware, in the order of the input bus
+        return np.asarray(input_data)[:, self.used_features]
+
+    def _feature_positions(self) -> np.ndarray:
+        # position of each of the original features on the input bus, -1 for the features that are not used
+        # all the features of the comparators have to be on the bus (input_features can not leave out any of them)
+        positions = np.full(self._number_of_features, -1, dtype=np.intp)
+        used_features = self.used_features
+        positions[used_features] = np.arange(len(used_features))
+        if self.input_features is not None:
+            missing_features = np.setdiff1d(self._find_used_features(), used_features)
+            if len(missing_features) > 0:
+                raise ValueError(f"Features {missing_features.tolist()} used by the comparators are not "
+                                 f"in input_features!")
+        return positions
+
+    def _insert_text_line_with_indent(self, text_to_insert: str = ""):
+        # lines are written directly to the file, with the current indentation of the writer
+        self._writer.line(text_to_insert)
+
+    def _add_headers(self):
+        self._insert_text_line_with_indent("library IEEE;")
+        self._insert_text_line_with_indent("use IEEE.STD_LOGIC_1164.ALL;")
+        self._insert_text_line_with_indent("use IEEE.NUMERIC_STD.ALL;")
+        self._insert_text_line_with_indent("")
+
+        self._add_additional_headers()
+        self._insert_text_line_with_indent("")
 
     @abc.abstractmethod
-    def _add_entity_generics_section(self) -> str:
+    def _add_additional_headers(self):
         return
 
-    def _add_entity_port_section(self) -> str:
-        text = ""
-
-        self.current_indent += 1
+    def _add_entity(self):
+        self._insert_text_line_with_indent("entity " + self._param_entity_name + " is")
+        self._add_entity_generics_section()
+        self._add_entity_port_section()
+        self._insert_text_line_with_indent("end " + self._param_entity_name + ";")
+        self._insert_text_line_with_indent("")
 
-        text += self._insert_text_line_with_indent("port (")
+    @abc.abstractmethod
+    def _add_entity_generics_section(self):
+        return
 
-        # insert all the ports
-        self.current_indent += 1
+    def _add_entity_port_section(self):
+        with self._writer.indent():
+            self._insert_text_line_with_indent("port (")
 
-        text += self._insert_text_line_with_indent("clk" + "\t\t\t\t" + ":" + "\t" + "in std_logic;")
-        text += self._insert_text_line_with_indent("rst" + "\t\t\t\t" + ":" + "\t" + "in std_logic;")
-        text += self._insert_text_line_with_indent("en" + "\t\t\t\t" + ":" + "\t" + "in std_logic;")
+            # insert all the ports
+            with self._writer.indent():
+                self._insert_text_line_with_indent("clk" + "\t\t\t\t" + ":" + "\t" + "in std_logic;")
+                self._insert_text_line_with_indent("rst" + "\t\t\t\t" + ":" + "\t" + "in std_logic;")
+                self._insert_text_line_with_indent("en" + "\t\t\t\t" + ":" + "\t" + "in std_logic;")
 
-        # input aggregated to one long std_logic_vector
-        text += self._insert_text_line_with_indent("input" + "\t\t\t" + ":" + "\t" + "in std_logic_vector("
-                                                   + str(self._number_of_features*self._number_of_bits_per_feature)
+                # input aggregated to one long std_logic_vector
+                self._insert_text_line_with_indent("input" + "\t\t\t" + ":" + "\t" + "in std_logic_vector("
+                                                   + str(self.number_of_lanes * self._lane_input_width)
                                                    + "-1 downto 0);")
 
-        text += self._insert_text_line_with_indent("output" + "\t\t\t" + ":" + "\t" + "out std_logic_vector("
-                                                   + str(self._number_of_bits_for_class_index)
+                self._insert_text_line_with_indent("output" + "\t\t\t" + ":" + "\t" + "out std_logic_vector("
+                                                   + str(self.number_of_lanes * self._number_of_bits_for_output)
                                                    + "-1 downto 0)")
 
-        self.current_indent -= 1
-
-        text += self._insert_text_line_with_indent(");")
-
-        self.current_indent -= 1
-
-        return text
-
-    def _add_architecture(self) -> str:
-        text = ""
-
-        text += self._insert_text_line_with_indent("architecture Behavioral of " + self._param_entity_name + " is")
-        text += self._insert_text_line_with_indent("")
-
-        self.current_indent += 1
-
-        text += self._add_architecture_component_section()
-
-        text += self._add_architecture_signal_section()
-
-        self.current_indent -= 1
-
-        text += self._insert_text_line_with_indent("begin")
-        text += self._insert_text_line_with_indent("")
-
-        self.current_indent += 1
-
-        text += self._add_architecture_process_section()
-
-        self.current_indent -= 1
-
-        text += self._insert_text_line_with_indent("end Behavioral;")
-
-        return text
+            self._insert_text_line_with_indent(");")
+
+    def _add_architecture(self):
+        self._insert_text_line_with_indent("architecture Behavioral of " + self._param_entity_name + " is")
+        self._insert_text_line_with_indent("")
+
+        with self._writer.indent():
+            self._add_architecture_component_section()
+            self._add_architecture_constant_section()
+            if self.number_of_lanes == 1:
+                self._add_architecture_signal_section()
+
+        self._insert_text_line_with_indent("begin")
+        self._insert_text_line_with_indent("")
+
+        with self._writer.indent():
+            if self.number_of_lanes == 1:
+                self._add_architecture_process_section()
+            else:
+                self._add_architecture_lanes()
+
+        self._insert_text_line_with_indent("end Behavioral;")
+
+    def _add_architecture_lanes(self):
+        # the signals and processes of the classifier are declared inside of the generate loop, so each lane
+        # has its own copy of them
+        input_width = self._lane_input_width
+        output_width = self._number_of_bits_for_output
+
+        self._insert_text_line_with_indent(f"-- {self.number_of_lanes} lanes, each of them classifies one sample")
+        self._insert_text_line_with_indent(f"lanes : for lane in 0 to {self.number_of_lanes}-1 generate")
+        with self._writer.indent():
+            self._insert_text_line_with_indent(f"signal laneInput\t:\tstd_logic_vector({input_width}-1 downto 0);")
+            self._insert_text_line_with_indent(f"signal laneOutput\t:\tstd_logic_vector({output_width}-1 downto 0);")
+            self._insert_text_line_with_indent("")
+            self._add_architecture_signal_section()
+        self._insert_text_line_with_indent("begin")
+        self._insert_text_line_with_indent("")
+        with self._writer.indent():
+            self._insert_text_line_with_indent(f"laneInput <= input((lane+1)*{input_width}-1 downto "
+                                               f"lane*{input_width});")
+            self._insert_text_line_with_indent(f"output((lane+1)*{output_width}-1 downto lane*{output_width}) <= "
+                                               "laneOutput;")
+            self._insert_text_line_with_indent("")
+            self._add_architecture_process_section()
+        self._insert_text_line_with_indent("end generate lanes;")
+        self._insert_text_line_with_indent("")
 
     @abc.abstractmethod
-    def _add_architecture_component_section(self) -> str:
+    def _add_architecture_component_section(self):
         return
 
-    @abc.abstractmethod
-    def _add_architecture_signal_section(self) -> str:
+    def _add_architecture_constant_section(self):
+        # constants shared by all the lanes
         return
 
     @abc.abstractmethod
-    def _add_architecture_process_section(self) -> str:
+    def _add_architecture_signal_section(self):
         return
 
-    def create_vhdl_file(self, path: str) -> str:
-        # open file for writing
-        file_to_write = open(path + "/" + self._filename, "w")
-        # add necessary headers
-        text = ""
-        text += self._add_headers()
-        text += self._add_entity()
-        text += self._add_architecture()
-
-        file_to_write.write(text)
+    @abc.abstractmethod
+    def _add_architecture_process_section(self):
+        return
 
-        file_to_write.close()
+    # elements common for the Tree and the RandomForest with the shared comparators
+
+    def _add_features_signal(self):
+        self._insert_text_line_with_indent("type " + "features_t" + "\t" + "is array("
+                                           + str(len(self.used_features)) + "-1 downto 0)"
+                                           + " of std_logic_vector(" + str(self._number_of_bits_per_feature)
+                                           + "-1 downto 0);")
+
+        self._insert_text_line_with_indent("signal " + "features" + "\t\t:\t" + "features_t"
+                                           + "\t\t\t" + ":= (others=>(others=>'0'));")
+
+    def _add_split_result_signal(self, number_of_split_results: int):
+        self._insert_text_line_with_indent("signal " + "splitResult" + "\t:\t" + "std_logic_vector("
+                                           + str(number_of_split_results) + "-1 downto 0)"
+                                           + "\t\t\t" + ":= (others=>'0');")
+
+    def _add_architecture_input_mapping(self, type_conversion: str = None):
+        # only the used features are on the input bus, the comment holds the index of the original feature
+        # type_conversion - name of the type of the elements of features, if it is not std_logic_vector
+        for i, feature in enumerate(self.used_features):
+            value = (self._input_name + "(" + str(self._number_of_bits_per_feature*(i+1)-1) + " downto "
+                     + str(self._number_of_bits_per_feature*i) + ")")
+            if type_conversion is not None:
+                value = type_conversion + "(" + value + ")"
+            self._insert_text_line_with_indent("features(" + str(i) + ") <= " + value + ";"
+                                               + "\t-- feature " + str(feature))
+
+    def _add_process_compare(self, features_indices: [int], values_codes: [int]):
+        # create the code for all the compares, i-th comparision sets splitResult(i)
+        feature_positions = self._feature_positions()
+
+        with self._clocked_process("compare"):
+            for i, (var_idx, value_code) in enumerate(zip(features_indices, values_codes)):
+                # features are unsigned numbers of number_of_bits_per_feature bits, so comparisions with
+                # the thresholds outside of this range always give the same result and no comparator is needed
+                if value_code >= get_max_code(self._number_of_bits_per_feature):
+                    self._insert_text_line_with_indent("splitResult(" + str(i) + ") <= '0';")
+                    continue
+                if value_code < 0:
+                    self._insert_text_line_with_indent("splitResult(" + str(i) + ") <= '1';")
+                    continue
+
+                self._insert_text_line_with_indent(
+                    "if unsigned(features(" +
+                    str(feature_positions[var_idx]) + ")) <= to_unsigned(" +
+                    str(value_code) +
+                    ", features(" + str(feature_positions[var_idx]) + ")'length) then")
+
+                # same convention as in the leaves paths: '0' when the value is not greater than the threshold
+                with self._writer.indent():
+                    self._insert_text_line_with_indent("splitResult(" + str(i) + ") <= '0';")
+                self._insert_text_line_with_indent("else")
+                with self._writer.indent():
+                    self._insert_text_line_with_indent("splitResult(" + str(i) + ") <= '1';")
+                self._insert_text_line_with_indent("end if;")
+        self._insert_text_line_with_indent("")
+
+    def _add_process_decide_class(self, leaf_store, split_results_indices, class_index_name: str,
+                                  process_name: str, leaves_values: [str] = None):
+        # create the code for all the leaves of one tree
+        # split_results_indices - index of the splitResult bit used by each split of the tree
+        # leaves_values - optional value assigned by each leaf instead of its class (None for the leaves
+        # that assign the class)
+        with self._clocked_process(process_name, flag_empty_reset_branch=True):
+            for leaf_id in range(leaf_store.number_of_leaves):
+                split_ids, directions = leaf_store.path(leaf_id)
+                if leaves_values is not None and leaves_values[leaf_id] is not None:
+                    value = leaves_values[leaf_id]
+                else:
+                    # class of the leaf (the most important class)
+                    value = "to_unsigned(" + str(leaf_store.classes[leaf_id]) + ", " + class_index_name + "'length)"
+
+                if len(split_ids) == 0:
+                    # leaf without any conditions (tree with only one leaf)
+                    self._insert_text_line_with_indent(class_index_name + " <= " + value + ";")
+                    continue
+
+                self._insert_text_line_with_indent("if ( ")
+                with self._writer.indent():
+                    for j, (split_id, split_compare_value) in enumerate(zip(split_ids, directions)):
+
+                        self._insert_text_line_with_indent(
+                            "splitResult(" + str(split_results_indices[split_id]) + ") = '"
+                            + str(split_compare_value) + "'")
+
+                        if j != len(split_ids) - 1:
+                            self._insert_text_line_with_indent("and")
+                        else:
+                            self._insert_text_line_with_indent(" ) then")
+
+                            with self._writer.indent():
+                                self._insert_text_line_with_indent(class_index_name + " <= " + value + ";")
+                            self._insert_text_line_with_indent("end if;")
+
+    @contextlib.contextmanager
+    def _clocked_process(self, process_name: str, flag_empty_reset_branch: bool = False):
+        # the body of the process is written inside the with block, it is executed when en='1'
+        self._insert_text_line_with_indent(process_name + " : process(clk)")
+        self._insert_text_line_with_indent("begin")
+        with self._writer.indent():
+            self._insert_text_line_with_indent("if clk='1' and clk'event then")
+            with self._writer.indent():
+                self._insert_text_line_with_indent("if rst='1' then")
+                if flag_empty_reset_branch:
+                    self._insert_text_line_with_indent("")
+                self._insert_text_line_with_indent("elsif en='1' then")
+                with self._writer.indent():
+                    yield
+                self._insert_text_line_with_indent("end if;")
+            self._insert_text_line_with_indent("end if;")
+        self._insert_text_line_with_indent("end process " + process_name + ";")
+
+    def hardware_input_codes(self, input_data: np.ndarray) -> np.ndarray:
+        # values of the features as seen by the hardware - unsigned integers of number_of_bits_per_feature bits
+        # data normalised to the [0, 1] range is quantized with quantize_data_to_codes and saturated to the range
+        # of the features (1.0 is sent as the highest code, so the classifier should be trained on the data
+        # quantized with flag_saturate), the integer codes that do not fit in the features are not accepted
+        input_data = np.asarray(input_data)
+        if not np.issubdtype(input_data.dtype, np.integer):
+            return quantize_data_to_codes(input_data, self._number_of_bits_per_feature, flag_saturate=True)
+
+        if np.any(input_data < 0) or np.any(input_data > get_max_code(self._number_of_bits_per_feature)):
+            raise ValueError("Codes of the features have to be in the range of number_of_bits_per_feature bits!")
+        return input_data
+
+    def create_stimulus_files(self, input_data: np.ndarray, path: str, expected: np.ndarray = None):
+        # files read by the testbench - the input bus and the expected output for each of the samples,
+        # if the expected outputs are not provided, they are calculated with predict_output_codes from input_data,
+        # not from the codes sent to the hardware, so the testbench detects the samples quantized differently
+        # (the negative codes of the regression are written in two's complement)
+        # with more lanes each line holds number_of_lanes consecutive samples (the last sample is repeated
+        # to fill the last line)
+        if expected is None:
+            expected = self.predict_output_codes(input_data)
+        input_codes = self.hardware_input_codes(input_data)
+
+        input_codes = self.select_input_features(input_codes)
+        expected = np.asarray(expected, dtype=np.int64).reshape(-1, 1) & ((1 << self._number_of_bits_for_output) - 1)
+        number_of_lanes = self.number_of_lanes
+        if number_of_lanes > 1 and len(input_codes) > 0:
+            number_of_lines = -(-len(input_codes) // number_of_lanes)
+            samples = np.minimum(np.arange(number_of_lines * number_of_lanes), len(input_codes) - 1)
+            input_codes = input_codes[samples].reshape(number_of_lines, -1)
+            expected = expected[samples].reshape(number_of_lines, -1)
+
+        self._write_binary_lines(path + "/" + self.filename + STIMULUS_FILE_SUFFIX,
+                                 input_codes, self._number_of_bits_per_feature)
+        self._write_binary_lines(path + "/" + self.filename + EXPECTED_FILE_SUFFIX,
+                                 expected, self._number_of_bits_for_output)
+
+    @staticmethod
+    def _write_binary_lines(file_path: str, values: np.ndarray, number_of_bits: int):
+        # each row is written as a binary number, with the last column as the most significant part
+        # (the same order as in the input bus, where feature k occupies bits from k*number_of_bits)
+        shifts = np.arange(number_of_bits - 1, -1, -1, dtype=np.uint64)
+
+        with open(file_path, "wb") as file_to_write:
+            for start in range(0, len(values), LINES_BLOCK_SIZE):
+                block = np.asarray(values[start:start + LINES_BLOCK_SIZE], dtype=np.uint64)[:, ::-1]
+                bits = ((block[:, :, None] >> shifts) & np.uint64(1)).astype(np.uint8).reshape(len(block), -1)
+
+                lines = np.empty((len(block), bits.shape[1] + 1), dtype=np.uint8)
+                lines[:, :-1] = bits + ord("0")
+                lines[:, -1] = ord("\n")
+                file_to_write.write(lines.tobytes())
+
+    def create_testbench_file(self, path: str, clock_period_ns: int = 10):
+        # self-checking testbench - one sample is sent in every clock cycle (every initiation_interval clock cycles)
+        # and the output is compared with the expected value after the latency of the classifier
+        with vhdl_writer.open_vhdl_file(path + "/" + self._filename_testbench) as self._writer:
+            self._add_headers()
+            self._insert_text_line_with_indent("use IEEE.STD_LOGIC_TEXTIO.ALL;")
+            self._insert_text_line_with_indent("use STD.TEXTIO.ALL;")
+            self._insert_text_line_with_indent("")
+
+            self._insert_text_line_with_indent("entity " + self._param_testbench_entity_name + " is")
+            self._insert_text_line_with_indent("end " + self._param_testbench_entity_name + ";")
+            self._insert_text_line_with_indent("")
+
+            self._insert_text_line_with_indent("architecture Behavioral of " + self._param_testbench_entity_name
+                                               + " is")
+            self._insert_text_line_with_indent("")
+            with self._writer.indent():
+                self._add_testbench_signals(clock_period_ns)
+
+            self._insert_text_line_with_indent("begin")
+            self._insert_text_line_with_indent("")
+            with self._writer.indent():
+                self._add_testbench_processes()
+
+            self._insert_text_line_with_indent("end Behavioral;")
+        self._writer = None
+
+    def _add_testbench_signals(self, clock_period_ns: int):
+        self._insert_text_line_with_indent("component " + self._param_entity_name)
+        self._add_entity_port_section()
+        self._insert_text_line_with_indent("end component;")
+        self._insert_text_line_with_indent("")
+
+        self._insert_text_line_with_indent("constant " + "CLK_PERIOD" + "\t:\t" + "time"
+                                           + "\t\t\t" + ":= " + str(clock_period_ns) + " ns;")
+        self._insert_text_line_with_indent("constant " + "LATENCY" + "\t\t:\t" + "natural"
+                                           + "\t\t\t" + ":= " + str(self.latency) + ";")
+        if self.initiation_interval > 1:
+            self._insert_text_line_with_indent("constant " + "INITIATION_INTERVAL" + "\t:\t" + "natural"
+                                               + "\t\t\t" + ":= " + str(self.initiation_interval) + ";")
+        self._insert_text_line_with_indent("")
+        for signal_name in ["clk", "rst", "en"]:
+            self._insert_text_line_with_indent("signal " + signal_name + "\t\t\t:\t" + "std_logic"
+                                               + "\t\t\t" + ":= '0';")
+        self._insert_text_line_with_indent("signal " + "input" + "\t\t:\t" + "std_logic_vector("
+                                           + str(self.number_of_lanes * self._lane_input_width)
+                                           + "-1 downto 0)" + "\t\t\t" + ":= (others=>'0');")
+        self._insert_text_line_with_indent("signal " + "output" + "\t\t:\t" + "std_logic_vector("
+                                           + str(self.number_of_lanes * self._number_of_bits_for_output)
+                                           + "-1 downto 0);")
+        self._insert_text_line_with_indent("signal " + "finished" + "\t:\t" + "boolean"
+                                           + "\t\t\t" + ":= false;")
+        self._insert_text_line_with_indent("")
+
+    def _add_testbench_processes(self):
+        self._insert_text_line_with_indent("UUT : " + self._param_entity_name)
+        self._insert_text_line_with_indent("port map (")
+        with self._writer.indent(2):
+            self._insert_text_line_with_indent("clk => clk,")
+            self._insert_text_line_with_indent("rst => rst,")
+            self._insert_text_line_with_indent("en => en,")
+            self._insert_text_line_with_indent("input => input,")
+            self._insert_text_line_with_indent("output => output")
+        with self._writer.indent():
+            self._insert_text_line_with_indent(");")
+        self._insert_text_line_with_indent("")
+
+        self._insert_text_line_with_indent("clock : process")
+        self._insert_text_line_with_indent("begin")
+        with self._writer.indent():
+            self._insert_text_line_with_indent("while not finished loop")
+            with self._writer.indent():
+                self._insert_text_line_with_indent("clk <= '0';")
+                self._insert_text_line_with_indent("wait for CLK_PERIOD / 2;")
+                self._insert_text_line_with_indent("clk <= '1';")
+                self._insert_text_line_with_indent("wait for CLK_PERIOD / 2;")
+            self._insert_text_line_with_indent("end loop;")
+            self._insert_text_line_with_indent("wait;")
+        self._insert_text_line_with_indent("end process clock;")
+        self._insert_text_line_with_indent("")
+
+        # new sample is set at the falling edge, so it is stable at the next rising edge
+        # when the stimulus file ends, the last sample is kept on the input until all the results are checked
+        self._insert_text_line_with_indent("stimulus : process")
+        with self._writer.indent():
+            self._insert_text_line_with_indent("file stimulus_file : text open read_mode is \""
+                                               + self.filename + STIMULUS_FILE_SUFFIX + "\";")
+            self._insert_text_line_with_indent("file expected_file : text open read_mode is \""
+                                               + self.filename + EXPECTED_FILE_SUFFIX + "\";")
+            self._insert_text_line_with_indent("variable stimulus_line, expected_line : line;")
+            self._insert_text_line_with_indent("variable stimulus_value : std_logic_vector(input'range);")
+            self._insert_text_line_with_indent("variable expected_value : std_logic_vector(output'range);")
+            self._insert_text_line_with_indent("variable number_of_cycles : natural := 0;")
+            self._insert_text_line_with_indent("variable number_of_checked : natural := 0;")
+            self._insert_text_line_with_indent("variable number_of_mismatches : natural := 0;")
+        self._insert_text_line_with_indent("begin")
+        with self._writer.indent():
+            self._insert_text_line_with_indent("rst <= '1';")
+            self._insert_text_line_with_indent("wait until falling_edge(clk);")
+            self._insert_text_line_with_indent("rst <= '0';")
+            self._insert_text_line_with_indent("en <= '1';")
+            self._insert_text_line_with_indent("")
+            self._insert_text_line_with_indent("while not endfile(expected_file) loop")
+            with self._writer.indent():
+                if self.initiation_interval > 1:
+                    self._insert_text_line_with_indent("if number_of_cycles mod INITIATION_INTERVAL = 0 "
+                                                       "and not endfile(stimulus_file) then")
+                else:
+                    self._insert_text_line_with_indent("if not endfile(stimulus_file) then")
+                with self._writer.indent():
+                    self._insert_text_line_with_indent("readline(stimulus_file, stimulus_line);")
+                    self._insert_text_line_with_indent("read(stimulus_line, stimulus_value);")
+                    self._insert_text_line_with_indent("input <= stimulus_value;")
+                self._insert_text_line_with_indent("end if;")
+                self._insert_text_line_with_indent("")
+                self._insert_text_line_with_indent("wait until rising_edge(clk);")
+                self._insert_text_line_with_indent("number_of_cycles := number_of_cycles + 1;")
+                self._insert_text_line_with_indent("wait until falling_edge(clk);")
+                self._insert_text_line_with_indent("")
+                # result of the first sample is available after LATENCY rising edges
+                if self.initiation_interval > 1:
+                    self._insert_text_line_with_indent("if number_of_cycles >= LATENCY and (number_of_cycles - "
+                                                       "LATENCY) mod INITIATION_INTERVAL = 0 then")
+                else:
+                    self._insert_text_line_with_indent("if number_of_cycles >= LATENCY then")
+                with self._writer.indent():
+                    self._insert_text_line_with_indent("readline(expected_file, expected_line);")
+                    self._insert_text_line_with_indent("read(expected_line, expected_value);")
+                    self._insert_text_line_with_indent("if output /= expected_value then")
+                    with self._writer.indent():
+                        self._insert_text_line_with_indent("number_of_mismatches := number_of_mismatches + 1;")
+                        if self.number_of_lanes > 1:
+                            # one line of the expected file holds the results of all the lanes
+                            self._insert_text_line_with_indent(
+                                "report \"Mismatch for samples from \" & integer'image(number_of_checked * "
+                                + str(self.number_of_lanes) + ") severity warning;")
+                        else:
+                            self._insert_text_line_with_indent("report \"Mismatch for sample \" & "
+                                                               "integer'image(number_of_checked) severity warning;")
+                    self._insert_text_line_with_indent("end if;")
+                    self._insert_text_line_with_indent("number_of_checked := number_of_checked + 1;")
+                self._insert_text_line_with_indent("end if;")
+            self._insert_text_line_with_indent("end loop;")
+            self._insert_text_line_with_indent("")
+            self._insert_text_line_with_indent("report \"Checked samples: \" & integer'image(number_of_checked)"
+                                               " & \", mismatches: \" & integer'image(number_of_mismatches)"
+                                               " & \", clock cycles: \" & integer'image(number_of_cycles)"
+                                               " severity note;")
+            self._insert_text_line_with_indent("assert number_of_mismatches = 0 report \"Test failed\""
+                                               " severity error;")
+            self._insert_text_line_with_indent("finished <= true;")
+            self._insert_text_line_with_indent("wait;")
+        self._insert_text_line_with_indent("end process stimulus;")
+        self._insert_text_line_with_indent("")
+
+    def create_vhdl_file(self, path: str):
+        # the file is written while it is generated, so the memory used does not depend on its size
+        with vhdl_writer.open_vhdl_file(path + "/" + self._filename) as self._writer:
+            self._add_headers()
+            self._add_entity()
+            self._add_architecture()
+        self._writer = None
@@ -0,0 +1,93 @@
+import numpy as np
+
+from decision_trees.vhdl_generators import comparator_model
+
+# comparisions shared by all the trees of the forest
+# trees trained on the same quantized features repeat the same (feature, threshold) pairs, so every unique pair
+# is evaluated only once (one comparator in hardware, one column of the comparator matrix in software)
+# and the trees index the results with split_results_indices
+
+
+class ComparatorBank:
+
+    def __init__(self, trees: []):
+        all_arrays = [tree.arrays for tree in trees]
+        self.all_arrays = all_arrays
+
+        features = np.concatenate([np.asarray(arrays.feature, dtype=np.int64) for arrays in all_arrays]
+                                  + [np.zeros(0, dtype=np.int64)])
+        thresholds_codes = np.concatenate([np.asarray(arrays.threshold_code, dtype=np.int64)
+                                           for arrays in all_arrays] + [np.zeros(0, dtype=np.int64)])
+        thresholds = np.concatenate([np.asarray(arrays.threshold, dtype=np.float64) for arrays in all_arrays]
+                                    + [np.zeros(0, dtype=np.float64)])
+
+        # comparisions are identified by the feature and the integer threshold (the one used in hardware),
+        # float thresholds are derived from the codes, so they are the same for the same pair
+        unique_comparisions, first_indices, inverse = np.unique(
+            np.stack([features, thresholds_codes], axis=1), axis=0, return_index=True, return_inverse=True
+        )
+        inverse = inverse.reshape(-1)
+
+        self.feature = unique_comparisions[:, 0].astype(np.intp)
+        self.threshold_code = unique_comparisions[:, 1]
+        self.threshold = thresholds[first_indices]
+
+        splits_offsets = np.cumsum([0] + [arrays.number_of_splits for arrays in all_arrays])
+        self.split_results_indices = [inverse[splits_offsets[i]:splits_offsets[i + 1]]
+                                      for i in range(len(all_arrays))]
+
+    @property
+    def number_of_comparators(self) -> int:
+        return len(self.feature)
+
+    @property
+    def sharing_ratio(self) -> float:
+        # number of splits of all the trees per one unique comparision
+        number_of_splits = sum(len(indices) for indices in self.split_results_indices)
+        return number_of_splits / max(self.number_of_comparators, 1)
+
+    def compute_split_results(self, input_data: np.ndarray) -> np.ndarray:
+        # n_samples x n_comparators matrix, same as splitResult of the forest with the shared comparators
+        if np.issubdtype(input_data.dtype, np.integer):
+            thresholds = self.threshold_code
+        else:
+            thresholds = self.threshold
+        return comparator_model.compute_split_results(input_data, self.feature, thresholds)
+
+    def apply(self, input_data: np.ndarray,
+              block_size: int = comparator_model.DEFAULT_BLOCK_SIZE) -> np.ndarray:
+        # returns (number_of_samples x number_of_trees) matrix with the ID of the leaf reached in each tree
+        input_data = np.asarray(input_data)
+        leaves_ids = np.empty((len(input_data), len(self.all_arrays)), dtype=np.intp)
+
+        for start in range(0, len(input_data), block_size):
+            split_results = self.compute_split_results(input_data[start:start + block_size])
+            for tree_index, arrays in enumerate(self.all_arrays):
+                leaves_ids[start:start + block_size, tree_index] = \
+                    self._apply_tree(arrays, self.split_results_indices[tree_index], split_results)
+
+        return leaves_ids
+
+    def predict_trees(self, input_data: np.ndarray) -> np.ndarray:
+        # returns (number_of_samples x number_of_trees) matrix of the classes chosen by each of the trees
+        leaves_ids = self.apply(input_data)
+        trees_results = np.empty_like(leaves_ids)
+        for tree_index, arrays in enumerate(self.all_arrays):
+            trees_results[:, tree_index] = arrays.leaf_class[leaves_ids[:, tree_index]]
+
+        return trees_results
+
+    @staticmethod
+    def _apply_tree(arrays, split_results_indices: np.ndarray, split_results: np.ndarray) -> np.ndarray:
+        # same traversal as in TreeArrays.apply, but the already computed comparisions are used
+        number_of_splits = arrays.number_of_splits
+
+        nodes = np.full(len(split_results), arrays.root, dtype=np.intp)
+        rows = np.flatnonzero(nodes < number_of_splits)
+        while len(rows) > 0:
+            current_nodes = nodes[rows]
+            go_right = split_results[rows, split_results_indices[current_nodes]]
+            nodes[rows] = np.where(go_right, arrays.children_right[current_nodes], arrays.children_left[current_nodes])
+            rows = rows[nodes[rows] < number_of_splits]
+
+        return nodes - number_of_splits
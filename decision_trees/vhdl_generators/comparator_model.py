@@ -0,0 +1,80 @@
+import numpy as np
+
+from decision_trees.vhdl_generators.leaf_store import LeafStore
+
+# number of samples processed at once, limits the size of the comparator matrix kept in memory
+DEFAULT_BLOCK_SIZE = 8192
+
+
+# batched model of the hardware implementation of the Tree:
+# - compare process - all the splits are evaluated for every sample (comparator matrix),
+# - decideClass process - leaf is chosen when all the split results on its path have the expected values
+
+
+def compute_split_results(input_data: np.ndarray, feature: np.ndarray, threshold: np.ndarray) -> np.ndarray:
+    # n_samples x n_splits matrix, same values as splitResult in vhdl:
+    # 0 if value <= threshold, 1 otherwise
+    return ~(input_data[:, feature] <= threshold)
+
+
+def pack_split_results(split_results: np.ndarray) -> np.ndarray:
+    # bit-sliced representation - each row holds results of one split for all the samples (8 samples per byte)
+    return np.packbits(split_results.T, axis=1)
+
+
+class LeafPathMasks:
+    # per-leaf masks of the split results required to reach the leaf
+    # stored as (number_of_leaves x max_depth) tables, so all leaves are resolved together, one path level at a time
+
+    def __init__(self, leaf_store: LeafStore):
+        self.number_of_leaves = leaf_store.number_of_leaves
+        self.path_lengths = leaf_store.path_lengths
+
+        self.split_ids, directions = leaf_store.padded_paths()
+        # the packed split results are xor-ed with this mask, so bits of samples that match expected value become 1
+        self.xor_masks = np.where(directions == 0, 0xFF, 0x00).astype(np.uint8)
+        max_depth = self.split_ids.shape[1]
+
+        self._leaves_per_level = [np.flatnonzero(self.path_lengths > level) for level in range(max_depth)]
+
+    def match(self, packed_split_results: np.ndarray, number_of_samples: int) -> np.ndarray:
+        # returns (number_of_leaves x number_of_samples) matrix with 1 for every leaf whose path matches the sample
+        number_of_bytes = packed_split_results.shape[1]
+        matches = np.full((self.number_of_leaves, number_of_bytes), 0xFF, dtype=np.uint8)
+
+        for level, leaves_ids in enumerate(self._leaves_per_level):
+            matches[leaves_ids] &= \
+                packed_split_results[self.split_ids[leaves_ids, level]] ^ self.xor_masks[leaves_ids, level, None]
+
+        return np.unpackbits(matches, axis=1, count=number_of_samples)
+
+    def resolve(self, packed_split_results: np.ndarray, number_of_samples: int) -> np.ndarray:
+        # returns the ID of the leaf chosen for each sample, -1 if there was no matching leaf
+        matches = self.match(packed_split_results, number_of_samples)
+        if self.number_of_leaves == 0:
+            return np.full(number_of_samples, -1, dtype=np.intp)
+
+        # same as in _predict_one_sample and decideClass process - the last matching leaf is chosen
+        last_matching_leaf = self.number_of_leaves - 1 - np.argmax(matches[::-1], axis=0)
+
+        return np.where(matches.any(axis=0), last_matching_leaf, -1)
+
+
+def resolve_leaves(input_data: np.ndarray, compute_block_split_results, masks: LeafPathMasks,
+                   block_size: int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+    # compute_block_split_results - function returning the split results matrix of a block of samples
+    input_data = np.asarray(input_data)
+    leaves_ids = np.empty(len(input_data), dtype=np.intp)
+
+    for start in range(0, len(input_data), block_size):
+        block = input_data[start:start + block_size]
+        packed_split_results = pack_split_results(compute_block_split_results(block))
+        leaves_ids[start:start + block_size] = masks.resolve(packed_split_results, len(block))
+
+    return leaves_ids
+
+
+def predict_leaves(input_data: np.ndarray, feature: np.ndarray, threshold: np.ndarray, masks: LeafPathMasks,
+                   block_size: int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+    return resolve_leaves(input_data, lambda block: compute_split_results(block, feature, threshold), masks,
+                          block_size)
@@ -0,0 +1,625 @@
+import numpy as np
+
+from decision_trees.utils.convert_to_fixed_point import get_max_code
+from decision_trees.vhdl_generators.tree import Tree
+from decision_trees.vhdl_generators.rom_tree import RomTree
+from decision_trees.vhdl_generators.random_forest import RandomForest
+from decision_trees.vhdl_generators.threshold_encoder import ThresholdEncoding
+
+# cycle level model of the generated vhdl, used to check the latency and the throughput of the architectures
+# - it models the generator, not the generated text: the registers are built from the same structures as the vhdl
+#   (the leaf stores, the comparator bank, the ROM words, the levels of the vote module), so it checks the declared
+#   timing and the agreement of the architecture with the software model, but it is not a replacement for running
+#   tb_<entity> (create_testbench_file and create_stimulus_files) in a vhdl simulator,
+# - one step of the model is one clock cycle with en='1' (all the processes are gated by en, so nothing changes
+#   in the other cycles): the registers of the generated processes (splitResult or the encoders, the stages
+#   of decideClass, the ring of RomTree, the adder and comparator trees of the vote module, the average) are
+#   calculated from the registers of the previous cycle, the combinational signals in the same way as in the vhdl,
+# - the samples are provided as in the testbench: sample k is on the input from the active cycle
+#   k * initiation_interval, the last sample stays on the input while the pipeline is flushed,
+# - every register holds the index of the sample its value was calculated from (-1 before the first sample,
+#   MIXED_SAMPLES when the values of different samples were combined), so the cycle in which the result of each
+#   sample reaches the output is measured and compared with the declared latency and initiation interval,
+# - the registers keep their initial values (0) after the reset, only the phase counter of RomTree is reset;
+#   classIndex of a tree is not changed when no leaf is matched,
+# - with more lanes the consecutive samples are sent to the consecutive lanes, each row of the registers
+#   is one lane.
+
+NO_SAMPLE = -1
+MIXED_SAMPLES = -2
+
+
+class SimulationResult:
+
+    def __init__(self, outputs: np.ndarray, output_cycles: np.ndarray, number_of_cycles: int,
+                 samples_latencies: np.ndarray, declared_latency: int, declared_initiation_interval: int,
+                 mismatches: np.ndarray, late_samples: np.ndarray):
+        # output for each of the samples and the number of the clock cycle in which it appears on the output
+        # (-1 for the samples whose results did not reach the output)
+        self.outputs = outputs
+        self.output_cycles = output_cycles
+        self.number_of_cycles = number_of_cycles
+        # measured number of the active clock cycles from the input to the output of each sample
+        self.samples_latencies = samples_latencies
+        self.declared_latency = declared_latency
+        self.declared_initiation_interval = declared_initiation_interval
+        # indices of the samples with the output different from the expected one
+        self.mismatches = mismatches
+        # indices of the samples whose results did not appear in the cycle expected by the testbench
+        # (declared latency and initiation interval)
+        self.late_samples = late_samples
+
+    @property
+    def number_of_samples(self) -> int:
+        return len(self.outputs)
+
+    @property
+    def number_of_mismatches(self) -> int:
+        return len(self.mismatches)
+
+    @property
+    def latency(self) -> int:
+        # the highest measured latency (-1 if the result of any of the samples did not reach the output)
+        if len(self.samples_latencies) == 0 or np.any(self.samples_latencies < 0):
+            return -1
+        return int(self.samples_latencies.max())
+
+    @property
+    def flag_timing_as_declared(self) -> bool:
+        return len(self.late_samples) == 0
+
+    @property
+    def samples_per_cycle(self) -> float:
+        # average throughput, including filling and flushing of the pipeline
+        return self.number_of_samples / max(self.number_of_cycles, 1)
+
+    def samples_per_second(self, clock_frequency: float) -> float:
+        return self.samples_per_cycle * clock_frequency
+
+    def show(self):
+        print("Samples: ", self.number_of_samples, ", clock cycles: ", self.number_of_cycles)
+        print("Latency [cycles]: ", self.latency, " (declared: ", self.declared_latency,
+              "), samples per cycle: ", self.samples_per_cycle)
+        print("Mismatches: ", self.number_of_mismatches, ", samples not in the declared cycle: ",
+              len(self.late_samples))
+
+
+def _combine_samples(samples: np.ndarray) -> np.ndarray:
+    # index of the sample of a register calculated from the registers of the last axis
+    return np.where((samples == samples[..., :1]).all(axis=-1), samples[..., 0], MIXED_SAMPLES)
+
+
+def _wrap_signed(values: np.ndarray, number_of_bits: int) -> np.ndarray:
+    # signed value of number_of_bits bits, as in the numeric_std arithmetic
+    offset = 1 << (number_of_bits - 1)
+    return (values + offset) % (1 << number_of_bits) - offset
+
+
+class _Paths:
+    # splitResult bits checked by the paths (leaves or terms) of leaf_store on the levels from first_level to
+    # last_level - 1, split_results_indices - index of the splitResult bit used by each split
+
+    def __init__(self, leaf_store, split_results_indices: np.ndarray = None, first_level: int = 0,
+                 last_level: int = None):
+        split_ids, directions = leaf_store.padded_paths()
+        if last_level is None:
+            last_level = split_ids.shape[1]
+        split_ids = split_ids[:, first_level:last_level]
+        if split_results_indices is not None:
+            split_ids = np.asarray(split_results_indices)[split_ids]
+
+        self.split_ids = split_ids.astype(np.intp)
+        self.directions = directions[:, first_level:last_level].astype(bool)
+        self.not_checked = np.arange(first_level, last_level) >= leaf_store.path_lengths[:, None]
+
+    def match(self, split_results: np.ndarray) -> np.ndarray:
+        # (number_of_rows x number_of_paths) - True where all the checked splitResult bits have the expected values
+        return ((split_results[:, self.split_ids] == self.directions) | self.not_checked).all(axis=2)
+
+
+def _last_match(matches: np.ndarray, values: np.ndarray, previous_values: np.ndarray) -> np.ndarray:
+    # decideClass - the if statements of all the paths are in one process, so the last matching path sets the value,
+    # the register is not changed if there is no matching path
+    if matches.shape[1] == 0:
+        return previous_values
+    last_matching = matches.shape[1] - 1 - np.argmax(matches[:, ::-1], axis=1)
+    return np.where(matches.any(axis=1), values[last_matching], previous_values)
+
+
+def _compare(features: np.ndarray, feature: np.ndarray, threshold_code: np.ndarray,
+             number_of_bits_per_feature: int) -> np.ndarray:
+    # compare process - '0' when the value is not greater than the threshold, the comparisions with the thresholds
+    # outside of the range of the features are constant (see VHDLCreator._add_process_compare)
+    threshold_code = np.asarray(threshold_code, dtype=np.int64)
+    split_results = features[:, feature] > threshold_code
+    split_results[:, threshold_code >= get_max_code(number_of_bits_per_feature)] = False
+    split_results[:, threshold_code < 0] = True
+    return split_results
+
+
+class _TreeModel:
+    # registers of Tree: splitResult (or the encoders), leafMatch and splitResultDelayed of the decideClass stages,
+    # classIndex
+
+    def __init__(self, tree: Tree):
+        self.tree = tree
+        self.flag_encoders = tree.threshold_encoding != ThresholdEncoding.COMPARATORS
+        self.number_of_stages = tree.number_of_pipeline_stages
+        decision_store = tree.decision_store
+        self.classes = np.asarray(decision_store.classes, dtype=np.int64)
+        self.leaf_values_codes = tree.leaf_values_codes if tree.flag_regression else None
+
+        if self.number_of_stages == 1:
+            self.stages_paths = [_Paths(decision_store)]
+        else:
+            levels = tree.pipeline_stages_levels()
+            self.stages_paths = [_Paths(decision_store, None, levels[stage], levels[stage + 1])
+                                 for stage in range(self.number_of_stages)]
+
+    def initial_state(self, number_of_rows: int) -> dict:
+        arrays = self.tree.arrays
+        number_of_splits = arrays.number_of_splits
+        if self.flag_encoders:
+            compare = np.zeros((number_of_rows, len(self.tree.feature_intervals.features)), dtype=np.int64)
+        else:
+            compare = np.zeros((number_of_rows, number_of_splits), dtype=bool)
+
+        state = {"compare": compare, "compare_sample": np.full(number_of_rows, NO_SAMPLE, dtype=np.int64),
+                 "classIndex": np.zeros(number_of_rows, dtype=np.int64)}
+        for stage in range(self.number_of_stages):
+            state[f"stage_{stage}_sample"] = np.full(number_of_rows, NO_SAMPLE, dtype=np.int64)
+        for stage in range(1, self.number_of_stages):
+            state[f"leafMatch_{stage - 1}"] = np.zeros((number_of_rows, len(self.classes)), dtype=bool)
+            state[f"splitResultDelayed_{stage}"] = np.zeros((number_of_rows, number_of_splits), dtype=bool)
+
+        return state
+
+    def _split_results(self, compare: np.ndarray) -> np.ndarray:
+        # splitResult - the compare register, or the combinational logic after the registered encoders
+        if not self.flag_encoders:
+            return compare
+
+        feature_intervals = self.tree.feature_intervals
+        split_slot = feature_intervals.split_slot
+        split_results = compare[:, np.maximum(split_slot, 0)] > feature_intervals.split_rank
+        not_encoded = split_slot < 0
+        split_results[:, not_encoded] = np.asarray(self.tree.arrays.threshold_code)[not_encoded] < 0
+        return split_results
+
+    def step(self, state: dict, features: np.ndarray, samples: np.ndarray) -> dict:
+        tree = self.tree
+        new_state = {"compare_sample": samples}
+        if self.flag_encoders:
+            new_state["compare"] = tree.feature_intervals.interval_indices(features).T.astype(np.int64)
+        else:
+            new_state["compare"] = _compare(features, tree.arrays.feature, tree.arrays.threshold_code,
+                                            tree._number_of_bits_per_feature)
+
+        split_results = self._split_results(state["compare"])
+        for stage, paths in enumerate(self.stages_paths):
+            if stage > 0:
+                split_results = state[f"splitResultDelayed_{stage}"]
+            matches = paths.match(split_results)
+            if stage > 0:
+                matches &= state[f"leafMatch_{stage - 1}"]
+
+            if stage < self.number_of_stages - 1:
+                new_state[f"splitResultDelayed_{stage + 1}"] = split_results
+                new_state[f"leafMatch_{stage}"] = matches
+            else:
+                new_state["classIndex"] = _last_match(matches, self.classes, state["classIndex"])
+            new_state[f"stage_{stage}_sample"] = state["compare_sample"] if stage == 0 \
+                else state[f"stage_{stage - 1}_sample"]
+
+        return new_state
+
+    def output(self, state: dict) -> (np.ndarray, np.ndarray):
+        # value on the output port (class, or the code of the value of the leaf) and its sample
+        values = state["classIndex"]
+        if self.leaf_values_codes is not None:
+            values = self.leaf_values_codes[values]
+        return values, state[f"stage_{self.number_of_stages - 1}_sample"]
+
+
+class _RomTreeModel:
+    # registers of RomTree: phase counter, romData, the ring of slots, classIndex
+    # the fields of the nodes are decoded from the words of the generated ROM
+
+    def __init__(self, tree: RomTree):
+        self.tree = tree
+        bits = tree._number_of_bits_per_feature
+        bits_for_child = tree._number_of_bits_for_child
+        words = np.array(tree.rom_words(), dtype=object)
+
+        def field(shift: int, number_of_bits: int) -> np.ndarray:
+            return ((words >> shift) & ((1 << number_of_bits) - 1)).astype(np.int64)
+
+        self.right = field(0, bits_for_child)
+        self.left = field(bits_for_child, bits_for_child)
+        self.threshold = field(2 * bits_for_child, bits)
+        self.feature = field(2 * bits_for_child + bits, tree._number_of_bits_for_feature_index)
+
+        self.bits_for_child = bits_for_child
+        self.address_mask = (1 << tree._number_of_bits_for_address) - 1
+        self.class_mask = (1 << tree._number_of_bits_for_class_index) - 1
+        self.number_of_slots = tree.number_of_slots
+        self.initiation_interval = tree.initiation_interval
+        self.used_features = tree.used_features
+        self.number_of_feature_slots = tree._number_of_feature_slots
+        self.leaf_values_codes = tree.leaf_values_codes if tree.flag_regression else None
+
+        arrays = tree.arrays
+        self.flag_root_done = arrays.root >= arrays.number_of_splits
+        self.root_class = int(arrays.leaf_class[arrays.root - arrays.number_of_splits]) if self.flag_root_done else 0
+
+    def initial_state(self, number_of_rows: int) -> dict:
+        slots_shape = (number_of_rows, self.number_of_slots)
+        state = {"phase": np.zeros(number_of_rows, dtype=np.int64),
+                 "classIndex": np.zeros(number_of_rows, dtype=np.int64),
+                 "classIndex_sample": np.full(number_of_rows, NO_SAMPLE, dtype=np.int64),
+                 "slotFeatures": np.zeros(slots_shape + (self.number_of_feature_slots,), dtype=np.int64),
+                 "slotAddress": np.zeros(slots_shape, dtype=np.int64),
+                 "slotClass": np.zeros(slots_shape, dtype=np.int64),
+                 "slotDone": np.zeros(slots_shape, dtype=bool),
+                 "slotSample": np.full(slots_shape, NO_SAMPLE, dtype=np.int64)}
+        # romData register holds a word of zeros
+        for name in ("romFeature", "romThreshold", "romLeft", "romRight"):
+            state[name] = np.zeros(number_of_rows, dtype=np.int64)
+
+        return state
+
+    def step(self, state: dict, features: np.ndarray, samples: np.ndarray) -> dict:
+        slot_fields = ("slotFeatures", "slotAddress", "slotClass", "slotDone", "slotSample")
+        rows = np.arange(len(samples))
+        phase = state["phase"]
+        flag_new_sample = phase == 0
+        new_state = {"phase": np.where(phase == self.initiation_interval - 1, 0, phase + 1)}
+        new_state.update({field: np.empty_like(state[field]) for field in slot_fields})
+
+        # position 0: the node is read, a new sample replaces the finished one
+        address = np.where(flag_new_sample, 0, state["slotAddress"][:, 0])
+        for name, values in (("romFeature", self.feature), ("romThreshold", self.threshold),
+                             ("romLeft", self.left), ("romRight", self.right)):
+            new_state[name] = values[address]
+        new_state["classIndex"] = np.where(flag_new_sample, state["slotClass"][:, 0], state["classIndex"])
+        new_state["classIndex_sample"] = np.where(flag_new_sample, state["slotSample"][:, 0],
+                                                  state["classIndex_sample"])
+
+        bus_features = np.zeros((len(samples), self.number_of_feature_slots), dtype=np.int64)
+        bus_features[:, :len(self.used_features)] = features[:, self.used_features]
+        new_sample = {"slotFeatures": bus_features, "slotAddress": 0, "slotClass": self.root_class,
+                      "slotDone": self.flag_root_done, "slotSample": samples}
+        for field in slot_fields:
+            flag = flag_new_sample[:, None] if field == "slotFeatures" else flag_new_sample
+            new_state[field][:, 1] = np.where(flag, new_sample[field], state[field][:, 0])
+
+        # position 1: the next node is chosen
+        next_slot = 2 % self.number_of_slots
+        for field in slot_fields:
+            new_state[field][:, next_slot] = state[field][:, 1]
+        feature_values = state["slotFeatures"][rows, 1, state["romFeature"]]
+        child = np.where(feature_values > state["romThreshold"], state["romRight"], state["romLeft"])
+        flag_leaf = (child >> (self.bits_for_child - 1)) & 1 == 1
+        child_value = child & ((1 << (self.bits_for_child - 1)) - 1)
+        flag_not_done = ~state["slotDone"][:, 1]
+        new_state["slotDone"][:, next_slot] |= flag_not_done & flag_leaf
+        new_state["slotClass"][:, next_slot] = np.where(flag_not_done & flag_leaf, child_value & self.class_mask,
+                                                        state["slotClass"][:, 1])
+        new_state["slotAddress"][:, next_slot] = np.where(flag_not_done & ~flag_leaf,
+                                                          child_value & self.address_mask, state["slotAddress"][:, 1])
+
+        # other positions: the samples wait for their turn
+        for position in range(2, self.number_of_slots):
+            for field in slot_fields:
+                new_state[field][:, (position + 1) % self.number_of_slots] = state[field][:, position]
+
+        return new_state
+
+    def output(self, state: dict) -> (np.ndarray, np.ndarray):
+        values = state["classIndex"]
+        if self.leaf_values_codes is not None:
+            values = self.leaf_values_codes[values]
+        return values, state["classIndex_sample"]
+
+
+def _tree_model(tree: Tree):
+    if isinstance(tree, RomTree):
+        return _RomTreeModel(tree)
+    return _TreeModel(tree)
+
+
+class _RandomForestModel:
+    # registers of RandomForest: the trees (components, or the compare process and the decideClass processes
+    # of the shared comparators), the levels of the vote module or of the average
+
+    def __init__(self, random_forest: RandomForest):
+        self.random_forest = random_forest
+        trees = random_forest.random_forest
+        self.number_of_trees = len(trees)
+        self.number_of_classes = random_forest.number_of_classes
+        self.flag_regression = random_forest.flag_regression
+        self.fan_in = random_forest.vote_fan_in
+        self.sums_levels = random_forest.vote_levels(self.number_of_trees)
+        self.classes_levels = random_forest.vote_levels(self.number_of_classes)
+
+        self.trees_models = None
+        if not random_forest.flag_shared_comparators:
+            self.trees_models = [_tree_model(tree) for tree in trees]
+        elif random_forest.flag_shared_subtrees:
+            # decideClass of each tree uses the combinational signals of the shared subtrees
+            split_results_indices = random_forest._subtree_pool_split_results_indices()
+            shared_subtrees, subtrees_terms, trees_terms = random_forest.shared_subtrees_terms()
+            self.subtrees = {subtree: (_Paths(terms, split_results_indices), terms.classes, subtrees)
+                             for subtree, (terms, subtrees) in zip(shared_subtrees, subtrees_terms)}
+            self.trees_paths = [(_Paths(terms, split_results_indices), terms.classes, subtrees)
+                                for terms, subtrees in trees_terms]
+        else:
+            # decideClass of each tree sets the class (or the code of the value of the leaf) of the last matching leaf
+            comparator_bank = random_forest.comparator_bank
+            self.trees_paths = []
+            for i, tree in enumerate(trees):
+                values = np.asarray(tree.decision_store.classes, dtype=np.int64)
+                if tree.flag_regression:
+                    values = tree.leaf_values_codes[values]
+                self.trees_paths.append((_Paths(tree.decision_store, comparator_bank.split_results_indices[i]),
+                                         values, None))
+
+        if self.flag_regression:
+            self.multiplier, self.shift = random_forest.average_multiplier()
+            self.number_of_bits_for_sum = random_forest._number_of_bits_for_sum
+            self.number_of_bits_for_output = random_forest.number_of_bits_per_leaf_value
+
+    def initial_state(self, number_of_rows: int) -> dict:
+        state = {}
+        if self.trees_models is not None:
+            state["trees"] = [tree_model.initial_state(number_of_rows) for tree_model in self.trees_models]
+        else:
+            comparator_bank = self.random_forest.comparator_bank
+            state["compare"] = np.zeros((number_of_rows, comparator_bank.number_of_comparators), dtype=bool)
+            state["compare_sample"] = np.full(number_of_rows, NO_SAMPLE, dtype=np.int64)
+            state["outputs"] = np.zeros((number_of_rows, self.number_of_trees), dtype=np.int64)
+            state["outputs_sample"] = np.full(number_of_rows, NO_SAMPLE, dtype=np.int64)
+
+        if self.flag_regression:
+            for level, number_of_sums in enumerate(self.sums_levels):
+                state[f"sums_{level}"] = np.zeros((number_of_rows, number_of_sums), dtype=np.int64)
+                state[f"sums_{level}_sample"] = np.full(number_of_rows, NO_SAMPLE, dtype=np.int64)
+            if self.multiplier != 1:
+                state["average"] = np.zeros(number_of_rows, dtype=self._average_dtype)
+                state["average_sample"] = np.full(number_of_rows, NO_SAMPLE, dtype=np.int64)
+            return state
+
+        for level, number_of_sums in enumerate(self.sums_levels):
+            state[f"votes_{level}"] = np.zeros((number_of_rows, self.number_of_classes, number_of_sums),
+                                               dtype=np.int64)
+            state[f"votes_{level}_sample"] = np.full(number_of_rows, NO_SAMPLE, dtype=np.int64)
+        for level, number_of_candidates in enumerate(self.classes_levels):
+            state[f"maxVotes_{level}"] = np.zeros((number_of_rows, number_of_candidates), dtype=np.int64)
+            state[f"maxIndex_{level}"] = np.zeros((number_of_rows, number_of_candidates), dtype=np.int64)
+            state[f"maxIndex_{level}_sample"] = np.full(number_of_rows, NO_SAMPLE, dtype=np.int64)
+
+        return state
+
+    @property
+    def _average_dtype(self):
+        # the product of the sum and the multiplier does not always fit in int64
+        return object if 2 * self.number_of_bits_for_sum + 1 >= 63 else np.int64
+
+    def _trees_outputs(self, state: dict) -> (np.ndarray, np.ndarray):
+        # outputs signal of the forest - (number_of_rows x number_of_trees) values and their samples
+        if self.trees_models is None:
+            return state["outputs"], np.repeat(state["outputs_sample"][:, None], self.number_of_trees, axis=1)
+
+        outputs = [tree_model.output(tree_state) for tree_model, tree_state in zip(self.trees_models, state["trees"])]
+        return np.stack([values for values, _ in outputs], axis=1), np.stack([samples for _, samples in outputs],
+                                                                             axis=1)
+
+    def _step_trees(self, state: dict, features: np.ndarray, samples: np.ndarray) -> dict:
+        new_state = {}
+        if self.trees_models is not None:
+            new_state["trees"] = [tree_model.step(tree_state, features, samples)
+                                  for tree_model, tree_state in zip(self.trees_models, state["trees"])]
+            return new_state
+
+        comparator_bank = self.random_forest.comparator_bank
+        new_state["compare"] = _compare(features, comparator_bank.feature, comparator_bank.threshold_code,
+                                        self.random_forest._number_of_bits_per_feature)
+        new_state["compare_sample"] = samples
+        split_results = state["compare"]
+
+        # combinational signals of the shared subtrees, calculated when they are needed
+        subtrees_classes = {}
+
+        def paths_values(values: np.ndarray, subtrees: np.ndarray) -> np.ndarray:
+            # (number_of_rows x number_of_paths) values assigned by the paths
+            values = np.repeat(values[None, :], len(split_results), axis=0)
+            if subtrees is not None:
+                for path, subtree in enumerate(subtrees.tolist()):
+                    if subtree >= 0:
+                        values[:, path] = subtree_class(subtree)
+            return values
+
+        def subtree_class(subtree: int) -> np.ndarray:
+            # the first matching path, the last one is not checked
+            if subtree not in subtrees_classes:
+                paths, classes, subtrees = self.subtrees[subtree]
+                matches = paths.match(split_results)
+                matches[:, -1] = True
+                subtrees_classes[subtree] = paths_values(classes, subtrees)[np.arange(len(split_results)),
+                                                                            np.argmax(matches, axis=1)]
+            return subtrees_classes[subtree]
+
+        outputs = np.empty_like(state["outputs"])
+        for i, (paths, values, subtrees) in enumerate(self.trees_paths):
+            matches = paths.match(split_results)
+            values = paths_values(values, subtrees)
+            if matches.shape[1] == 0:
+                outputs[:, i] = state["outputs"][:, i]
+                continue
+            last_matching = matches.shape[1] - 1 - np.argmax(matches[:, ::-1], axis=1)
+            outputs[:, i] = np.where(matches.any(axis=1), values[np.arange(len(values)), last_matching],
+                                     state["outputs"][:, i])
+        new_state["outputs"] = outputs
+        new_state["outputs_sample"] = state["compare_sample"]
+
+        return new_state
+
+    def _add_groups(self, values: np.ndarray) -> np.ndarray:
+        # sums of the groups of fan_in consecutive values of the last axis
+        return np.add.reduceat(values, np.arange(0, values.shape[-1], self.fan_in), axis=-1)
+
+    def step(self, state: dict, features: np.ndarray, samples: np.ndarray) -> dict:
+        new_state = self._step_trees(state, features, samples)
+        outputs, outputs_samples = self._trees_outputs(state)
+
+        if self.flag_regression:
+            for level in range(len(self.sums_levels)):
+                if level == 0:
+                    new_state["sums_0"] = _wrap_signed(self._add_groups(outputs), self.number_of_bits_for_sum)
+                    new_state["sums_0_sample"] = _combine_samples(outputs_samples)
+                else:
+                    new_state[f"sums_{level}"] = _wrap_signed(self._add_groups(state[f"sums_{level - 1}"]),
+                                                              self.number_of_bits_for_sum)
+                    new_state[f"sums_{level}_sample"] = state[f"sums_{level - 1}_sample"]
+            if self.multiplier != 1:
+                last_level = len(self.sums_levels) - 1
+                new_state["average"] = _wrap_signed(state[f"sums_{last_level}"][:, 0].astype(self._average_dtype)
+                                                    * self.multiplier,
+                                                    self.number_of_bits_for_sum + self.shift + 1)
+                new_state["average_sample"] = state[f"sums_{last_level}_sample"]
+            return new_state
+
+        for level in range(len(self.sums_levels)):
+            if level == 0:
+                votes = outputs[:, None, :] == np.arange(self.number_of_classes)[None, :, None]
+                new_state["votes_0"] = self._add_groups(votes.astype(np.int64))
+                new_state["votes_0_sample"] = _combine_samples(outputs_samples)
+            else:
+                new_state[f"votes_{level}"] = self._add_groups(state[f"votes_{level - 1}"])
+                new_state[f"votes_{level}_sample"] = state[f"votes_{level - 1}_sample"]
+
+        last_sums_level = len(self.sums_levels) - 1
+        for level, number_of_candidates in enumerate(self.classes_levels):
+            if level == 0:
+                votes = state[f"votes_{last_sums_level}"][:, :, 0]
+                indices = np.repeat(np.arange(self.number_of_classes)[None, :], len(votes), axis=0)
+                candidates_samples = state[f"votes_{last_sums_level}_sample"]
+            else:
+                votes = state[f"maxVotes_{level - 1}"]
+                indices = state[f"maxIndex_{level - 1}"]
+                candidates_samples = state[f"maxIndex_{level - 1}_sample"]
+
+            # the first candidate of each group with the highest number of votes wins (the padding never wins)
+            padding = number_of_candidates * self.fan_in - votes.shape[1]
+            votes = np.pad(votes, ((0, 0), (0, padding)), constant_values=-1).reshape(len(votes), -1, self.fan_in)
+            indices = np.pad(indices, ((0, 0), (0, padding))).reshape(len(indices), -1, self.fan_in)
+            winners = np.argmax(votes, axis=2)[:, :, None]
+            new_state[f"maxVotes_{level}"] = np.take_along_axis(votes, winners, axis=2)[:, :, 0]
+            new_state[f"maxIndex_{level}"] = np.take_along_axis(indices, winners, axis=2)[:, :, 0]
+            new_state[f"maxIndex_{level}_sample"] = candidates_samples
+
+        return new_state
+
+    def output(self, state: dict) -> (np.ndarray, np.ndarray):
+        if not self.flag_regression:
+            last_level = len(self.classes_levels) - 1
+            return state[f"maxIndex_{last_level}"][:, 0], state[f"maxIndex_{last_level}_sample"]
+
+        # bits (shift + width - 1 downto shift) of the sum or of the average, read as a signed value
+        if self.multiplier != 1:
+            values, samples = state["average"], state["average_sample"]
+        else:
+            last_level = len(self.sums_levels) - 1
+            values, samples = state[f"sums_{last_level}"][:, 0], state[f"sums_{last_level}_sample"]
+        values = _wrap_signed(values >> self.shift, self.number_of_bits_for_output)
+        return np.asarray(values, dtype=np.int64), samples
+
+
+def _classifier_model(classifier):
+    if isinstance(classifier, RandomForest):
+        return _RandomForestModel(classifier)
+    if isinstance(classifier, Tree):
+        return _tree_model(classifier)
+    raise ValueError("Unknown type of classifier!")
+
+
+def _simulate_cycles(model, input_codes: np.ndarray, number_of_lanes: int, initiation_interval: int,
+                     number_of_active_cycles: int) -> (np.ndarray, np.ndarray):
+    # returns the output of each of the samples and the active cycle in which it appears on the output (-1 if it
+    # does not appear in number_of_active_cycles)
+    outputs = np.full(len(input_codes), -1, dtype=np.int64)
+    output_cycles = np.full(len(input_codes), -1, dtype=np.int64)
+    if len(input_codes) == 0:
+        return outputs, output_cycles
+
+    lanes = np.arange(number_of_lanes)
+    number_of_groups = -(-len(input_codes) // number_of_lanes)
+    number_of_finished_samples = 0
+    state = model.initial_state(number_of_lanes)
+    for cycle in range(number_of_active_cycles):
+        # group k (samples from k * number_of_lanes) is on the input from the active cycle k * initiation_interval,
+        # the testbench keeps the last group on the input and repeats the last sample in the lanes it does not fill
+        group = min(cycle // initiation_interval, number_of_groups - 1)
+        samples = np.minimum(group * number_of_lanes + lanes, len(input_codes) - 1)
+        state = model.step(state, input_codes[samples], samples)
+
+        # the first cycle in which the sample is on the output of its own lane
+        values, values_samples = model.output(state)
+        flag_new = (values_samples >= 0) & (values_samples % number_of_lanes == lanes)
+        flag_new[flag_new] = output_cycles[values_samples[flag_new]] < 0
+        outputs[values_samples[flag_new]] = values[flag_new]
+        output_cycles[values_samples[flag_new]] = cycle
+        number_of_finished_samples += int(np.count_nonzero(flag_new))
+        if number_of_finished_samples == len(input_codes):
+            break
+
+    return outputs, output_cycles
+
+
+def simulate(classifier, input_data: np.ndarray, expected: np.ndarray = None,
+             enable_pattern: [] = None) -> SimulationResult:
+    # input_data - normalised or already quantized samples, one sample is provided in each initiation_interval
+    # active cycles (with en='1')
+    # expected - expected outputs, if not provided the results of predict_output_codes for input_data are used
+    # (the software model, not the codes of the hardware)
+    # enable_pattern - values of en repeated in the consecutive cycles (e.g. [1, 0] - en active every 2 cycles)
+    if expected is None:
+        expected = classifier.predict_output_codes(input_data)
+    input_codes = classifier.hardware_input_codes(input_data)
+
+    if enable_pattern is None:
+        enable_pattern = [1]
+    enable_pattern = np.asarray(enable_pattern, dtype=bool)
+    if not enable_pattern.any():
+        raise ValueError("Enable pattern has to contain at least one active cycle!")
+
+    # the declared values are only used to drive the input (as in the testbench) and to limit the number
+    # of the simulated cycles, the results are measured
+    declared_latency = classifier.latency
+    initiation_interval = classifier.initiation_interval
+    number_of_lanes = classifier.number_of_lanes
+    model = _classifier_model(classifier)
+
+    number_of_groups = -(-len(input_codes) // number_of_lanes)
+    number_of_active_cycles = number_of_groups * initiation_interval + 2 * (declared_latency + initiation_interval)
+    outputs, active_output_cycles = _simulate_cycles(model, input_codes, number_of_lanes, initiation_interval,
+                                                     number_of_active_cycles)
+
+    # the sample of group k is on the input from the active cycle k * initiation_interval, its result is registered
+    # in the cycle k * initiation_interval + latency - 1 (cycles are counted from 0)
+    groups_first_cycles = np.arange(len(input_codes)) // number_of_lanes * initiation_interval
+    flag_output = active_output_cycles >= 0
+    samples_latencies = np.where(flag_output, active_output_cycles - groups_first_cycles + 1, -1)
+    late_samples = np.flatnonzero(samples_latencies != declared_latency)
+
+    # active cycles are mapped to the clock cycles with the enable pattern
+    number_of_enabled_cycles = int(active_output_cycles.max(initial=-1)) + 1
+    number_of_patterns = -(-number_of_enabled_cycles // int(np.count_nonzero(enable_pattern)))
+    enabled_cycles = np.flatnonzero(np.tile(enable_pattern, number_of_patterns))
+    output_cycles = np.where(flag_output, enabled_cycles[np.maximum(active_output_cycles, 0)], -1)
+    number_of_cycles = int(output_cycles.max(initial=-1)) + 1
+
+    mismatches = np.flatnonzero((outputs != np.asarray(expected)) | ~flag_output)
+
+    return SimulationResult(outputs, output_cycles, number_of_cycles, samples_latencies, declared_latency,
+                            initiation_interval, mismatches, late_samples)
@@ -0,0 +1,243 @@
+import numpy as np
+
+from decision_trees.vhdl_generators.tree_arrays import TreeArrays
+from decision_trees.vhdl_generators.leaf_store import LeafStore
+
+# optimization of the built trees, in two steps:
+# - simplify_tree_arrays - removes the splits that always give the same result (because of the splits with the same
+#   feature on the path to them) and merges the sibling leaves with the same class, the result is a smaller tree
+#   with exactly the same predictions, used by all the software predictors,
+# - minimize_class_terms - the function from the split results to the class is minimized separately for each class:
+#   the path of each leaf is a product term (AND of the split results), terms are expanded (conditions are removed)
+#   as long as they do not overlap with any leaf of the other classes, and the terms covered by the other terms
+#   of the same class are removed; the terms of the class with the most conditions are replaced by one term
+#   without any conditions placed before all the other terms (the last matching term sets the class, so it is
+#   the default class); the result is used in the decideClass process of the vhdl
+#   (and by the model of the hardware - Tree.apply_hardware)
+# comparisions are represented as the intervals of the threshold codes: split (feature, code) with result 0 means
+# x <= code and with result 1 - x >= code + 1, so a product term is a box in the features space and two terms
+# overlap only if their intervals overlap for all the features (this also covers the combinations of the split
+# results that are not possible, e.g. x <= 3 and x > 5)
+# each box is expanded against the boxes of all the leaves of the other classes and compared with all the boxes
+# of its class, so minimize_class_terms takes O(leaves^2 * features) time (and O(leaves * features) memory for each
+# box); above max_size (leaves^2 * features) the terms are not minimized and the leaves of the simplified tree are used
+
+_NO_LIMIT = np.int64(1) << 62
+# default limit of leaves^2 * features for minimize_class_terms, about ten seconds of calculations
+DEFAULT_MAX_SIZE = 1 << 30
+
+
+def _resolve_node(arrays: TreeArrays, node: int, lower: np.ndarray, upper: np.ndarray) -> int:
+    # skips the splits with the result known from the intervals of the features
+    number_of_splits = arrays.number_of_splits
+    while node < number_of_splits:
+        feature = arrays.feature[node]
+        threshold_code = arrays.threshold_code[node]
+        if upper[feature] <= threshold_code:
+            node = arrays.children_left[node]
+        elif lower[feature] > threshold_code:
+            node = arrays.children_right[node]
+        else:
+            break
+
+    return node
+
+
+def simplify_tree_arrays(arrays: TreeArrays) -> TreeArrays:
+    number_of_splits = arrays.number_of_splits
+    number_of_features = int(arrays.feature.max()) + 1 if number_of_splits > 0 else 0
+    children_left = arrays.children_left.copy()
+    children_right = arrays.children_right.copy()
+
+    # redundant splits are skipped - preorder traversal with the intervals of the features on the path
+    lower = np.full(number_of_features, -_NO_LIMIT, dtype=np.int64)
+    upper = np.full(number_of_features, _NO_LIMIT, dtype=np.int64)
+    root = _resolve_node(arrays, arrays.root, lower, upper)
+    nodes_to_visit = [(root, lower, upper)]
+    while nodes_to_visit:
+        node, lower, upper = nodes_to_visit.pop()
+        if node >= number_of_splits:
+            continue
+
+        feature = arrays.feature[node]
+        threshold_code = arrays.threshold_code[node]
+
+        upper_left = upper.copy()
+        upper_left[feature] = min(upper[feature], threshold_code)
+        children_left[node] = _resolve_node(arrays, children_left[node], lower, upper_left)
+        nodes_to_visit.append((children_left[node], lower, upper_left))
+
+        lower_right = lower.copy()
+        lower_right[feature] = max(lower[feature], threshold_code + 1)
+        children_right[node] = _resolve_node(arrays, children_right[node], lower_right, upper)
+        nodes_to_visit.append((children_right[node], lower_right, upper))
+
+    # sibling leaves with the same class are merged - postorder traversal, the class of a split is known
+    # if both its children are leaves (or merged splits) with the same class
+    nodes_class = np.full(number_of_splits + arrays.number_of_leaves, -1, dtype=np.intp)
+    nodes_class[number_of_splits:] = arrays.leaf_class
+    nodes_to_visit = [(root, False)]
+    while nodes_to_visit:
+        node, flag_children_visited = nodes_to_visit.pop()
+        if node >= number_of_splits:
+            continue
+        if not flag_children_visited:
+            nodes_to_visit.append((node, True))
+            nodes_to_visit.append((children_right[node], False))
+            nodes_to_visit.append((children_left[node], False))
+        elif nodes_class[children_left[node]] >= 0 \
+                and nodes_class[children_left[node]] == nodes_class[children_right[node]]:
+            nodes_class[node] = nodes_class[children_left[node]]
+
+    # the new tree is numbered in the same way as in Tree.build - splits in preorder, leaves from left to right
+    split_nodes = []
+    leaf_nodes = []
+    nodes_to_visit = [root]
+    while nodes_to_visit:
+        node = nodes_to_visit.pop()
+        if nodes_class[node] >= 0:
+            leaf_nodes.append(node)
+        else:
+            split_nodes.append(node)
+            nodes_to_visit.append(children_right[node])
+            nodes_to_visit.append(children_left[node])
+
+    split_nodes = np.array(split_nodes, dtype=np.intp)
+    leaf_nodes = np.array(leaf_nodes, dtype=np.intp)
+    nodes_indices = np.full(len(nodes_class), -1, dtype=np.intp)
+    nodes_indices[split_nodes] = np.arange(len(split_nodes))
+    nodes_indices[leaf_nodes] = len(split_nodes) + np.arange(len(leaf_nodes))
+
+    return TreeArrays(
+        arrays.feature[split_nodes],
+        arrays.threshold[split_nodes],
+        arrays.threshold_code[split_nodes],
+        nodes_indices[children_left[split_nodes]],
+        nodes_indices[children_right[split_nodes]],
+        nodes_class[leaf_nodes],
+        int(nodes_indices[root]),
+        arrays.number_of_classes,
+    )
+
+
+def _leaves_boxes(arrays: TreeArrays, leaf_store: LeafStore, features: np.ndarray) -> (np.ndarray, np.ndarray):
+    # (number_of_leaves x number_of_features) intervals of the codes of the features reached by each of the leaves
+    feature_columns = np.searchsorted(features, arrays.feature)
+    lower = np.full((leaf_store.number_of_leaves, len(features)), -_NO_LIMIT, dtype=np.int64)
+    upper = np.full((leaf_store.number_of_leaves, len(features)), _NO_LIMIT, dtype=np.int64)
+
+    rows = np.repeat(np.arange(leaf_store.number_of_leaves), leaf_store.path_lengths)
+    columns = feature_columns[leaf_store.path_split_ids]
+    threshold_codes = arrays.threshold_code[leaf_store.path_split_ids].astype(np.int64)
+    flag_left = leaf_store.path_directions == 0
+    np.minimum.at(upper, (rows[flag_left], columns[flag_left]), threshold_codes[flag_left])
+    np.maximum.at(lower, (rows[~flag_left], columns[~flag_left]), threshold_codes[~flag_left] + 1)
+
+    return lower, upper
+
+
+def _expand_box(lower: np.ndarray, upper: np.ndarray, others_lower: np.ndarray, others_upper: np.ndarray):
+    # removes the limits of the box (in place) as long as it does not overlap with any of the other boxes
+    not_overlapping = (np.maximum(others_lower, lower) > np.minimum(others_upper, upper))
+    number_of_not_overlapping = np.count_nonzero(not_overlapping, axis=1)
+
+    for column in np.flatnonzero((lower > -_NO_LIMIT) | (upper < _NO_LIMIT)):
+        for flag_lower in (True, False):
+            if flag_lower:
+                if lower[column] == -_NO_LIMIT:
+                    continue
+                new_lower, new_upper = -_NO_LIMIT, upper[column]
+            else:
+                if upper[column] == _NO_LIMIT:
+                    continue
+                new_lower, new_upper = lower[column], _NO_LIMIT
+
+            new_not_overlapping = (np.maximum(others_lower[:, column], new_lower)
+                                   > np.minimum(others_upper[:, column], new_upper))
+            new_number_of_not_overlapping = (number_of_not_overlapping - not_overlapping[:, column]
+                                             + new_not_overlapping)
+            if np.all(new_number_of_not_overlapping > 0):
+                lower[column] = new_lower
+                upper[column] = new_upper
+                not_overlapping[:, column] = new_not_overlapping
+                number_of_not_overlapping = new_number_of_not_overlapping
+
+
+def _remove_covered_boxes(lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    # returns the indices of the boxes that are not contained in any other box (one of the equal boxes is kept)
+    kept = []
+    for i in range(len(lower)):
+        flag_contained = np.all((lower[i] >= lower) & (upper[i] <= upper), axis=1)
+        flag_contained[i] = False
+        # the equal boxes with lower indices are removed, so the one with the highest index is kept
+        flag_equal = np.all((lower[i] == lower) & (upper[i] == upper), axis=1)
+        flag_contained[:i + 1] &= ~flag_equal[:i + 1]
+        if not flag_contained.any():
+            kept.append(i)
+
+    return np.array(kept, dtype=np.intp)
+
+
+def minimize_class_terms(arrays: TreeArrays, leaf_store: LeafStore, max_size: int = DEFAULT_MAX_SIZE) -> LeafStore:
+    # returns the product terms in the form of LeafStore (each term is a "leaf" with the class), grouped by class,
+    # in each sample the default term (the first one) and the terms of at most one other class are matched
+    # trees too big for the minimization (see max_size) keep their leaves - they do not overlap, so they are
+    # the terms as well
+    features = np.unique(arrays.feature)
+    if leaf_store.number_of_leaves ** 2 * len(features) > max_size:
+        return leaf_store
+
+    lower, upper = _leaves_boxes(arrays, leaf_store, features)
+    classes = np.asarray(leaf_store.classes)
+
+    terms_lower = []
+    terms_upper = []
+    terms_classes = []
+    for class_index in np.unique(classes):
+        flag_class = classes == class_index
+        class_lower = lower[flag_class]
+        class_upper = upper[flag_class]
+        for i in range(len(class_lower)):
+            _expand_box(class_lower[i], class_upper[i], lower[~flag_class], upper[~flag_class])
+
+        kept = _remove_covered_boxes(class_lower, class_upper)
+        terms_lower.append(class_lower[kept])
+        terms_upper.append(class_upper[kept])
+        terms_classes.append(np.full(len(kept), class_index, dtype=classes.dtype))
+
+    numbers_of_conditions = [np.count_nonzero(box_lower > -_NO_LIMIT) + np.count_nonzero(box_upper < _NO_LIMIT)
+                             for box_lower, box_upper in zip(terms_lower, terms_upper)]
+    default = int(np.argmax(numbers_of_conditions))
+    terms_lower[default] = np.full((1, len(features)), -_NO_LIMIT, dtype=np.int64)
+    terms_upper[default] = np.full((1, len(features)), _NO_LIMIT, dtype=np.int64)
+    terms_classes[default] = terms_classes[default][:1]
+    for terms in (terms_lower, terms_upper, terms_classes):
+        terms.insert(0, terms.pop(default))
+
+    # limits of the boxes are converted back to the splits of the tree (the first split with the same comparision)
+    split_ids = {}
+    for split_id in range(arrays.number_of_splits - 1, -1, -1):
+        split_ids[(int(arrays.feature[split_id]), int(arrays.threshold_code[split_id]))] = split_id
+
+    path_lengths = []
+    path_split_ids = []
+    path_directions = []
+    for box_lower, box_upper in zip(np.concatenate(terms_lower), np.concatenate(terms_upper)):
+        conditions = []
+        for column in np.flatnonzero(box_lower > -_NO_LIMIT):
+            conditions.append((split_ids[(int(features[column]), int(box_lower[column]) - 1)], 1))
+        for column in np.flatnonzero(box_upper < _NO_LIMIT):
+            conditions.append((split_ids[(int(features[column]), int(box_upper[column]))], 0))
+        conditions.sort()
+
+        path_lengths.append(len(conditions))
+        path_split_ids.extend(split_id for split_id, _ in conditions)
+        path_directions.extend(direction for _, direction in conditions)
+
+    path_indptr = np.zeros(len(path_lengths) + 1, dtype=leaf_store.path_indptr.dtype)
+    np.cumsum(path_lengths, out=path_indptr[1:])
+
+    return LeafStore(path_indptr,
+                     np.array(path_split_ids, dtype=leaf_store.path_split_ids.dtype),
+                     np.array(path_directions, dtype=leaf_store.path_directions.dtype),
+                     np.concatenate(terms_classes))
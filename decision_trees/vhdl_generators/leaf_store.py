@@ -0,0 +1,111 @@
+import numpy as np
+
+from decision_trees.vhdl_generators.tree_arrays import TreeArrays
+
+# actions used in the iterative traversal of the tree
+_VISIT_NODE = 0
+_VISIT_RIGHT_CHILD = 1
+_LEAVE_NODE = 2
+
+
+class LeafStore:
+    # compact (CSR-like) storage of the leaves of one tree
+    # path of the leaf i is stored in path_split_ids[path_indptr[i]:path_indptr[i + 1]]
+    # (and the expected compare results in path_directions, in the same range)
+    # classes - chosen class of each leaf (argmax of the scikit values)
+    # class_distributions - optional (number_of_leaves x number_of_classes) float32 values of the leaves
+
+    def __init__(self, path_indptr: np.ndarray, path_split_ids: np.ndarray, path_directions: np.ndarray,
+                 classes: np.ndarray, class_distributions: np.ndarray = None):
+        self.path_indptr = path_indptr
+        self.path_split_ids = path_split_ids
+        self.path_directions = path_directions
+        self.classes = classes
+        self.class_distributions = class_distributions
+
+    @property
+    def number_of_leaves(self) -> int:
+        return len(self.path_indptr) - 1
+
+    @property
+    def path_lengths(self) -> np.ndarray:
+        return np.diff(self.path_indptr)
+
+    def path(self, leaf_id: int) -> (np.ndarray, np.ndarray):
+        start = self.path_indptr[leaf_id]
+        stop = self.path_indptr[leaf_id + 1]
+
+        return self.path_split_ids[start:stop], self.path_directions[start:stop]
+
+    def padded_paths(self) -> (np.ndarray, np.ndarray):
+        # paths as (number_of_leaves x max_depth) matrices, unused positions are filled with 0
+        path_lengths = self.path_lengths
+        max_depth = int(path_lengths.max()) if self.number_of_leaves > 0 else 0
+
+        rows = np.repeat(np.arange(self.number_of_leaves), path_lengths)
+        columns = np.arange(len(self.path_split_ids)) - np.repeat(self.path_indptr[:-1], path_lengths)
+
+        split_ids = np.zeros((self.number_of_leaves, max_depth), dtype=self.path_split_ids.dtype)
+        directions = np.zeros((self.number_of_leaves, max_depth), dtype=self.path_directions.dtype)
+        split_ids[rows, columns] = self.path_split_ids
+        directions[rows, columns] = self.path_directions
+
+        return split_ids, directions
+
+    @classmethod
+    def from_arrays(cls, arrays: TreeArrays, class_distributions: np.ndarray = None):
+        number_of_splits = arrays.number_of_splits
+        path_lengths = np.zeros(arrays.number_of_leaves, dtype=np.int64)
+        path_split_ids = []
+        path_directions = []
+        leaves_order = []
+
+        # iterative traversal of the tree, the current path is modified in place and copied only to the leaves
+        current_split_ids = []
+        current_directions = []
+
+        nodes_to_visit = [(arrays.root, _VISIT_NODE)]
+        while nodes_to_visit:
+            node, action = nodes_to_visit.pop()
+
+            if action == _VISIT_NODE and node < number_of_splits:
+                current_split_ids.append(node)
+                current_directions.append(0)
+                nodes_to_visit.append((node, _VISIT_RIGHT_CHILD))
+                nodes_to_visit.append((arrays.children_left[node], _VISIT_NODE))
+            elif action == _VISIT_NODE:
+                leaf_id = node - number_of_splits
+                leaves_order.append(leaf_id)
+                path_lengths[leaf_id] = len(current_split_ids)
+                path_split_ids += current_split_ids
+                path_directions += current_directions
+            elif action == _VISIT_RIGHT_CHILD:
+                current_directions[-1] = 1
+                nodes_to_visit.append((node, _LEAVE_NODE))
+                nodes_to_visit.append((arrays.children_right[node], _VISIT_NODE))
+            else:
+                current_split_ids.pop()
+                current_directions.pop()
+
+        path_indptr = np.zeros(arrays.number_of_leaves + 1, dtype=np.int64)
+        np.cumsum(path_lengths, out=path_indptr[1:])
+        path_split_ids = np.array(path_split_ids, dtype=np.int32)
+        path_directions = np.array(path_directions, dtype=np.uint8)
+
+        # paths were collected in the traversal order, reorder them by leaf ID if it is different
+        leaves_order = np.array(leaves_order, dtype=np.intp)
+        if np.any(leaves_order != np.arange(len(leaves_order))):
+            collected_indptr = np.zeros(len(leaves_order) + 1, dtype=np.int64)
+            np.cumsum(path_lengths[leaves_order], out=collected_indptr[1:])
+            positions = np.empty(len(leaves_order), dtype=np.intp)
+            positions[leaves_order] = np.arange(len(leaves_order))
+            gather = np.concatenate(
+                [np.arange(collected_indptr[p], collected_indptr[p + 1]) for p in positions] + [np.zeros(0, np.intp)]
+            )
+            path_split_ids = path_split_ids[gather]
+            path_directions = path_directions[gather]
+
+        if class_distributions is not None:
+            class_distributions = np.asarray(class_distributions, dtype=np.float32)
+
+        return cls(path_indptr, path_split_ids, path_directions, arrays.leaf_class, class_distributions)
@@ -0,0 +1,190 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from decision_trees.utils.constants import ClassifierType
+from decision_trees.vhdl_generators import leaf_minimizer
+from decision_trees.vhdl_generators.random_forest import RandomForest
+from decision_trees.vhdl_generators.rom_tree import RomTree
+from decision_trees.vhdl_generators.threshold_encoder import ThresholdEncoding
+from decision_trees.vhdl_generators.tree import Tree
+from decision_trees.vhdl_generators.tree_arrays import TreeArrays
+
+# file format of the converted Tree / RandomForest
+# the model is a directory with header.json and one .npy file per array. Arrays of all the trees are concatenated,
+# offsets arrays store where each tree starts. The .npy files are loaded with mmap_mode='r', so opening even a very
+# big forest is instant and all the processes using the same model share the same memory pages.
+# regression trees store the values of their leaves (leaf_values, indexed by the class) and their fixed point format
+# in the header, older models without them are loaded as the classification models; all the trees of the forest
+# use the same fixed point format (the one of the output of the forest, checked when the model is saved)
+# the architecture of the generated vhdl is stored in the header too: the pipeline stages, the threshold encoding,
+# the number of lanes and the ROM parameters of each tree, the shared comparators / subtrees and the vote fan-in
+# of the forest. The minimized terms of the trees (see Tree.minimize) are not stored, only the flag - the arrays
+# are saved already simplified and the terms are calculated again from them when the model is loaded
+
+FORMAT_VERSION = 1
+HEADER_FILENAME = "header.json"
+ARRAYS_EXTENSION = ".npy"
+
+# arrays indexed by split
+SPLITS_ARRAYS = ["feature", "threshold", "threshold_code", "children_left", "children_right"]
+# arrays indexed by leaf
+LEAVES_ARRAYS = ["leaf_class"]
+
+
+def save_model(classifier, path: str):
+    if isinstance(classifier, Tree):
+        classifier_type = ClassifierType.DECISION_TREE
+        trees = [classifier]
+    elif isinstance(classifier, RandomForest):
+        classifier_type = ClassifierType.RANDOM_FOREST
+        trees = classifier.random_forest
+    else:
+        raise ValueError("Unknown type of classifier!")
+
+    all_arrays = [tree.arrays for tree in trees]
+    arrays_to_save = {
+        "roots": np.array([arrays.root for arrays in all_arrays], dtype=np.int64),
+        "splits_offsets": np.cumsum([0] + [arrays.number_of_splits for arrays in all_arrays], dtype=np.int64),
+        "leaves_offsets": np.cumsum([0] + [arrays.number_of_leaves for arrays in all_arrays], dtype=np.int64),
+    }
+    # children are stored as indices within their own tree, so slices of the loaded arrays can be used directly
+    for name in SPLITS_ARRAYS + LEAVES_ARRAYS:
+        arrays_to_save[name] = np.concatenate([getattr(arrays, name) for arrays in all_arrays])
+    for name in ["feature", "children_left", "children_right", "leaf_class"]:
+        arrays_to_save[name] = arrays_to_save[name].astype(np.int32)
+    flag_regression = any(tree.flag_regression for tree in trees)
+    if flag_regression and any((tree.number_of_bits_per_leaf_value, tree.number_of_fraction_bits)
+                               != (classifier.number_of_bits_per_leaf_value, classifier.number_of_fraction_bits)
+                               for tree in trees):
+        # the outputs of all the trees of the forest have the fixed point format of its output
+        raise ValueError("All the regression trees have to use the fixed point format of the forest!")
+    if flag_regression:
+        arrays_to_save["leaf_values"] = np.concatenate([tree.leaf_values for tree in trees])
+        arrays_to_save["leaf_values_offsets"] = np.cumsum([0] + [len(tree.leaf_values) for tree in trees],
+                                                          dtype=np.int64)
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "classifier_type": classifier_type.name,
+        "name": classifier.filename,
+        "number_of_features": classifier._number_of_features,
+        "number_of_bits_per_feature": classifier._number_of_bits_per_feature,
+        "number_of_classes": max(arrays.number_of_classes for arrays in all_arrays),
+        "number_of_trees": len(trees),
+        "trees_names": [tree.filename for tree in trees],
+        "flag_regression": flag_regression,
+        "number_of_bits_per_leaf_value": classifier.number_of_bits_per_leaf_value,
+        "number_of_fraction_bits": classifier.number_of_fraction_bits if flag_regression else None,
+        "number_of_lanes": classifier.number_of_lanes,
+        "trees_hardware": [_tree_hardware(tree) for tree in trees],
+        "arrays": {name: {"dtype": array.dtype.str, "shape": list(array.shape)}
+                   for name, array in arrays_to_save.items()},
+    }
+    if classifier_type == ClassifierType.RANDOM_FOREST:
+        header["flag_shared_comparators"] = classifier.flag_shared_comparators
+        header["flag_shared_subtrees"] = classifier.flag_shared_subtrees
+        header["vote_fan_in"] = classifier.vote_fan_in
+
+    # the model is written to a temporary directory and moved to path when it is complete, so an interrupted
+    # saving never leaves an incomplete model (or a mix of the old and the new one)
+    path = os.path.normpath(path)
+    temporary_path = path + "." + str(os.getpid()) + ".tmp"
+    old_path = path + "." + str(os.getpid()) + ".old"
+    try:
+        os.makedirs(temporary_path)
+        for name, array in arrays_to_save.items():
+            np.save(os.path.join(temporary_path, name + ARRAYS_EXTENSION), array)
+        with open(os.path.join(temporary_path, HEADER_FILENAME), "w") as header_file:
+            json.dump(header, header_file, indent=4)
+
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(temporary_path, path)
+    finally:
+        for path_to_remove in (temporary_path, old_path):
+            if os.path.exists(path_to_remove):
+                shutil.rmtree(path_to_remove)
+
+
+def _tree_hardware(tree: Tree) -> dict:
+    # parameters of the generated vhdl of the tree, that are not stored in its arrays
+    flag_rom = isinstance(tree, RomTree)
+    return {
+        "number_of_pipeline_stages": tree.number_of_pipeline_stages,
+        "threshold_encoding": tree.threshold_encoding.name,
+        "number_of_lanes": tree.number_of_lanes,
+        "flag_minimized": tree._decision_terms is not None,
+        "number_of_interleaved_samples": tree.number_of_interleaved_samples if flag_rom else None,
+        "minimal_number_of_levels": tree.minimal_number_of_levels if flag_rom else None,
+    }
+
+
+def load_model(path: str, mmap_mode: str = "r"):
+    with open(os.path.join(path, HEADER_FILENAME)) as header_file:
+        header = json.load(header_file)
+
+    if header["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format version: {header['format_version']}")
+
+    loaded_arrays = {name: np.load(os.path.join(path, name + ARRAYS_EXTENSION), mmap_mode=mmap_mode)
+                     for name in header["arrays"]}
+
+    number_of_features = header["number_of_features"]
+    number_of_bits_per_feature = header["number_of_bits_per_feature"]
+
+    trees = []
+    for i, tree_name in enumerate(header["trees_names"]):
+        splits = slice(loaded_arrays["splits_offsets"][i], loaded_arrays["splits_offsets"][i + 1])
+        leaves = slice(loaded_arrays["leaves_offsets"][i], loaded_arrays["leaves_offsets"][i + 1])
+
+        leaf_values = None
+        number_of_classes = header["number_of_classes"]
+        if header.get("flag_regression", False):
+            leaf_values = loaded_arrays["leaf_values"][loaded_arrays["leaf_values_offsets"][i]:
+                                                       loaded_arrays["leaf_values_offsets"][i + 1]]
+            # the class of the leaf is the index of its value
+            number_of_classes = len(leaf_values)
+
+        tree_hardware = header["trees_hardware"][i]
+        if tree_hardware["number_of_interleaved_samples"] is not None:
+            tree = RomTree(tree_name, number_of_features, number_of_bits_per_feature,
+                           tree_hardware["number_of_interleaved_samples"], tree_hardware["minimal_number_of_levels"])
+        else:
+            tree = Tree(tree_name, number_of_features, number_of_bits_per_feature)
+        tree.number_of_pipeline_stages = tree_hardware["number_of_pipeline_stages"]
+        tree.threshold_encoding = ThresholdEncoding[tree_hardware["threshold_encoding"]]
+        tree.number_of_lanes = tree_hardware["number_of_lanes"]
+        tree.set_arrays(TreeArrays(
+            loaded_arrays["feature"][splits],
+            loaded_arrays["threshold"][splits],
+            loaded_arrays["threshold_code"][splits],
+            loaded_arrays["children_left"][splits],
+            loaded_arrays["children_right"][splits],
+            loaded_arrays["leaf_class"][leaves],
+            int(loaded_arrays["roots"][i]),
+            number_of_classes,
+        ))
+        if leaf_values is not None:
+            tree.set_leaf_values(leaf_values, header["number_of_bits_per_leaf_value"],
+                                 header["number_of_fraction_bits"])
+        if tree_hardware["flag_minimized"]:
+            tree._decision_terms = leaf_minimizer.minimize_class_terms(tree.arrays, tree.leaf_store)
+        trees.append(tree)
+
+    if header["classifier_type"] == ClassifierType.DECISION_TREE.name:
+        return trees[0]
+
+    if header["classifier_type"] == ClassifierType.RANDOM_FOREST.name:
+        random_forest = RandomForest(header["name"], number_of_features, number_of_bits_per_feature,
+                                     header["flag_shared_comparators"], header["vote_fan_in"],
+                                     header["flag_shared_subtrees"])
+        random_forest.number_of_lanes = header["number_of_lanes"]
+        if header.get("flag_regression", False):
+            random_forest.number_of_bits_per_leaf_value = header["number_of_bits_per_leaf_value"]
+        random_forest.set_trees(trees)
+        return random_forest
+
+    raise ValueError(f"Unknown type of classifier: {header['classifier_type']}")
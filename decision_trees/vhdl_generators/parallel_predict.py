@@ -0,0 +1,113 @@
+import concurrent.futures
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# parallel evaluation of a forest - trees are split into shards (one QuickScorer per shard) and samples into chunks,
+# each (shard, chunk) task returns partial votes that are added together (or, for the regression forests,
+# the classes chosen by the trees of the shard, placed in their columns of the result)
+# numpy releases the GIL, so threads are used by default; with processes the input data is placed in shared memory
+# once, and workers only get the name of the memory block and the range of samples to process
+
+# state of the worker process, set once by the initializer, so the trees are not sent with every task
+_worker_quick_scorers = None
+
+
+def split_into_chunks(number_of_samples: int, number_of_chunks: int) -> [(int, int)]:
+    boundaries = np.linspace(0, number_of_samples, number_of_chunks + 1).astype(np.intp)
+
+    return [(int(start), int(stop)) for start, stop in zip(boundaries[:-1], boundaries[1:]) if stop > start]
+
+
+def _initialize_worker(quick_scorers: []):
+    global _worker_quick_scorers
+    _worker_quick_scorers = quick_scorers
+
+
+def _predict_chunk(quick_scorer, input_data: np.ndarray, number_of_classes: int) -> np.ndarray:
+    # partial votes of the shard, or the classes chosen by its trees when number_of_classes is None
+    if number_of_classes is None:
+        return quick_scorer.predict_trees(input_data)
+    return quick_scorer.predict_votes(input_data, number_of_classes)
+
+
+def _process_task(shared_memory_name: str, shape: (int, int), dtype: str,
+                  start: int, stop: int, shard_index: int, number_of_classes: int) -> (int, int, np.ndarray):
+    input_memory = shared_memory.SharedMemory(name=shared_memory_name)
+    try:
+        input_data = np.ndarray(shape, dtype=dtype, buffer=input_memory.buf)
+        result = _predict_chunk(_worker_quick_scorers[shard_index], input_data[start:stop], number_of_classes)
+        # all views of the shared memory have to be released before it is closed
+        del input_data
+    finally:
+        input_memory.close()
+
+    return shard_index, start, result
+
+
+def _thread_task(quick_scorer, input_data: np.ndarray, start: int, stop: int, shard_index: int,
+                 number_of_classes: int) -> (int, int, np.ndarray):
+    return shard_index, start, _predict_chunk(quick_scorer, input_data[start:stop], number_of_classes)
+
+
+def _run_tasks(quick_scorers: [], input_data: np.ndarray, number_of_classes: int, n_jobs: int,
+               flag_use_processes: bool):
+    # yields (shard_index, start, result) of each (shard, chunk) task, in the order of completion
+    number_of_samples = len(input_data)
+
+    # when there are fewer shards than jobs, the samples are split as well to keep all the workers busy
+    number_of_chunks = max(1, (2 * n_jobs + len(quick_scorers) - 1) // len(quick_scorers))
+    chunks = split_into_chunks(number_of_samples, number_of_chunks)
+
+    if not flag_use_processes:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(_thread_task, quick_scorer, input_data, start, stop, shard_index,
+                                       number_of_classes)
+                       for shard_index, quick_scorer in enumerate(quick_scorers) for start, stop in chunks]
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+        return
+
+    input_memory = shared_memory.SharedMemory(create=True, size=max(1, input_data.nbytes))
+    try:
+        shared_input_data = np.ndarray(input_data.shape, dtype=input_data.dtype, buffer=input_memory.buf)
+        shared_input_data[:] = input_data
+        del shared_input_data
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs, initializer=_initialize_worker,
+                                                    initargs=(quick_scorers,)) as executor:
+            futures = [executor.submit(_process_task, input_memory.name, input_data.shape, input_data.dtype.str,
+                                       start, stop, shard_index, number_of_classes)
+                       for shard_index in range(len(quick_scorers)) for start, stop in chunks]
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+    finally:
+        input_memory.close()
+        input_memory.unlink()
+
+
+def predict_votes(quick_scorers: [], input_data: np.ndarray, number_of_classes: int,
+                  n_jobs: int, flag_use_processes: bool = False) -> np.ndarray:
+    input_data = np.ascontiguousarray(input_data)
+    votes = np.zeros((len(input_data), number_of_classes), dtype=np.intp)
+
+    for _, start, partial_votes in _run_tasks(quick_scorers, input_data, number_of_classes, n_jobs,
+                                              flag_use_processes):
+        votes[start:start + len(partial_votes)] += partial_votes
+
+    return votes
+
+
+def predict_trees(quick_scorers: [], input_data: np.ndarray, n_jobs: int,
+                  flag_use_processes: bool = False) -> np.ndarray:
+    # (number_of_samples x number_of_trees) matrix of the classes chosen by the trees of all the shards (in the order
+    # of the shards), used by the regression forests, where the results of the trees are not counted as votes
+    input_data = np.ascontiguousarray(input_data)
+    shards_offsets = np.cumsum([0] + [quick_scorer.number_of_trees for quick_scorer in quick_scorers])
+    trees_classes = np.zeros((len(input_data), shards_offsets[-1]), dtype=np.intp)
+
+    for shard_index, start, shard_classes in _run_tasks(quick_scorers, input_data, None, n_jobs, flag_use_processes):
+        trees_classes[start:start + len(shard_classes),
+                      shards_offsets[shard_index]:shards_offsets[shard_index + 1]] = shard_classes
+
+    return trees_classes
@@ -0,0 +1,196 @@
+import hashlib
+import importlib.util
+import os
+
+import numpy as np
+
+from decision_trees.vhdl_generators.tree_arrays import TreeArrays
+
+# generates python code of the trees (in the same way as tests/analyse_classifier.tree_to_code does),
+# saves it as a module and imports it
+# modules are cached - the name of the file contains the hash of the trees structure,
+# so the code is generated again only when the trees change
+# generated functions use float thresholds, so they expect quantized float data (not the integer codes)
+
+# has to be changed every time the generated code changes, so old modules in cache are not used
+GENERATOR_VERSION = 2
+
+FILE_EXTENSION = ".py"
+
+# python does not allow too many levels of indentation, deeper parts of the tree are moved to separate functions
+MAX_NESTED_IFS = 50
+
+
+def structure_hash(all_arrays: []) -> str:
+    hash_ = hashlib.sha256()
+    hash_.update(str(GENERATOR_VERSION).encode())
+
+    for arrays in all_arrays:
+        hash_.update(str((arrays.root, arrays.number_of_classes)).encode())
+        hash_.update(np.ascontiguousarray(arrays.threshold, dtype=np.float64).tobytes())
+        # the same types are used for all the integer arrays, so the hash does not depend on how they were stored
+        for array in (arrays.feature, arrays.children_left, arrays.children_right, arrays.leaf_class):
+            hash_.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+
+    return hash_.hexdigest()
+
+
+def _threshold_to_code(threshold) -> str:
+    # repr gives the shortest string that is converted back to exactly the same float
+    return repr(float(threshold))
+
+
+def _generate_one_sample_function(arrays: TreeArrays, function_name: str) -> [str]:
+    # nested ifs, returns the class for one sample
+    lines = []
+    functions_to_generate = [(function_name, arrays.root)]
+
+    while functions_to_generate:
+        name, first_node = functions_to_generate.pop()
+        lines.append(f"def {name}(input_data):")
+
+        nodes_to_visit = [(first_node, 1, None)]
+        while nodes_to_visit:
+            node, depth, prefix_line = nodes_to_visit.pop()
+            indent = "    " * depth
+            if prefix_line is not None:
+                lines.append("    " * (depth - 1) + prefix_line)
+
+            if node >= arrays.number_of_splits:
+                lines.append(f"{indent}return {arrays.leaf_class[node - arrays.number_of_splits]}")
+            elif depth > MAX_NESTED_IFS:
+                subtree_function_name = f"{function_name}_node_{node}"
+                functions_to_generate.append((subtree_function_name, node))
+                lines.append(f"{indent}return {subtree_function_name}(input_data)")
+            else:
+                feature = arrays.feature[node]
+                threshold = _threshold_to_code(arrays.threshold[node])
+                lines.append(f"{indent}if input_data[{feature}] <= {threshold}:")
+                # right child is visited after the whole left subtree, preceded by the else
+                nodes_to_visit.append((arrays.children_right[node], depth + 1, "else:"))
+                nodes_to_visit.append((arrays.children_left[node], depth + 1, None))
+
+        lines.append("")
+        lines.append("")
+
+    return lines
+
+
+def _generate_batch_function(arrays: TreeArrays, function_name: str) -> [str]:
+    # cascade of np.where, one for each split, returns the classes for the whole batch
+    # splits are processed in postorder, so the results of the children are already available for their parent;
+    # results are stored in variables named after the depth of the node, to keep only a few arrays in memory
+    lines = [f"def {function_name}(input_data):"]
+
+    def result_name(node, depth, is_left: bool) -> str:
+        if node >= arrays.number_of_splits:
+            return str(arrays.leaf_class[node - arrays.number_of_splits])
+        return f"{'left' if is_left else 'right'}_{depth}"
+
+    if arrays.root >= arrays.number_of_splits:
+        lines.append(f"    return np.full(len(input_data), {arrays.leaf_class[0]})")
+    else:
+        nodes_to_visit = [(arrays.root, 0, True, False)]
+        while nodes_to_visit:
+            node, depth, is_left, children_visited = nodes_to_visit.pop()
+            if node >= arrays.number_of_splits:
+                continue
+
+            left = arrays.children_left[node]
+            right = arrays.children_right[node]
+            if not children_visited:
+                nodes_to_visit.append((node, depth, is_left, True))
+                nodes_to_visit.append((right, depth + 1, False, False))
+                nodes_to_visit.append((left, depth + 1, True, False))
+            else:
+                feature = arrays.feature[node]
+                threshold = _threshold_to_code(arrays.threshold[node])
+                lines.append(f"    {result_name(node, depth, is_left)} = np.where("
+                             f"input_data[:, {feature}] <= {threshold}, "
+                             f"{result_name(left, depth + 1, True)}, {result_name(right, depth + 1, False)})")
+
+        lines.append("    return left_0")
+
+    lines.append("")
+    lines.append("")
+
+    return lines
+
+
+def generate_tree_code(arrays: TreeArrays) -> str:
+    lines = ["import numpy as np", "", ""]
+    lines += [f"NUMBER_OF_CLASSES = {arrays.number_of_classes}", "", ""]
+    lines += _generate_one_sample_function(arrays, "predict_one_sample")
+    lines += _generate_batch_function(arrays, "predict")
+
+    return "\n".join(lines)
+
+
+def generate_forest_code(all_arrays: []) -> str:
+    number_of_classes = max(arrays.number_of_classes for arrays in all_arrays)
+
+    lines = ["import numpy as np", "", ""]
+    lines += [f"NUMBER_OF_CLASSES = {number_of_classes}", "", ""]
+
+    for i, arrays in enumerate(all_arrays):
+        lines += _generate_one_sample_function(arrays, f"predict_one_sample_tree_{i}")
+        lines += _generate_batch_function(arrays, f"predict_tree_{i}")
+
+    trees_names = ", ".join(f"predict_tree_{i}" for i in range(len(all_arrays)))
+    one_sample_trees_names = ", ".join(f"predict_one_sample_tree_{i}" for i in range(len(all_arrays)))
+    lines += [
+        f"TREES = [{trees_names}]",
+        f"ONE_SAMPLE_TREES = [{one_sample_trees_names}]",
+        "",
+        "",
+        "def predict_trees(input_data):",
+        "    return np.stack([tree(input_data) for tree in TREES], axis=1)",
+        "",
+        "",
+        "def predict(input_data):",
+        "    trees_results = predict_trees(input_data)",
+        "    number_of_samples = len(trees_results)",
+        "    flat_indices = np.arange(number_of_samples)[:, None] * NUMBER_OF_CLASSES + trees_results",
+        "    votes = np.bincount(flat_indices.ravel(), minlength=number_of_samples * NUMBER_OF_CLASSES)",
+        "    # in case of a tie the class with the lowest index is chosen (same as in RandomForest)",
+        "    return np.argmax(votes.reshape(number_of_samples, NUMBER_OF_CLASSES), axis=1)",
+        "",
+        "",
+        "def predict_one_sample(input_data):",
+        "    votes = [0] * NUMBER_OF_CLASSES",
+        "    for tree in ONE_SAMPLE_TREES:",
+        "        votes[tree(input_data)] += 1",
+        "    return votes.index(max(votes))",
+        "",
+    ]
+
+    return "\n".join(lines)
+
+
+def _import_module_from_file(module_name: str, filename: str):
+    spec = importlib.util.spec_from_file_location(module_name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def compile_predictor(name: str, all_arrays: [], path: str, flag_forest: bool):
+    # returns the imported module with predict(input_data) and predict_one_sample(input_data) functions
+    module_name = name + "_" + structure_hash(all_arrays)[:16]
+    filename = os.path.join(path, module_name + FILE_EXTENSION)
+
+    if not os.path.isfile(filename):
+        if flag_forest:
+            code = generate_forest_code(all_arrays)
+        else:
+            code = generate_tree_code(all_arrays[0])
+
+        os.makedirs(path, exist_ok=True)
+        # write to a temporary file first, so other processes never import partially written module
+        temporary_filename = filename + "." + str(os.getpid()) + ".tmp"
+        with open(temporary_filename, "w") as file_to_write:
+            file_to_write.write(code)
+        os.replace(temporary_filename, filename)
+
+    return _import_module_from_file(module_name, filename)
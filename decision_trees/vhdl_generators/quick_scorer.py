@@ -0,0 +1,210 @@
+import numpy as np
+
+from decision_trees.vhdl_generators.tree_arrays import TreeArrays
+
+# QuickScorer-like evaluation of a set of trees
+# (based on: Lucchese et al., "QuickScorer: a Fast Algorithm to Rank Documents with Additive Ensembles of
+# Regression Trees").
+# Each tree has a bitvector with one bit per leaf (leaves ordered from left to right). Every split whose comparision
+# is false (value > threshold) clears bits of all the leaves in its left subtree. The leftmost leaf that was not
+# cleared is the one reached by the traversal of the tree. Splits of all the trees are grouped by feature and sorted
+# by threshold, so for each feature only the splits with thresholds lower than the value have to be processed.
+
+BITS_PER_WORD = 64
+ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# maximal size of the bitvectors kept in memory for one block of samples
+DEFAULT_BLOCK_MEMORY = 4 * 1024 * 1024
+
+
+def count_votes(trees_results: np.ndarray, number_of_classes: int) -> np.ndarray:
+    # (number_of_samples x number_of_trees) matrix of classes -> (number_of_samples x number_of_classes) votes
+    number_of_samples = len(trees_results)
+    flat_indices = np.arange(number_of_samples)[:, None] * number_of_classes + trees_results
+
+    return np.bincount(flat_indices.ravel(), minlength=number_of_samples * number_of_classes)\
+        .reshape(number_of_samples, number_of_classes)
+
+
+def _leaves_from_left_to_right(arrays: TreeArrays):
+    # returns leaves IDs ordered from left to right and, for every split,
+    # the position of the first leaf of its left and right subtree
+    number_of_splits = arrays.number_of_splits
+    first_leaf_position = np.zeros(number_of_splits + arrays.number_of_leaves, dtype=np.intp)
+    leaves_order = []
+
+    nodes_to_visit = [arrays.root]
+    while nodes_to_visit:
+        node = nodes_to_visit.pop()
+        first_leaf_position[node] = len(leaves_order)
+        if node < number_of_splits:
+            # right child is visited after the whole left subtree
+            nodes_to_visit.append(arrays.children_right[node])
+            nodes_to_visit.append(arrays.children_left[node])
+        else:
+            leaves_order.append(node - number_of_splits)
+
+    left_subtree_start = first_leaf_position[:number_of_splits]
+    right_subtree_start = first_leaf_position[arrays.children_right]
+
+    return np.array(leaves_order, dtype=np.intp), left_subtree_start, right_subtree_start
+
+
+class QuickScorer:
+
+    def __init__(self, trees: []):
+        self.number_of_trees = len(trees)
+
+        all_arrays = [tree.arrays for tree in trees]
+        self.number_of_words = max(
+            [(arrays.number_of_leaves + BITS_PER_WORD - 1) // BITS_PER_WORD for arrays in all_arrays] + [1]
+        )
+
+        # leaf tables of all the trees, indexed by tree offset + leaf position (from left to right)
+        self._leaves_offsets = np.zeros(self.number_of_trees, dtype=np.intp)
+        leaves_ids = []
+        leaves_classes = []
+
+        # one entry per split and bitvector word that is modified by this split
+        entries_split = []
+        entries_word = []
+        entries_mask = []
+
+        splits_tree = []
+        splits_feature = []
+        splits_threshold = []
+        splits_threshold_code = []
+
+        leaves_offset = 0
+        for tree_index, arrays in enumerate(all_arrays):
+            leaves_order, left_start, right_start = _leaves_from_left_to_right(arrays)
+            self._leaves_offsets[tree_index] = leaves_offset
+            leaves_offset += arrays.number_of_leaves
+            leaves_ids.append(leaves_order)
+            leaves_classes.append(arrays.leaf_class[leaves_order])
+
+            for split_id in range(arrays.number_of_splits):
+                global_split_index = len(splits_tree)
+                splits_tree.append(tree_index)
+                splits_feature.append(arrays.feature[split_id])
+                splits_threshold.append(arrays.threshold[split_id])
+                splits_threshold_code.append(arrays.threshold_code[split_id])
+
+                # bits [first, last) have to be cleared when the comparision is false
+                first = int(left_start[split_id])
+                last = int(right_start[split_id])
+                for word in range(first // BITS_PER_WORD, (last - 1) // BITS_PER_WORD + 1):
+                    word_start = word * BITS_PER_WORD
+                    lower = max(first, word_start) - word_start
+                    upper = min(last, word_start + BITS_PER_WORD) - word_start
+                    cleared_bits = ((1 << upper) - 1) ^ ((1 << lower) - 1)
+                    entries_split.append(global_split_index)
+                    entries_word.append(word)
+                    entries_mask.append(~cleared_bits & 0xFFFFFFFFFFFFFFFF)
+
+        self._leaves_ids = np.concatenate(leaves_ids) if leaves_ids else np.zeros(0, dtype=np.intp)
+        self._leaves_classes = np.concatenate(leaves_classes) if leaves_classes else np.zeros(0, dtype=np.intp)
+
+        splits_tree = np.array(splits_tree, dtype=np.intp)
+        splits_feature = np.array(splits_feature, dtype=np.intp)
+        splits_threshold = np.array(splits_threshold, dtype=np.float64)
+        splits_threshold_code = np.array(splits_threshold_code, dtype=np.int64)
+        entries_split = np.array(entries_split, dtype=np.intp)
+        entries_word = np.array(entries_word, dtype=np.intp)
+        entries_mask = np.array(entries_mask, dtype=np.uint64)
+
+        # sort the splits by feature, then by threshold, and assign each split a rank among the splits
+        # of its tree with the same feature - splits with the same (feature, rank) are processed together,
+        # as there is at most one of them per tree
+        order = np.lexsort((splits_threshold, splits_tree, splits_feature))
+        rank = np.zeros(len(order), dtype=np.intp)
+        for i in range(1, len(order)):
+            previous, current = order[i - 1], order[i]
+            if splits_feature[previous] == splits_feature[current] and splits_tree[previous] == splits_tree[current]:
+                rank[current] = rank[previous] + 1
+
+        # groups are stored per feature, in the order of increasing rank
+        self._groups = {}
+        groups_order = np.lexsort((rank, splits_feature))
+        entries_order = np.argsort(entries_split, kind="stable")
+        entries_start = np.searchsorted(entries_split[entries_order], np.arange(len(splits_tree) + 1))
+        boundaries = np.flatnonzero(
+            (np.diff(splits_feature[groups_order]) != 0) | (np.diff(rank[groups_order]) != 0)
+        ) + 1
+        for group in np.split(groups_order, boundaries):
+            if len(group) == 0:
+                continue
+            group_entries = np.concatenate(
+                [entries_order[entries_start[split]:entries_start[split + 1]] for split in group]
+            )
+            split_position = np.repeat(np.arange(len(group)),
+                                       entries_start[group + 1] - entries_start[group])
+            # bitvectors are stored as (number_of_trees * number_of_words) rows of words, one word per sample
+            entries_row = splits_tree[entries_split[group_entries]] * self.number_of_words + \
+                entries_word[group_entries]
+            self._groups.setdefault(int(splits_feature[group[0]]), []).append((
+                splits_threshold[group, None],
+                splits_threshold_code[group, None],
+                split_position,
+                entries_row,
+                entries_mask[group_entries, None],
+            ))
+
+    def apply(self, input_data: np.ndarray, block_memory: int = DEFAULT_BLOCK_MEMORY) -> np.ndarray:
+        # returns (number_of_samples x number_of_trees) matrix of the leaves IDs
+        input_data = np.asarray(input_data)
+        positions = self._exit_leaves_positions(input_data, block_memory)
+
+        return self._leaves_ids[positions]
+
+    def predict_trees(self, input_data: np.ndarray, block_memory: int = DEFAULT_BLOCK_MEMORY) -> np.ndarray:
+        # returns (number_of_samples x number_of_trees) matrix of the classes chosen by each of the trees
+        input_data = np.asarray(input_data)
+        positions = self._exit_leaves_positions(input_data, block_memory)
+
+        return self._leaves_classes[positions]
+
+    def predict_votes(self, input_data: np.ndarray, number_of_classes: int,
+                      block_memory: int = DEFAULT_BLOCK_MEMORY) -> np.ndarray:
+        return count_votes(self.predict_trees(input_data, block_memory), number_of_classes)
+
+    def _exit_leaves_positions(self, input_data: np.ndarray, block_memory: int) -> np.ndarray:
+        positions = np.empty((len(input_data), self.number_of_trees), dtype=np.intp)
+        block_size = max(1, block_memory // (self.number_of_trees * self.number_of_words * 8 + 1))
+
+        for start in range(0, len(input_data), block_size):
+            block = input_data[start:start + block_size]
+            bitvectors = self._compute_bitvectors(block)
+            positions[start:start + block_size] = self._leftmost_bits(bitvectors) + self._leaves_offsets
+
+        return positions
+
+    def _compute_bitvectors(self, block: np.ndarray) -> np.ndarray:
+        bitvectors = np.full((self.number_of_trees * self.number_of_words, len(block)), ALL_ONES, dtype=np.uint64)
+        # integer codes are compared with the integer thresholds, the same as in vhdl
+        flag_integer_data = np.issubdtype(block.dtype, np.integer)
+
+        for feature, groups in self._groups.items():
+            values = np.ascontiguousarray(block[:, feature])
+            for float_thresholds, integer_thresholds, split_position, entries_row, entries_mask in groups:
+                thresholds = integer_thresholds if flag_integer_data else float_thresholds
+                # same comparision as in the hardware, written this way to handle NaN values in the same way
+                false_splits = ~(values <= thresholds)
+                # thresholds of the next groups are not lower, so there is nothing more to do for this feature
+                if not false_splits.any():
+                    break
+
+                bitvectors[entries_row] &= np.where(false_splits[split_position], entries_mask, ALL_ONES)
+
+        return bitvectors.reshape(self.number_of_trees, self.number_of_words, len(block))
+
+    @staticmethod
+    def _leftmost_bits(bitvectors: np.ndarray) -> np.ndarray:
+        # position of the lowest set bit in each of the (number_of_trees x number_of_words x number_of_samples)
+        # bitvectors, returned as (number_of_samples x number_of_trees) matrix
+        words_indices = np.argmax(bitvectors != 0, axis=1)
+        words = np.take_along_axis(bitvectors, words_indices[:, None, :], axis=1)[:, 0, :]
+        lowest_bits = words & (~words + np.uint64(1))
+        bits_indices = np.log2(lowest_bits.astype(np.float64)).astype(np.intp)
+
+        return (words_indices * BITS_PER_WORD + bits_indices).T
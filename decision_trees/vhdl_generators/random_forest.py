@@ -1,42 +1,308 @@
 from decision_trees.vhdl_generators.VHDLCreator import VHDLCreator
 from decision_trees.vhdl_generators.tree import Tree
+from decision_trees.vhdl_generators.rom_tree import RomTree
+from decision_trees.vhdl_generators import rom_tree
+from decision_trees.vhdl_generators.quick_scorer import QuickScorer, count_votes
+from decision_trees.vhdl_generators.comparator_bank import ComparatorBank
+from decision_trees.vhdl_generators.subtree_pool import SubtreePool
+from decision_trees.vhdl_generators.threshold_encoder import ThresholdEncoding
+from decision_trees.vhdl_generators import parallel_predict
+from decision_trees.vhdl_generators import predictor_compiler
+from decision_trees.vhdl_generators import resource_estimator
+
+import concurrent.futures
+import copy
+import os
 
 import numpy as np
 import sklearn.ensemble
 
 from decision_trees.utils.constants import ClassifierType
+from decision_trees.utils.convert_to_fixed_point import get_fraction_bits
+
+
+def _build_tree(name: str, number_of_features: int, number_of_bits_per_feature: int, tree,
+                flag_keep_class_distributions: bool, number_of_bits_per_leaf_value: int = 16) -> Tree:
+    tree_builder = Tree(name, number_of_features, number_of_bits_per_feature,
+                        number_of_bits_per_leaf_value=number_of_bits_per_leaf_value)
+    tree_builder.build(tree, flag_keep_class_distributions)
+
+    return tree_builder
+
+
+def _create_tree_vhdl_file(tree: Tree, path: str) -> str:
+    tree.create_vhdl_file(path)
+
+    return tree.filename
 
 
 class RandomForest(VHDLCreator):
 
-    def __init__(self, name: str, number_of_features: int, number_of_bits_per_feature: int):
+    def __init__(self, name: str, number_of_features: int, number_of_bits_per_feature: int,
+                 flag_shared_comparators: bool = False, vote_fan_in: int = 4, flag_shared_subtrees: bool = False,
+                 number_of_bits_per_leaf_value: int = 16):
+        if vote_fan_in < 2:
+            raise ValueError("Vote fan-in has to be at least 2!")
+        if flag_shared_subtrees and not flag_shared_comparators:
+            raise ValueError("Shared subtrees require the shared comparators!")
+
         self.random_forest = []
+        self._quick_scorer = None
+        # with flag_shared_comparators the unique comparisions of all the trees are evaluated only once,
+        # both in predict_trees and in the generated vhdl (one compare process for the whole forest)
+        self.flag_shared_comparators = flag_shared_comparators
+        self._comparator_bank = None
+        # with flag_shared_subtrees the identical subtrees of all the trees are stored only once (see SubtreePool),
+        # predict_trees traverses the pool and the vhdl implements the decision logic of each shared subtree
+        # only once (the trees use the same splitResult bits, so it needs the shared comparators)
+        self.flag_shared_subtrees = flag_shared_subtrees
+        self._subtree_pool = None
+        # values of the leaves of all the regression trees (see trees_leaf_values)
+        self._trees_leaf_values = None
+        # number of values combined in one registered level of the vote module (partial sums added together
+        # in the adder trees and candidates compared in the comparator tree) - lower values give more
+        # pipeline stages (higher latency) with shorter combinational paths
+        self.vote_fan_in = vote_fan_in
+        # width of the fixed point values of the leaves of the regression trees (the same format is used
+        # by all the trees), the outputs of the trees are added by a pipelined adder tree (with vote_fan_in inputs
+        # per level) and the sum is divided by the number of trees
+        self.number_of_bits_per_leaf_value = number_of_bits_per_leaf_value
+        # QuickScorers for the shards of trees used in parallel prediction, indexed by the number of shards
+        self._shards_quick_scorers = {}
+        # trees used as the components of the generated vhdl (set only during create_vhdl_file)
+        self._trees_components = None
 
         VHDLCreator.__init__(self, name, ClassifierType.RANDOM_FOREST.name,
                              number_of_features, number_of_bits_per_feature)
 
-    def build(self, random_forest: sklearn.ensemble.RandomForestClassifier):
-        for i, tree in enumerate(random_forest.estimators_):
-            tree_builder = Tree("tree_" + str(i), self._number_of_features, self._number_of_bits_per_feature)
-            tree_builder.build(tree)
+    def build(self, random_forest: sklearn.ensemble.RandomForestClassifier, n_jobs: int = 1,
+              flag_keep_class_distributions: bool = False):
+        # with n_jobs > 1 the trees are converted in parallel, using a process pool
+        # RandomForestRegressor is converted to the regression trees (see Tree.leaf_values)
+        names = ["tree_" + str(i) for i in range(len(random_forest.estimators_))]
+        numbers_of_features = [self._number_of_features] * len(names)
+        numbers_of_bits_per_feature = [self._number_of_bits_per_feature] * len(names)
+        flags_keep_class_distributions = [flag_keep_class_distributions] * len(names)
+        numbers_of_bits_per_leaf_value = [self.number_of_bits_per_leaf_value] * len(names)
+
+        if n_jobs == 1:
+            trees = list(map(_build_tree, names, numbers_of_features, numbers_of_bits_per_feature,
+                             random_forest.estimators_, flags_keep_class_distributions,
+                             numbers_of_bits_per_leaf_value))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                trees = list(executor.map(_build_tree, names, numbers_of_features, numbers_of_bits_per_feature,
+                                          random_forest.estimators_, flags_keep_class_distributions,
+                                          numbers_of_bits_per_leaf_value,
+                                          chunksize=max(1, len(names) // (4 * n_jobs))))
+
+        if any(tree.flag_regression for tree in trees):
+            self._set_leaf_values_format(trees)
+        self.set_trees(trees)
+
+    def _set_leaf_values_format(self, trees: [Tree]):
+        # the outputs of the trees are added, so all of them use the same number of the fraction bits
+        max_abs_value = max(float(np.abs(tree.leaf_values).max(initial=0.0)) for tree in trees)
+        number_of_fraction_bits = get_fraction_bits(max_abs_value, self.number_of_bits_per_leaf_value)
+        for tree in trees:
+            tree.set_leaf_values(tree.leaf_values, self.number_of_bits_per_leaf_value, number_of_fraction_bits)
+
+    def use_rom_architecture(self, number_of_interleaved_samples: int = 1):
+        # all the trees are traversed with the nodes stored in ROMs (see RomTree), the number of levels is the same
+        # in all of them, so their results are ready in the same clock cycle
+        max_depth = max(tree.find_depth() for tree in self.random_forest)
+        self.set_trees([RomTree.from_tree(tree, number_of_interleaved_samples, max_depth)
+                        for tree in self.random_forest])
+
+    def select_architecture(self, available_luts: int, available_registers: int,
+                            number_of_interleaved_samples: int = 1):
+        # each tree chooses its architecture (see rom_tree.select_architecture) in an equal part of the available
+        # resources; the outputs of all the trees are voted in the same clock cycle, so if any of the trees needs
+        # the ROM architecture, all of them use it with the same number of levels (see use_rom_architecture)
+        number_of_trees = max(len(self.random_forest), 1)
+        selected_trees = [rom_tree.select_architecture(tree, available_luts // number_of_trees,
+                                                       available_registers // number_of_trees,
+                                                       number_of_interleaved_samples)
+                          for tree in self.random_forest]
+        if any(isinstance(tree, RomTree) for tree in selected_trees):
+            self.use_rom_architecture(number_of_interleaved_samples)
+
+    def minimize(self):
+        # see Tree.minimize
+        for tree in self.random_forest:
+            tree.minimize()
+        self.set_trees(self.random_forest)
 
-            self.random_forest.append(tree_builder)
+    def set_threshold_encoding(self, threshold_encoding: ThresholdEncoding):
+        # see Tree.threshold_encoding, not used with the shared comparators (one compare process for the forest)
+        for tree in self.random_forest:
+            tree.threshold_encoding = threshold_encoding
+
+    def set_trees(self, trees: [Tree]):
+        # used instead of build, when the trees are already available (e.g. loaded from a file)
+        if self.flag_shared_subtrees and any(tree.flag_regression for tree in trees):
+            # the leaves of the pool are identified by the class, which is local to each regression tree
+            raise ValueError("Regression trees can not share the subtrees!")
+        self.random_forest = list(trees)
+        self._quick_scorer = None
+        self._shards_quick_scorers = {}
+        self._comparator_bank = None
+        self._subtree_pool = None
+        self._trees_leaf_values = None
+
+    @property
+    def comparator_bank(self) -> ComparatorBank:
+        if self._comparator_bank is None:
+            self._comparator_bank = ComparatorBank(self.random_forest)
+        return self._comparator_bank
+
+    @property
+    def subtree_pool(self) -> SubtreePool:
+        if self._subtree_pool is None:
+            self._subtree_pool = SubtreePool(self.random_forest)
+        return self._subtree_pool
+
+    @property
+    def number_of_classes(self) -> int:
+        return max(tree.arrays.number_of_classes for tree in self.random_forest)
+
+    @property
+    def flag_regression(self) -> bool:
+        return any(tree.flag_regression for tree in self.random_forest)
+
+    @property
+    def number_of_fraction_bits(self) -> int:
+        # the same for all the regression trees (see _set_leaf_values_format)
+        return self.random_forest[0].number_of_fraction_bits
+
+    @property
+    def trees_leaf_values(self) -> (np.ndarray, np.ndarray):
+        # values of the leaves of all the regression trees in one table - value of class c of tree i is
+        # at offsets[i] + c, so the values chosen by all the trees are read at once
+        if self._trees_leaf_values is None:
+            offsets = np.cumsum([0] + [len(tree.leaf_values) for tree in self.random_forest[:-1]])
+            self._trees_leaf_values = (np.concatenate([tree.leaf_values for tree in self.random_forest]),
+                                       offsets.astype(np.intp))
+        return self._trees_leaf_values
+
+    @property
+    def _number_of_bits_for_output(self) -> int:
+        if self.flag_regression:
+            return self.number_of_bits_per_leaf_value
+        return self._number_of_bits_for_class_index
 
     # TODO(MF): this could probably be moved as a common element for random forest and decision tree
-    def predict(self, input_data: np.ndarray) -> np.ndarray:
-        result_data = np.empty(len(input_data))
-
-        for i in range(len(input_data)):
-            result_data[i] = self._predict_one_sample(input_data[i])
-
-        return result_data
-
-    def _predict_one_sample(self, input_data: np.ndarray) -> int:
+    # n_jobs > 1 splits the work between trees shards and samples chunks, evaluated on a thread pool
+    # (or on a process pool with the input data in shared memory, if flag_use_processes is set)
+    def predict(self, input_data: np.ndarray, n_jobs: int = 1, flag_use_processes: bool = False) -> np.ndarray:
+        # argmax returns the first maximal value, so in case of a tie the class with the lowest index is chosen,
+        # the same as in _choose_class (and scikit)
+        # the regression forest returns the mean of the values of the leaves chosen by the trees (as scikit)
+        if self.flag_regression:
+            return self.predict_mean(input_data, n_jobs, flag_use_processes)
+        return np.argmax(self.predict_votes(input_data, n_jobs, flag_use_processes), axis=1)
+
+    def predict_mean(self, input_data: np.ndarray, n_jobs: int = 1, flag_use_processes: bool = False) -> np.ndarray:
+        # n_jobs and flag_use_processes are used in the same way as in predict_votes
+        if not self.flag_regression:
+            raise ValueError("Only the regression forests have the mean of the values of the leaves!")
+        if n_jobs == 1:
+            trees_classes = self.predict_trees(input_data)
+        else:
+            trees_classes = parallel_predict.predict_trees(self._get_shards_quick_scorers(n_jobs), input_data, n_jobs,
+                                                           flag_use_processes)
+
+        leaf_values, offsets = self.trees_leaf_values
+        return leaf_values[trees_classes + offsets].mean(axis=1, dtype=np.float64)
+
+    def predict_fixed_point(self, input_data: np.ndarray) -> np.ndarray:
+        # values calculated by the generated vhdl of the regression forest
+        if not self.flag_regression:
+            raise ValueError("Only the regression forests have the fixed point outputs!")
+        return self.predict_output_codes(input_data) / 2.0 ** self.number_of_fraction_bits
+
+    def predict_votes(self, input_data: np.ndarray, n_jobs: int = 1, flag_use_processes: bool = False) -> np.ndarray:
+        # returns (number_of_samples x number_of_classes) matrix with the number of trees voting for each class
+        if self.flag_regression:
+            raise ValueError("Trees of the regression forest do not vote!")
+        if n_jobs == 1:
+            return count_votes(self.predict_trees(input_data), self.number_of_classes)
+
+        return parallel_predict.predict_votes(self._get_shards_quick_scorers(n_jobs), input_data,
+                                              self.number_of_classes, n_jobs, flag_use_processes)
+
+    def predict_with_margin(self, input_data: np.ndarray, n_jobs: int = 1,
+                            flag_use_processes: bool = False) -> (np.ndarray, np.ndarray):
+        # returns chosen classes and the difference between the number of votes for the chosen class
+        # and for the second best one
+        votes = self.predict_votes(input_data, n_jobs, flag_use_processes)
+        chosen_class = np.argmax(votes, axis=1)
+
+        if votes.shape[1] > 1:
+            two_best_votes = np.partition(votes, -2, axis=1)[:, -2:]
+            margin = two_best_votes[:, 1] - two_best_votes[:, 0]
+        else:
+            margin = votes[:, 0]
+
+        return chosen_class, margin
+
+    def predict_trees(self, input_data: np.ndarray) -> np.ndarray:
+        # returns (number_of_samples x number_of_trees) matrix of the classes chosen by each of the trees
+        if self.flag_shared_subtrees:
+            return self.subtree_pool.predict_trees(input_data)
+        if self.flag_shared_comparators:
+            return self.comparator_bank.predict_trees(input_data)
+
+        if self._quick_scorer is None:
+            self._quick_scorer = QuickScorer(self.random_forest)
+
+        return self._quick_scorer.predict_trees(input_data)
+
+    def predict_output_codes(self, input_data: np.ndarray) -> np.ndarray:
+        return self._output_codes(self.predict_trees(input_data))
+
+    def _output_codes(self, trees_classes: np.ndarray) -> np.ndarray:
+        # output of the vhdl for the classes chosen by the trees - the class with the most votes, or the average
+        # of the codes of the values of the leaves
+        if not self.flag_regression:
+            return np.argmax(count_votes(trees_classes, self.number_of_classes), axis=1)
+
+        leaf_values_codes = np.concatenate([tree.leaf_values_codes for tree in self.random_forest])
+        _, offsets = self.trees_leaf_values
+
+        return self._average_codes(leaf_values_codes[trees_classes + offsets].sum(axis=1))
+
+    def _get_shards_quick_scorers(self, n_jobs: int) -> [QuickScorer]:
+        number_of_shards = min(n_jobs, len(self.random_forest))
+        if number_of_shards not in self._shards_quick_scorers:
+            self._shards_quick_scorers[number_of_shards] = [
+                QuickScorer(list(shard)) for shard in np.array_split(np.array(self.random_forest, dtype=object),
+                                                                     number_of_shards)
+            ]
+
+        return self._shards_quick_scorers[number_of_shards]
+
+    def compile_predictor(self, path: str):
+        # returns module with generated predict, predict_trees and predict_one_sample functions,
+        # the module is cached in the path and generated again only if any of the trees changes
+        if self.flag_regression:
+            raise ValueError("Compiled predictors of the regression forests are not supported!")
+        return predictor_compiler.compile_predictor(self.filename, [tree.arrays for tree in self.random_forest],
+                                                    path, True)
+
+    def _predict_one_sample(self, input_data: np.ndarray):
+        trees_results = [tree._predict_one_sample(input_data) for tree in self.random_forest]
+
+        if self.flag_regression:
+            return sum(trees_results) / len(trees_results)
+        return self._choose_class(trees_results)
+
+    @staticmethod
+    def _choose_class(trees_results) -> int:
         # first create a dictionary that will store the results
         results = {}
-        for tree in self.random_forest:
-            # get the result form one of the tree and add it to appropriate element in dict
-            tree_result = tree._predict_one_sample(input_data)
+        for tree_result in trees_results:
+            # add the result form one of the tree to appropriate element in dict
             if tree_result in results:
                 results[tree_result] += 1
             else:
@@ -57,72 +323,482 @@ class RandomForest(VHDLCreator):
 
         return chosen_class
 
+    def _find_used_features(self) -> np.ndarray:
+        # union of the features used by all the trees
+        comparator_bank = self.comparator_bank
+        return self._features_with_comparators(comparator_bank.feature, comparator_bank.threshold_code,
+                                               self._number_of_bits_per_feature)
+
+    def vote_levels(self, number_of_inputs: int) -> [int]:
+        # number of outputs of each registered level of an adder (or comparator) tree with number_of_inputs inputs
+        levels = []
+        while True:
+            number_of_inputs = -(-number_of_inputs // self.vote_fan_in)
+            levels.append(number_of_inputs)
+            if number_of_inputs == 1:
+                return levels
+
+    @property
+    def vote_latency(self) -> int:
+        # clock cycles used by the vote module - adder trees and comparator tree
+        # (adder tree and the multiplier of the average for the regression)
+        if self.flag_regression:
+            multiplier, _ = self.average_multiplier()
+            return len(self.vote_levels(len(self.random_forest))) + (1 if multiplier != 1 else 0)
+        return len(self.vote_levels(len(self.random_forest))) + len(self.vote_levels(self.number_of_classes))
+
+    @property
+    def _trees_latency(self) -> int:
+        # with the shared comparators each tree is only a decideClass process after the shared compare process,
+        # the pipeline stages and the architecture (e.g. RomTree) of the trees are not used
+        if self.flag_shared_comparators:
+            return 2 if self.random_forest else 0
+        return max([tree.latency for tree in self.random_forest] + [0])
+
+    @property
+    def latency(self) -> int:
+        return self._trees_latency + self.vote_latency
+
+    @property
+    def initiation_interval(self) -> int:
+        # the same for all the trees (see use_rom_architecture)
+        if self.flag_shared_comparators:
+            return 1
+        return max([tree.initiation_interval for tree in self.random_forest] + [1])
+
+    def estimate_resources(self) -> resource_estimator.ResourceEstimate:
+        # estimated FPGA resources and latency of the design generated by create_vhdl_file
+        return resource_estimator.estimate_forest(self).for_lanes(self.number_of_lanes)
+
+    def create_vhdl_file(self, path: str, n_jobs: int = 1):
+        # without the shared comparators the file of each tree is written as well - files of the trees are named
+        # by the hash of their vhdl, so only the trees changed since the previous run are written
+        # (with n_jobs > 1 on a process pool), identical trees use the same file
+        # the input bus of each tree contains only the features used by the tree (it is connected to the part
+        # of the input of the forest), so changes of the other trees do not change its vhdl
+        if self.flag_shared_comparators and any(isinstance(tree, RomTree) for tree in self.random_forest):
+            raise ValueError("Trees with the ROM architecture can not share the comparators!")
+        if self.flag_shared_comparators and any(tree.threshold_encoding != ThresholdEncoding.COMPARATORS
+                                                for tree in self.random_forest):
+            raise ValueError("Trees with the threshold encoders can not share the comparators!")
+
+        if not self.flag_shared_comparators:
+            self._trees_components = self._create_trees_components()
+            self._create_trees_vhdl_files(path, n_jobs)
+
+        VHDLCreator.create_vhdl_file(self, path)
+        self._trees_components = None
+
+    def _create_trees_components(self) -> [Tree]:
+        # copies of the trees named by the hash of their vhdl
+        trees_components = []
+        for tree in self.random_forest:
+            tree_component = copy.copy(tree)
+            # the lanes of the forest contain the trees, each tree classifies one sample
+            tree_component.number_of_lanes = 1
+            name = f"{ClassifierType.DECISION_TREE.name}_{tree_component.vhdl_hash()[:16]}"
+            tree_component.set_names(name, name)
+            trees_components.append(tree_component)
+
+        return trees_components
+
+    def _create_trees_vhdl_files(self, path: str, n_jobs: int) -> [str]:
+        # returns the names of the files that were written
+        trees_to_write = {}
+        for tree_component in self._trees_components:
+            if not os.path.exists(path + "/" + tree_component._filename):
+                trees_to_write[tree_component.filename] = tree_component
+        trees_to_write = list(trees_to_write.values())
+        paths = [path] * len(trees_to_write)
+
+        if n_jobs == 1 or len(trees_to_write) <= 1:
+            return list(map(_create_tree_vhdl_file, trees_to_write, paths))
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            return list(executor.map(_create_tree_vhdl_file, trees_to_write, paths,
+                                     chunksize=max(1, len(trees_to_write) // (4 * n_jobs))))
+
     def print_parameters(self):
         print(f"Number of decision trees: {len(self.random_forest)}")
+        if self.flag_shared_subtrees:
+            subtree_pool = self.subtree_pool
+            print(f"Number of splits: {subtree_pool.number_of_splits_in_trees}, unique: {subtree_pool.number_of_splits}"
+                  f", sharing ratio: {subtree_pool.sharing_ratio:.2f}")
         # for tree in self.random_forest:
         #     tree.print_parameters()
 
-    def _add_additional_headers(self) -> str:
-        text = ""
-        return text
-
-    def _add_entity_generics_section(self) -> str:
-        text = ""
-        return text
-
-    def _add_architecture_component_section(self) -> str:
-        text = ""
-
-        text += self._insert_text_line_with_indent(f"component {ClassifierType.DECISION_TREE.name}")
-        text += self._add_entity_generics_section()
-        text += self._add_entity_port_section()
-        text += self._insert_text_line_with_indent(f"end {ClassifierType.DECISION_TREE.name};")
-        text += self._insert_text_line_with_indent("")
-
-        # TODO(MF): add module for connecting the results
-
-        return text
-
-    def _add_architecture_signal_section(self) -> str:
-        text = ""
-
-        text += self._insert_text_line_with_indent(f"type outputs_t\tis array({len(self.random_forest)}-1 downto 0)" +
-                                                   f" of unsigned({self._number_of_bits_per_feature}-1 downto 0);")
-
-        text += self._insert_text_line_with_indent("signal " + "outputs" + "\t\t:\t" + "outputs_t"
-                                                   + "\t\t\t" + ":= (others=>(others=>'0'));")
-
-        return text
-
-    def _add_architecture_process_section(self) -> str:
-        text = ""
-
-        for i in range(0, len(self.random_forest)):
-            text += self._add_port_mapping(i)
-
-        # TODO(MF): add Marek's module for combinig the results
-        text += self._insert_text_line_with_indent("output <= std_logic_vector(outputs(0));")
-        text += self._insert_text_line_with_indent("")
-
-        return text
-
-    def _add_port_mapping(self, index: int) -> str:
-        text = ""
-
-        text += self._insert_text_line_with_indent(
-            f"{ClassifierType.DECISION_TREE.name}_{index}_INST : {ClassifierType.DECISION_TREE.name}"
+    def _add_additional_headers(self):
+        return
+
+    def _add_entity_generics_section(self):
+        return
+
+    def _add_architecture_component_section(self):
+        # with the shared comparators the trees are not separate components
+        if self.flag_shared_comparators:
+            return
+
+        # one component for each of the different trees, with the ports of the tree
+        components = {tree_component._param_entity_name: tree_component for tree_component in self._trees_components}
+        for component_name, tree_component in components.items():
+            self._insert_text_line_with_indent(f"component {component_name}")
+            tree_component._writer = self._writer
+            tree_component._add_entity_generics_section()
+            tree_component._add_entity_port_section()
+            tree_component._writer = None
+            self._insert_text_line_with_indent("end component;")
+            self._insert_text_line_with_indent("")
+
+    def _add_architecture_signal_section(self):
+        if self.flag_shared_comparators:
+            self._add_features_signal()
+            self._add_split_result_signal(self.comparator_bank.number_of_comparators)
+        else:
+            self._add_trees_inputs_signals()
+
+        self._insert_text_line_with_indent(f"subtype class_index_t\tis unsigned("
+                                           f"{self._number_of_bits_for_class_index}-1 downto 0);")
+        if self.flag_regression:
+            self._insert_text_line_with_indent(f"subtype leaf_value_t\tis signed("
+                                               f"{self.number_of_bits_per_leaf_value}-1 downto 0);")
+        self._insert_text_line_with_indent(f"type outputs_t\tis array({len(self.random_forest)}-1 downto 0)" +
+                                           (" of leaf_value_t;" if self.flag_regression else " of class_index_t;"))
+
+        self._insert_text_line_with_indent("signal " + "outputs" + "\t\t:\t" + "outputs_t"
+                                           + "\t\t\t" + ":= (others=>(others=>'0'));")
+        if self.flag_shared_subtrees:
+            for subtree in self.subtree_pool.shared_subtrees():
+                self._insert_text_line_with_indent(f"signal subtreeClass_{subtree}\t:\tclass_index_t"
+                                                   + "\t\t\t" + ":= (others=>'0');")
+        self._insert_text_line_with_indent("")
+
+        if self.flag_regression:
+            self._add_average_signals()
+        else:
+            self._add_vote_signals()
+
+    def _add_architecture_process_section(self):
+        if self.flag_shared_comparators:
+            self._add_shared_comparators_trees()
+        else:
+            self._add_trees_inputs_mapping()
+            self._insert_text_line_with_indent("")
+            for i in range(0, len(self.random_forest)):
+                self._add_port_mapping(i)
+
+        self._insert_text_line_with_indent("")
+        if self.flag_regression:
+            self._add_average_processes()
+        else:
+            self._add_vote_processes()
+
+    def _add_port_mapping(self, index: int):
+        self._insert_text_line_with_indent(
+            f"{ClassifierType.DECISION_TREE.name}_{index}_INST : {self._trees_components[index]._param_entity_name}"
         )
-        text += self._insert_text_line_with_indent("port map (")
-        self.current_indent += 2
-
-        text += self._insert_text_line_with_indent("clk => clk,")
-        text += self._insert_text_line_with_indent("rst => rst,")
-        text += self._insert_text_line_with_indent("en => en,")
-        text += self._insert_text_line_with_indent("input => input,")
-        text += self._insert_text_line_with_indent(f"output => outputs({index})")
-
-        self.current_indent -= 1
-        text += self._insert_text_line_with_indent(");")
-        self.current_indent -= 1
-
-        return text
+        self._insert_text_line_with_indent("port map (")
+
+        with self._writer.indent(2):
+            self._insert_text_line_with_indent("clk => clk,")
+            self._insert_text_line_with_indent("rst => rst,")
+            self._insert_text_line_with_indent("en => en,")
+            self._insert_text_line_with_indent(f"input => treeInput_{index},")
+            output_type = "signed" if self.flag_regression else "unsigned"
+            self._insert_text_line_with_indent(f"{output_type}(output) => outputs({index})")
+
+        with self._writer.indent():
+            self._insert_text_line_with_indent(");")
+
+    def _add_trees_inputs_signals(self):
+        for i, tree_component in enumerate(self._trees_components):
+            self._insert_text_line_with_indent(f"signal treeInput_{i}\t:\tstd_logic_vector("
+                                               f"{len(tree_component.used_features) * self._number_of_bits_per_feature}"
+                                               f"-1 downto 0);")
+        self._insert_text_line_with_indent("")
+
+    def _add_trees_inputs_mapping(self):
+        # input bus of the tree is made of the features used by the tree, taken from the input of the forest
+        # (the last feature of the tree is the most significant one)
+        feature_positions = self._feature_positions()
+        bits = self._number_of_bits_per_feature
+
+        for i, tree_component in enumerate(self._trees_components):
+            parts = [f"{self._input_name}({bits * (position + 1) - 1} downto {bits * position})"
+                     for position in feature_positions[tree_component.used_features[::-1]]]
+            if parts:
+                self._insert_text_line_with_indent(f"treeInput_{i} <= " + " & ".join(parts) + ";")
+
+    def _add_shared_comparators_trees(self):
+        # one compare process for all the unique comparisions, decideClass process of each tree uses its bits
+        comparator_bank = self.comparator_bank
+
+        self._add_architecture_input_mapping()
+        self._add_process_compare(comparator_bank.feature.tolist(), comparator_bank.threshold_code.tolist())
+
+        if self.flag_shared_subtrees:
+            self._add_shared_subtrees()
+            return
+
+        for i, tree in enumerate(self.random_forest):
+            leaves_values = None
+            if tree.flag_regression:
+                # the tree outputs the value of the leaf directly
+                leaves_values = [f"to_signed({code}, leaf_value_t'length)"
+                                 for code in tree.leaf_values_codes[tree.decision_store.classes].tolist()]
+            self._add_process_decide_class(tree.decision_store, comparator_bank.split_results_indices[i],
+                                           f"outputs({i})", f"decideClass_{i}", leaves_values)
+            self._insert_text_line_with_indent("")
+
+    def shared_subtrees_terms(self) -> ([int], [], []):
+        # decision terms (see SubtreePool.decision_terms) of the shared subtrees and of the trees,
+        # returns the IDs of the shared subtrees, (terms, subtrees) of each of them and (terms, subtrees) of each tree
+        subtree_pool = self.subtree_pool
+        shared_subtrees = subtree_pool.shared_subtrees()
+        flag_shared = np.zeros(subtree_pool.number_of_splits, dtype=bool)
+        flag_shared[shared_subtrees] = True
+
+        subtrees_terms = [subtree_pool.decision_terms(subtree, flag_shared, True) for subtree in shared_subtrees]
+        trees_terms = [subtree_pool.decision_terms(root, flag_shared, False) for root in subtree_pool.roots]
+
+        return shared_subtrees.tolist(), subtrees_terms, trees_terms
+
+    def _subtree_pool_split_results_indices(self) -> np.ndarray:
+        # index of the splitResult bit (the comparator of the bank) used by each split of the subtree pool
+        comparator_bank = self.comparator_bank
+        comparators = {comparision: i for i, comparision in enumerate(zip(comparator_bank.feature.tolist(),
+                                                                          comparator_bank.threshold_code.tolist()))}
+        subtree_pool = self.subtree_pool
+        return np.array([comparators[comparision] for comparision in zip(subtree_pool.feature.tolist(),
+                                                                         subtree_pool.threshold_code.tolist())],
+                        dtype=np.intp)
+
+    def _add_shared_subtrees(self):
+        # each shared subtree sets its class combinationally (subtreeClass signal) from the splitResult bits,
+        # the paths of the trees (and of the other shared subtrees) end at the shared subtrees and use their signals
+        split_results_indices = self._subtree_pool_split_results_indices()
+        shared_subtrees, subtrees_terms, trees_terms = self.shared_subtrees_terms()
+
+        def values(subtrees: np.ndarray) -> [str]:
+            return [f"subtreeClass_{subtree}" if subtree >= 0 else None for subtree in subtrees.tolist()]
+
+        for subtree, (terms, subtrees) in zip(shared_subtrees, subtrees_terms):
+            self._add_shared_subtree(f"subtreeClass_{subtree}", terms, values(subtrees), split_results_indices)
+        self._insert_text_line_with_indent("")
+
+        for i, (terms, subtrees) in enumerate(trees_terms):
+            self._add_process_decide_class(terms, split_results_indices, f"outputs({i})", f"decideClass_{i}",
+                                           values(subtrees))
+            self._insert_text_line_with_indent("")
+
+    def _add_shared_subtree(self, signal_name: str, terms, terms_values: [str], split_results_indices: np.ndarray):
+        # exactly one path of the subtree matches, so the last one does not have to be checked
+        self._insert_text_line_with_indent(signal_name + " <=")
+        with self._writer.indent():
+            for term_id in range(terms.number_of_leaves):
+                value = terms_values[term_id]
+                if value is None:
+                    value = f"to_unsigned({terms.classes[term_id]}, {signal_name}'length)"
+
+                if term_id == terms.number_of_leaves - 1:
+                    self._insert_text_line_with_indent(value + ";")
+                    continue
+
+                split_ids, directions = terms.path(term_id)
+                conditions = [f"splitResult({split_results_indices[split_id]}) = '{direction}'"
+                              for split_id, direction in zip(split_ids.tolist(), directions.tolist())]
+                self._insert_text_line_with_indent(value + " when " + " and ".join(conditions) + " else")
+
+    # vote module - the number of votes for each class is counted by a pipelined adder tree (one per class),
+    # then the class with the highest number of votes is chosen by a pipelined comparator tree
+    # (in case of a tie the class with the lowest index is chosen, the same as in _choose_class)
+
+    def _number_of_bits_for_votes(self) -> int:
+        return len(self.random_forest).bit_length()
+
+    def _add_vote_signals(self):
+        number_of_classes = self.number_of_classes
+
+        self._insert_text_line_with_indent("type votes_t\tis array(natural range <>) of unsigned("
+                                           + str(self._number_of_bits_for_votes()) + "-1 downto 0);")
+        self._insert_text_line_with_indent("type classes_indices_t\tis array(natural range <>) of "
+                                           "class_index_t;")
+
+        # partial sums of the votes, class c uses elements from c*n to (c+1)*n-1 of each level
+        for level, number_of_sums in enumerate(self.vote_levels(len(self.random_forest))):
+            self._insert_text_line_with_indent("signal " + "votes_" + str(level) + "\t:\t" + "votes_t("
+                                               + str(number_of_classes * number_of_sums) + "-1 downto 0)"
+                                               + "\t\t\t" + ":= (others=>(others=>'0'));")
+
+        for level, number_of_candidates in enumerate(self.vote_levels(number_of_classes)):
+            self._insert_text_line_with_indent("signal " + "maxVotes_" + str(level) + "\t:\t" + "votes_t("
+                                               + str(number_of_candidates) + "-1 downto 0)"
+                                               + "\t\t\t" + ":= (others=>(others=>'0'));")
+            self._insert_text_line_with_indent("signal " + "maxIndex_" + str(level) + "\t:\t"
+                                               + "classes_indices_t(" + str(number_of_candidates)
+                                               + "-1 downto 0)" + "\t\t\t" + ":= (others=>(others=>'0'));")
+        self._insert_text_line_with_indent("")
+
+        # one vote (0 or 1) of the tree for the class
+        self._insert_text_line_with_indent("function vote(tree_output : class_index_t; class_index : natural)"
+                                           " return unsigned is")
+        self._insert_text_line_with_indent("begin")
+        with self._writer.indent():
+            self._insert_text_line_with_indent("if tree_output = class_index then")
+            with self._writer.indent():
+                self._insert_text_line_with_indent("return to_unsigned(1, " + str(self._number_of_bits_for_votes())
+                                                   + ");")
+            self._insert_text_line_with_indent("else")
+            with self._writer.indent():
+                self._insert_text_line_with_indent("return to_unsigned(0, " + str(self._number_of_bits_for_votes())
+                                                   + ");")
+            self._insert_text_line_with_indent("end if;")
+        self._insert_text_line_with_indent("end vote;")
+        self._insert_text_line_with_indent("")
+
+    def _add_vote_processes(self):
+        number_of_classes = self.number_of_classes
+        fan_in = self.vote_fan_in
+
+        # adder trees - first level adds the votes of the trees, next levels add the partial sums
+        number_of_inputs = len(self.random_forest)
+        for level, number_of_sums in enumerate(self.vote_levels(len(self.random_forest))):
+            with self._clocked_process("countVotes_" + str(level)):
+                for class_index in range(number_of_classes):
+                    for i in range(number_of_sums):
+                        inputs = range(i * fan_in, min((i + 1) * fan_in, number_of_inputs))
+                        if level == 0:
+                            terms = [f"vote(outputs({j}), {class_index})" for j in inputs]
+                        else:
+                            terms = [f"votes_{level - 1}({class_index * number_of_inputs + j})" for j in inputs]
+
+                        self._insert_text_line_with_indent(
+                            f"votes_{level}({class_index * number_of_sums + i}) <= " + " + ".join(terms) + ";"
+                        )
+            self._insert_text_line_with_indent("")
+            number_of_inputs = number_of_sums
+
+        # comparator tree - candidates are ordered by the class index and a candidate wins only if it has more votes
+        # than all the previous ones, so in case of a tie the lowest class index wins
+        last_sums_level = len(self.vote_levels(len(self.random_forest))) - 1
+        number_of_inputs = number_of_classes
+        for level, number_of_candidates in enumerate(self.vote_levels(number_of_classes)):
+            if level == 0:
+                votes_format = f"votes_{last_sums_level}({{}})"
+                index_format = "to_unsigned({}, class_index_t'length)"
+            else:
+                votes_format = f"maxVotes_{level - 1}({{}})"
+                index_format = f"maxIndex_{level - 1}({{}})"
+
+            with self._clocked_process("chooseClass_" + str(level)):
+                for i in range(number_of_candidates):
+                    inputs = list(range(i * fan_in, min((i + 1) * fan_in, number_of_inputs)))
+                    self._add_choose_winner(level, i, inputs, votes_format, index_format)
+            self._insert_text_line_with_indent("")
+            number_of_inputs = number_of_candidates
+
+        last_level = len(self.vote_levels(number_of_classes)) - 1
+        self._insert_text_line_with_indent(f"{self._output_name} <= std_logic_vector(resize("
+                                           f"maxIndex_{last_level}(0), {self._output_name}'length));")
+        self._insert_text_line_with_indent("")
+
+    def _add_choose_winner(self, level: int, index: int, inputs: [int], votes_format: str, index_format: str):
+        # the winner of the group is the first candidate with the highest number of votes
+        for k, j in enumerate(inputs):
+            winner_lines = [f"maxVotes_{level}({index}) <= {votes_format.format(j)};",
+                            f"maxIndex_{level}({index}) <= {index_format.format(j)};"]
+            if len(inputs) == 1:
+                for line in winner_lines:
+                    self._insert_text_line_with_indent(line)
+                continue
+
+            conditions = [f"{votes_format.format(j)} > {votes_format.format(m)}" for m in inputs[:k]]
+            conditions += [f"{votes_format.format(j)} >= {votes_format.format(m)}" for m in inputs[k + 1:]]
+            if k == len(inputs) - 1:
+                self._insert_text_line_with_indent("else")
+            else:
+                keyword = "if" if k == 0 else "elsif"
+                self._insert_text_line_with_indent(f"{keyword} " + " and ".join(conditions) + " then")
+            with self._writer.indent():
+                for line in winner_lines:
+                    self._insert_text_line_with_indent(line)
+        if len(inputs) > 1:
+            self._insert_text_line_with_indent("end if;")
+
+    # average of the regression trees - the values of the trees are added by a pipelined adder tree, then the sum
+    # is divided by the number of trees: with an arithmetic shift when it is a power of 2, otherwise it is
+    # multiplied by round(2^shift / number_of_trees) (registered multiplier) and shifted
+    # the result is rounded down, the same as in _average_codes
+
+    @property
+    def _number_of_bits_for_sum(self) -> int:
+        return self.number_of_bits_per_leaf_value + (len(self.random_forest) - 1).bit_length()
+
+    def average_multiplier(self) -> (int, int):
+        # returns (multiplier, shift) - average = (sum * multiplier) >> shift
+        number_of_trees = len(self.random_forest)
+        if number_of_trees & (number_of_trees - 1) == 0:
+            return 1, number_of_trees.bit_length() - 1
+
+        # the error of the multiplier is lower than 1/8 of the least significant bit of the average,
+        # so the average is always in the range of the leaf values
+        shift = self._number_of_bits_for_sum + 1
+        return ((1 << shift) + number_of_trees // 2) // number_of_trees, shift
+
+    def _average_codes(self, sums: np.ndarray) -> np.ndarray:
+        multiplier, shift = self.average_multiplier()
+        if multiplier == 1:
+            return sums >> shift
+
+        if 2 * self._number_of_bits_for_sum + 1 >= 63:
+            # the products do not fit in int64
+            return (sums.astype(object) * multiplier >> shift).astype(np.int64)
+        return sums * multiplier >> shift
+
+    def _add_average_signals(self):
+        self._insert_text_line_with_indent(f"type sums_t\tis array(natural range <>) of signed("
+                                           f"{self._number_of_bits_for_sum}-1 downto 0);")
+        for level, number_of_sums in enumerate(self.vote_levels(len(self.random_forest))):
+            self._insert_text_line_with_indent("signal " + "sums_" + str(level) + "\t:\t" + "sums_t("
+                                               + str(number_of_sums) + "-1 downto 0)"
+                                               + "\t\t\t" + ":= (others=>(others=>'0'));")
+
+        multiplier, shift = self.average_multiplier()
+        if multiplier != 1:
+            self._insert_text_line_with_indent(f"constant AVERAGE_MULTIPLIER\t:\tsigned({shift + 1}-1 downto 0)"
+                                               f"\t:= to_signed({multiplier}, {shift + 1});")
+            self._insert_text_line_with_indent(f"signal average\t:\tsigned({self._number_of_bits_for_sum + shift + 1}"
+                                               "-1 downto 0)\t\t\t:= (others=>'0');")
+        self._insert_text_line_with_indent("")
+
+    def _add_average_processes(self):
+        fan_in = self.vote_fan_in
+
+        # adder tree - first level adds the values of the trees, next levels add the partial sums
+        number_of_inputs = len(self.random_forest)
+        sums_levels = self.vote_levels(len(self.random_forest))
+        for level, number_of_sums in enumerate(sums_levels):
+            with self._clocked_process("addValues_" + str(level)):
+                for i in range(number_of_sums):
+                    inputs = range(i * fan_in, min((i + 1) * fan_in, number_of_inputs))
+                    if level == 0:
+                        terms = [f"resize(outputs({j}), {self._number_of_bits_for_sum})" for j in inputs]
+                    else:
+                        terms = [f"sums_{level - 1}({j})" for j in inputs]
+
+                    self._insert_text_line_with_indent(f"sums_{level}({i}) <= " + " + ".join(terms) + ";")
+            self._insert_text_line_with_indent("")
+            number_of_inputs = number_of_sums
+
+        # the average fits in the width of the output, so it is taken directly from the bits of the result
+        width = self.number_of_bits_per_leaf_value
+        multiplier, shift = self.average_multiplier()
+        result = f"sums_{len(sums_levels) - 1}(0)"
+        if multiplier != 1:
+            with self._clocked_process("divide"):
+                self._insert_text_line_with_indent(f"average <= {result} * AVERAGE_MULTIPLIER;")
+            self._insert_text_line_with_indent("")
+            result = "average"
+
+        self._insert_text_line_with_indent(f"{self._output_name} <= std_logic_vector({result}({shift + width}-1 "
+                                           f"downto {shift}));")
+        self._insert_text_line_with_indent("")
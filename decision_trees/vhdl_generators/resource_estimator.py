@@ -0,0 +1,302 @@
+import numpy as np
+
+from decision_trees.utils.convert_to_fixed_point import get_max_code
+from decision_trees.vhdl_generators.threshold_encoder import ThresholdEncoding
+
+# rough estimation of the FPGA resources used by the generated vhdl, computed directly from the splits and leaves
+# (no vhdl text is generated). Logic is counted in 6-input LUTs (LUT6), as in most of the current FPGA devices.
+
+LUT_INPUTS = 6
+# comparision of the feature with a constant uses the carry chain, one LUT6 handles two bits
+COMPARATOR_BITS_PER_LUT = 2
+# number of the read ports of a block RAM
+MEMORY_READ_PORTS = 2
+
+
+def luts_for_and(number_of_inputs: int) -> int:
+    # number of LUTs in a tree of LUTs calculating AND (or OR) of all the inputs
+    if number_of_inputs <= 1:
+        return 0
+    return -(-(number_of_inputs - 1) // (LUT_INPUTS - 1))
+
+
+def luts_for_comparator(number_of_bits: int) -> int:
+    return -(-number_of_bits // COMPARATOR_BITS_PER_LUT)
+
+
+def luts_for_multiplexer(number_of_inputs: int, number_of_bits: int) -> int:
+    # one LUT6 is a 4:1 multiplexer of one bit
+    if number_of_inputs <= 1:
+        return 0
+    return number_of_bits * -(-(number_of_inputs - 1) // 3)
+
+
+def luts_for_rom(number_of_words: int, number_of_bits: int) -> int:
+    # constant table read with a variable index - one LUT6 holds 64 words of one bit, then the multiplexers
+    luts_per_bit = -(-number_of_words // (1 << LUT_INPUTS))
+    return number_of_bits * luts_per_bit + luts_for_multiplexer(luts_per_bit, number_of_bits)
+
+
+class ResourceEstimate:
+
+    def __init__(self, number_of_comparators: int, comparator_width: int, register_bits: int,
+                 comparators_luts: int, decision_luts: int, latency: int, initiation_interval: int = 1,
+                 memory_bits: int = 0, number_of_lanes: int = 1, number_of_multipliers: int = 0):
+        self.number_of_comparators = number_of_comparators
+        self.comparator_width = comparator_width
+        self.register_bits = register_bits
+        self.comparators_luts = comparators_luts
+        self.decision_luts = decision_luts
+        # number of clock cycles from the input to the output
+        self.latency = latency
+        # number of clock cycles between two consecutive samples
+        self.initiation_interval = initiation_interval
+        # bits of the ROMs (block RAMs) with the nodes of the trees
+        self.memory_bits = memory_bits
+        # number of samples classified in parallel
+        self.number_of_lanes = number_of_lanes
+        # hardware multipliers (DSP blocks), used by the average of the regression forest
+        self.number_of_multipliers = number_of_multipliers
+
+    @property
+    def luts(self) -> int:
+        return self.comparators_luts + self.decision_luts
+
+    def samples_per_second(self, clock_frequency: float) -> float:
+        return clock_frequency * self.number_of_lanes / self.initiation_interval
+
+    def for_lanes(self, number_of_lanes: int) -> "ResourceEstimate":
+        # estimate of number_of_lanes copies of the datapath (the estimate of one lane is multiplied),
+        # the ROMs are shared - block RAMs have two read ports, so one copy of the ROM is used by two lanes
+        return ResourceEstimate(self.number_of_comparators * number_of_lanes, self.comparator_width,
+                                self.register_bits * number_of_lanes, self.comparators_luts * number_of_lanes,
+                                self.decision_luts * number_of_lanes, self.latency, self.initiation_interval,
+                                self.memory_bits * -(-number_of_lanes // MEMORY_READ_PORTS),
+                                self.number_of_lanes * number_of_lanes, self.number_of_multipliers * number_of_lanes)
+
+    def fits(self, available_luts: int, available_registers: int, available_memory_bits: int = None) -> bool:
+        if available_memory_bits is not None and self.memory_bits > available_memory_bits:
+            return False
+        return self.luts <= available_luts and self.register_bits <= available_registers
+
+    def meets_throughput(self, clock_frequency: float, required_samples_per_second: float) -> bool:
+        return self.samples_per_second(clock_frequency) >= required_samples_per_second
+
+    def show(self):
+        print("Number of comparators: ", self.number_of_comparators, ", width: ", self.comparator_width)
+        print("Register bits: ", self.register_bits, ", memory bits: ", self.memory_bits,
+              ", multipliers: ", self.number_of_multipliers)
+        print("LUTs: ", self.luts, " (comparators: ", self.comparators_luts,
+              ", decision logic: ", self.decision_luts, ")")
+        print("Latency [cycles]: ", self.latency, ", initiation interval [cycles]: ", self.initiation_interval,
+              ", lanes: ", self.number_of_lanes)
+
+
+def count_comparators(splits: [], number_of_bits_per_feature: int) -> int:
+    # splits with thresholds outside of the range of the features do not need a comparator (see Tree vhdl)
+    max_value = get_max_code(number_of_bits_per_feature)
+    return sum(1 for split in splits if 0 <= split.value_code < max_value)
+
+
+def luts_for_class_index(leaf_store, number_of_bits_for_class_index: int) -> int:
+    # each bit of the class index is an OR of the conditions of the leaves with this bit set
+    classes = np.asarray(leaf_store.classes, dtype=np.int64)
+    return sum(luts_for_and(int(np.count_nonzero((classes >> bit) & 1)))
+               for bit in range(number_of_bits_for_class_index))
+
+
+def estimate_tree(tree) -> ResourceEstimate:
+    number_of_bits_per_feature = tree._number_of_bits_per_feature
+    number_of_bits_for_class_index = tree._number_of_bits_for_class_index
+    leaf_store = tree.decision_store
+
+    number_of_comparators = count_comparators(tree.splits, number_of_bits_per_feature)
+    comparators_luts = number_of_comparators * luts_for_comparator(number_of_bits_per_feature)
+    # registers of the compare process (splitResult) or of the encode process
+    encoder_register_bits = len(tree.splits)
+    # logic between the registered encoders and splitResult
+    encoder_decision_luts = 0
+    if tree.threshold_encoding != ThresholdEncoding.COMPARATORS:
+        # one comparator per unique threshold of the feature
+        feature_intervals = tree.feature_intervals
+        number_of_comparators = int(feature_intervals.number_of_thresholds.sum())
+        comparators_luts = number_of_comparators * luts_for_comparator(number_of_bits_per_feature)
+        if tree.threshold_encoding == ThresholdEncoding.THERMOMETER:
+            encoder_register_bits = number_of_comparators
+        else:
+            # priority encoder of the comparisions, then each split compares the index with a constant
+            numbers_of_bits_for_index = feature_intervals.number_of_bits_for_index
+            encoder_register_bits = int(numbers_of_bits_for_index.sum())
+            comparators_luts += sum(luts_for_multiplexer(number_of_thresholds + 1, number_of_bits_for_index)
+                                    for number_of_thresholds, number_of_bits_for_index
+                                    in zip(feature_intervals.number_of_thresholds.tolist(),
+                                           numbers_of_bits_for_index.tolist()))
+            flag_encoded = feature_intervals.split_slot >= 0
+            encoder_decision_luts = sum(
+                luts_for_and(number_of_bits_for_index) for number_of_bits_for_index
+                in numbers_of_bits_for_index[feature_intervals.split_slot[flag_encoded]].tolist()
+            )
+
+    # decideClass - one AND of the path conditions per leaf (or minimized term), then each bit of the class index
+    # is an OR of the conditions of the leaves with this bit set
+    # in the pipelined version each stage ANDs its part of the path with the result of the previous stage
+    path_lengths = leaf_store.path_lengths
+    levels = tree.pipeline_stages_levels()
+    decision_luts = encoder_decision_luts
+    for stage in range(tree.number_of_pipeline_stages):
+        conditions_in_stage = np.clip(path_lengths, levels[stage], levels[stage + 1]) - levels[stage]
+        if stage > 0:
+            conditions_in_stage = conditions_in_stage + 1
+        decision_luts += sum(luts_for_and(number_of_conditions)
+                             for number_of_conditions in conditions_in_stage.tolist())
+    decision_luts += luts_for_class_index(leaf_store, number_of_bits_for_class_index)
+    if tree.flag_regression:
+        # value of the leaf read from the table indexed by the class
+        decision_luts += luts_for_rom(tree.number_of_classes, tree.number_of_bits_per_leaf_value)
+
+    # registers: splitResult (one bit per split, or the encoders) and classIndex,
+    # and for each additional pipeline stage - leafMatch (one bit per leaf) and delayed splitResult
+    register_bits = encoder_register_bits + number_of_bits_for_class_index
+    register_bits += (tree.number_of_pipeline_stages - 1) * (leaf_store.number_of_leaves + len(tree.splits))
+
+    return ResourceEstimate(number_of_comparators, number_of_bits_per_feature, register_bits,
+                            comparators_luts, decision_luts, tree.latency, tree.initiation_interval)
+
+
+def estimate_shared_comparators_tree(tree, number_of_bits_for_output: int) -> ResourceEstimate:
+    # tree of the forest with the shared comparators - only the decideClass process using the splitResult bits
+    # of the compare process of the forest, so there are no comparators, encoders and pipeline stages;
+    # the output of the process is the registered class index (or the value of the leaf) of the forest width
+    leaf_store = tree.decision_store
+    decision_luts = sum(luts_for_and(path_length) for path_length in leaf_store.path_lengths.tolist())
+    decision_luts += luts_for_class_index(leaf_store, tree._number_of_bits_for_class_index)
+    if tree.flag_regression:
+        decision_luts += luts_for_rom(tree.number_of_classes, tree.number_of_bits_per_leaf_value)
+
+    return ResourceEstimate(0, tree._number_of_bits_per_feature, number_of_bits_for_output, 0, decision_luts,
+                            latency=1)
+
+
+def estimate_rom_tree(tree) -> ResourceEstimate:
+    # RomTree - one comparator of two variables, multiplexer choosing the feature of the node, multiplexers
+    # choosing the child and loading a new sample into the ring
+    number_of_bits_per_feature = tree._number_of_bits_per_feature
+    number_of_feature_slots = tree._number_of_feature_slots
+    number_of_bits_for_sample = number_of_feature_slots * number_of_bits_per_feature
+    number_of_bits_for_slot = (number_of_bits_for_sample + tree._number_of_bits_for_address
+                               + tree._number_of_bits_for_class_index + 1)
+
+    decision_luts = luts_for_multiplexer(number_of_feature_slots, number_of_bits_per_feature)
+    decision_luts += luts_for_multiplexer(2, tree._number_of_bits_for_child)
+    decision_luts += luts_for_multiplexer(2, number_of_bits_for_slot)
+    decision_luts += tree.initiation_interval.bit_length()
+    if tree.flag_regression:
+        decision_luts += luts_for_rom(tree.number_of_classes, tree.number_of_bits_per_leaf_value)
+
+    # ring of slots, data read from the ROM, phase counter and classIndex
+    register_bits = tree.number_of_slots * number_of_bits_for_slot + tree.number_of_bits_for_word
+    register_bits += tree.initiation_interval.bit_length() + tree._number_of_bits_for_class_index
+
+    return ResourceEstimate(1, number_of_bits_per_feature, register_bits,
+                            luts_for_comparator(number_of_bits_per_feature), decision_luts,
+                            tree.latency, tree.initiation_interval, tree.rom_size * tree.number_of_bits_for_word)
+
+
+def luts_for_decision_terms(terms, number_of_bits_for_class_index: int, subtrees: np.ndarray) -> int:
+    # decision logic of one tree (or shared subtree) of the forest with the shared subtrees - one AND per term,
+    # each bit of the class is an OR of the terms with this bit set and of the terms ending at the shared subtrees
+    # (combined with the bit of the subtree)
+    decision_luts = sum(luts_for_and(number_of_conditions) for number_of_conditions in terms.path_lengths.tolist())
+    classes = np.asarray(terms.classes, dtype=np.int64)
+    flag_subtree = subtrees >= 0
+    for bit in range(number_of_bits_for_class_index):
+        number_of_inputs = int(np.count_nonzero(((classes >> bit) & 1).astype(bool) & ~flag_subtree))
+        decision_luts += luts_for_and(number_of_inputs + 2 * int(np.count_nonzero(flag_subtree)))
+
+    return decision_luts
+
+
+def estimate_forest(random_forest) -> ResourceEstimate:
+    # the trees are the components of one lane of the forest
+    if random_forest.flag_shared_comparators:
+        number_of_bits_for_output = (random_forest.number_of_bits_per_leaf_value if random_forest.flag_regression
+                                     else random_forest._number_of_bits_for_class_index)
+        trees_estimates = [estimate_shared_comparators_tree(tree, number_of_bits_for_output)
+                           for tree in random_forest.random_forest]
+    else:
+        trees_estimates = [tree._estimate_lane_resources() for tree in random_forest.random_forest]
+    decision_luts = sum(estimate.decision_luts for estimate in trees_estimates)
+
+    number_of_comparators = sum(estimate.number_of_comparators for estimate in trees_estimates)
+    comparators_luts = sum(estimate.comparators_luts for estimate in trees_estimates)
+    register_bits = sum(estimate.register_bits for estimate in trees_estimates)
+
+    if random_forest.flag_shared_comparators:
+        # one comparator (and splitResult bit) per unique comparision of the forest
+        comparator_bank = random_forest.comparator_bank
+        number_of_bits_per_feature = random_forest._number_of_bits_per_feature
+        max_value = get_max_code(number_of_bits_per_feature)
+        number_of_comparators = int(np.count_nonzero((comparator_bank.threshold_code >= 0)
+                                                     & (comparator_bank.threshold_code < max_value)))
+        comparators_luts = number_of_comparators * luts_for_comparator(number_of_bits_per_feature)
+        register_bits += comparator_bank.number_of_comparators
+
+    if random_forest.flag_shared_subtrees:
+        # decision logic of each shared subtree is implemented only once (the trees use its signal)
+        _, subtrees_terms, trees_terms = random_forest.shared_subtrees_terms()
+        decision_luts = sum(luts_for_decision_terms(terms, random_forest._number_of_bits_for_class_index, subtrees)
+                            for terms, subtrees in subtrees_terms + trees_terms)
+
+    number_of_trees = len(random_forest.random_forest)
+    if random_forest.flag_regression:
+        # adder tree of the values of the trees (one LUT per bit of the adder with two inputs) and the division
+        # of the sum - a shift (only wires) or a registered multiplier
+        sums_levels = random_forest.vote_levels(number_of_trees)
+        number_of_bits_for_sum = random_forest._number_of_bits_for_sum
+        average_luts = sum(sums_levels) * (random_forest.vote_fan_in - 1) * number_of_bits_for_sum
+        register_bits += sum(sums_levels) * number_of_bits_for_sum
+        multiplier, shift = random_forest.average_multiplier()
+        number_of_multipliers = 0
+        if multiplier != 1:
+            number_of_multipliers = 1
+            register_bits += number_of_bits_for_sum + shift + 1
+
+        return ResourceEstimate(
+            number_of_comparators,
+            random_forest._number_of_bits_per_feature,
+            register_bits,
+            comparators_luts,
+            decision_luts + average_luts,
+            latency=random_forest.latency,
+            initiation_interval=random_forest.initiation_interval,
+            memory_bits=sum(estimate.memory_bits for estimate in trees_estimates),
+            number_of_multipliers=number_of_multipliers,
+        )
+
+    # vote module - adder tree for each class and comparator tree choosing the class with the most votes
+    number_of_classes = random_forest.number_of_classes
+    number_of_bits_for_votes = number_of_trees.bit_length()
+    number_of_bits_for_class = random_forest._number_of_bits_for_class_index
+    fan_in = random_forest.vote_fan_in
+
+    sums_levels = random_forest.vote_levels(number_of_trees)
+    candidates_levels = random_forest.vote_levels(number_of_classes)
+    # comparision of the output of each tree with each class, then adders with fan_in inputs
+    vote_luts = number_of_trees * number_of_classes * max(luts_for_and(number_of_bits_for_class), 1)
+    vote_luts += number_of_classes * sum(sums_levels) * (fan_in - 1) * number_of_bits_for_votes
+    # fan_in candidates are compared pairwise and the winning votes and index are selected by a multiplexer
+    vote_luts += sum(candidates_levels) * (fan_in * (fan_in - 1) // 2 * luts_for_comparator(number_of_bits_for_votes)
+                                           + (fan_in - 1) * (number_of_bits_for_votes + number_of_bits_for_class))
+    register_bits += number_of_classes * sum(sums_levels) * number_of_bits_for_votes
+    register_bits += sum(candidates_levels) * (number_of_bits_for_votes + number_of_bits_for_class)
+
+    return ResourceEstimate(
+        number_of_comparators,
+        random_forest._number_of_bits_per_feature,
+        register_bits,
+        comparators_luts,
+        decision_luts + vote_luts,
+        latency=random_forest.latency,
+        initiation_interval=random_forest.initiation_interval,
+        memory_bits=sum(estimate.memory_bits for estimate in trees_estimates),
+    )
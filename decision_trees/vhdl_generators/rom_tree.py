@@ -0,0 +1,311 @@
+from decision_trees.vhdl_generators.tree import Tree
+from decision_trees.vhdl_generators import resource_estimator
+
+import numpy as np
+
+from decision_trees.utils.convert_to_fixed_point import get_max_code
+
+# tree traversed by a small sequential circuit, with the nodes stored in a ROM (inferred as a block RAM),
+# it needs only one comparator, so it can be used for trees too big for the parallel architecture of Tree
+# - each node of the ROM holds the index of the feature, the threshold code and the two children, each child
+#   is either the address of the next split or the class of the leaf (marked with the most significant bit),
+# - the samples are kept in a ring of slots rotated in every clock cycle: in position 0 the node of the sample is
+#   read from the ROM (synchronous read) and in position 1 the next node is chosen, so one level of the tree takes
+#   one turn of the ring (2 clock cycles without interleaving),
+# - with number_of_interleaved_samples > 1 the ring holds that many samples, which are processed in turns,
+#   so the ROM and the comparator are used in every clock cycle,
+# - a new sample is taken every initiation_interval clock cycles (when the phase counter is 0), it replaces
+#   the sample in position 0 of the ring, which has already visited number_of_levels nodes; the class of the
+#   replaced sample is registered on the output
+# the class is set only when a leaf is reached, so the result is the same as the one of Tree.predict
+
+
+class RomTree(Tree):
+
+    def __init__(self, name: str, number_of_features: int, number_of_bits_per_feature: int,
+                 number_of_interleaved_samples: int = 1, minimal_number_of_levels: int = 1):
+        if number_of_interleaved_samples < 1:
+            raise ValueError("Number of interleaved samples has to be at least 1!")
+
+        self.number_of_interleaved_samples = number_of_interleaved_samples
+        # used by RandomForest, so all its trees have the same latency and initiation interval
+        self.minimal_number_of_levels = minimal_number_of_levels
+
+        Tree.__init__(self, name, number_of_features, number_of_bits_per_feature)
+
+    @classmethod
+    def from_tree(cls, tree: Tree, number_of_interleaved_samples: int = 1, minimal_number_of_levels: int = 1):
+        rom_tree = cls(tree.filename, tree._number_of_features, tree._number_of_bits_per_feature,
+                       number_of_interleaved_samples, minimal_number_of_levels)
+        rom_tree.set_arrays(tree.arrays)
+        rom_tree._leaf_store = tree.leaf_store
+        rom_tree.number_of_lanes = tree.number_of_lanes
+        if tree.flag_regression:
+            rom_tree.set_leaf_values(tree.leaf_values, tree.number_of_bits_per_leaf_value,
+                                     tree.number_of_fraction_bits)
+
+        return rom_tree
+
+    @property
+    def decision_store(self):
+        # the tree is traversed, so the minimized terms are not used
+        return self.leaf_store
+
+    def apply_hardware(self, input_data: np.ndarray) -> np.ndarray:
+        # the same traversal as in the generated vhdl, every sample reaches a leaf
+        return self.arrays.apply(np.asarray(input_data))
+
+    @property
+    def number_of_slots(self) -> int:
+        # without interleaving, the second slot of the ring is empty
+        return max(self.number_of_interleaved_samples, 2)
+
+    @property
+    def number_of_levels(self) -> int:
+        # number of nodes read for each sample, with the interleaving it has to give 1 modulo the number of
+        # interleaved samples, so the consecutive new samples are placed in the consecutive slots of the ring
+        number_of_levels = max(self.find_depth(), self.minimal_number_of_levels, 1)
+        if self.number_of_interleaved_samples > 1:
+            number_of_levels += (1 - number_of_levels) % self.number_of_interleaved_samples
+        return number_of_levels
+
+    @property
+    def initiation_interval(self) -> int:
+        return self.number_of_levels * self.number_of_slots // self.number_of_interleaved_samples
+
+    @property
+    def latency(self) -> int:
+        # the sample stays in the ring for one turn per level, then its class is registered on the output
+        return self.number_of_levels * self.number_of_slots + 1
+
+    def _vhdl_parameters(self) -> tuple:
+        return Tree._vhdl_parameters(self) + ("rom", self.number_of_interleaved_samples, self.number_of_levels)
+
+    def _estimate_lane_resources(self) -> resource_estimator.ResourceEstimate:
+        return resource_estimator.estimate_rom_tree(self)
+
+    # sizes of the fields of the ROM word (from the most significant bits): feature, threshold, left, right child
+
+    @property
+    def _number_of_feature_slots(self) -> int:
+        # at least one, so the feature of the splits always exists
+        return max(len(self.used_features), 1)
+
+    @property
+    def _number_of_bits_for_feature_index(self) -> int:
+        return max((self._number_of_feature_slots - 1).bit_length(), 1)
+
+    @property
+    def _number_of_bits_for_address(self) -> int:
+        return max((len(self.splits) - 1).bit_length(), 1)
+
+    @property
+    def _number_of_bits_for_child(self) -> int:
+        return 1 + max(self._number_of_bits_for_address, self._number_of_bits_for_class_index)
+
+    @property
+    def number_of_bits_for_word(self) -> int:
+        return self._number_of_bits_for_feature_index + self._number_of_bits_per_feature \
+            + 2 * self._number_of_bits_for_child
+
+    @property
+    def rom_size(self) -> int:
+        return max(len(self.splits), 1)
+
+    def _child_code(self, node: int) -> int:
+        number_of_splits = self.arrays.number_of_splits
+        if node < number_of_splits:
+            return node
+        return (1 << (self._number_of_bits_for_child - 1)) | int(self.arrays.leaf_class[node - number_of_splits])
+
+    def rom_words(self) -> [int]:
+        # the comparisions with the thresholds outside of the range of the features always give the same result,
+        # so both children of such split are set to the child that is always chosen
+        arrays = self.arrays
+        max_value = get_max_code(self._number_of_bits_per_feature)
+        feature_positions = self._feature_positions()
+        bits_for_child = self._number_of_bits_for_child
+
+        words = []
+        for split_id in range(arrays.number_of_splits):
+            left = self._child_code(arrays.children_left[split_id])
+            right = self._child_code(arrays.children_right[split_id])
+            threshold_code = int(arrays.threshold_code[split_id])
+            if threshold_code >= max_value:
+                right = left
+            elif threshold_code < 0:
+                left = right
+            threshold_code = min(max(threshold_code, 0), max_value)
+            feature_position = max(int(feature_positions[arrays.feature[split_id]]), 0)
+
+            words.append((((feature_position << self._number_of_bits_per_feature | threshold_code)
+                           << bits_for_child | left) << bits_for_child) | right)
+
+        return words if words else [0]
+
+    def _add_architecture_constant_section(self):
+        self._insert_text_line_with_indent(f"-- nodes of the tree, {self.rom_size} words of "
+                                           f"{self.number_of_bits_for_word} bits, "
+                                           f"{self.number_of_interleaved_samples} interleaved samples, "
+                                           f"a new sample every {self.initiation_interval} clock cycles")
+        self._insert_text_line_with_indent(f"type rom_t\tis array(0 to {self.rom_size}-1) of "
+                                           f"std_logic_vector({self.number_of_bits_for_word}-1 downto 0);")
+        self._insert_text_line_with_indent("constant ROM\t:\trom_t\t:= (")
+        with self._writer.indent():
+            words = self.rom_words()
+            for address, word in enumerate(words):
+                separator = "," if address != len(words) - 1 else ""
+                self._insert_text_line_with_indent(f"{address} => \"{word:0{self.number_of_bits_for_word}b}\""
+                                                   f"{separator}")
+        self._insert_text_line_with_indent(");")
+        self._insert_text_line_with_indent("")
+
+        Tree._add_architecture_constant_section(self)
+
+    def _add_architecture_signal_section(self):
+        number_of_slots = self.number_of_slots
+        bits_for_class = self._number_of_bits_for_class_index
+
+        self._insert_text_line_with_indent(f"type features_t\tis array(0 to {self._number_of_feature_slots}-1) of "
+                                           f"unsigned({self._number_of_bits_per_feature}-1 downto 0);")
+        self._insert_text_line_with_indent(f"type slots_features_t\tis array(0 to {number_of_slots}-1) of "
+                                           "features_t;")
+        self._insert_text_line_with_indent(f"type slots_address_t\tis array(0 to {number_of_slots}-1) of "
+                                           f"unsigned({self._number_of_bits_for_address}-1 downto 0);")
+        self._insert_text_line_with_indent(f"type slots_class_t\tis array(0 to {number_of_slots}-1) of "
+                                           f"unsigned({bits_for_class}-1 downto 0);")
+        self._insert_text_line_with_indent("")
+
+        self._insert_text_line_with_indent("signal features\t\t:\tfeatures_t\t\t\t:= (others=>(others=>'0'));")
+        self._insert_text_line_with_indent("signal slotFeatures\t:\tslots_features_t\t\t\t"
+                                           ":= (others=>(others=>(others=>'0')));")
+        self._insert_text_line_with_indent("signal slotAddress\t:\tslots_address_t\t\t\t:= (others=>(others=>'0'));")
+        self._insert_text_line_with_indent("signal slotClass\t:\tslots_class_t\t\t\t:= (others=>(others=>'0'));")
+        self._insert_text_line_with_indent(f"signal slotDone\t:\tstd_logic_vector({number_of_slots}-1 downto 0)"
+                                           "\t\t\t:= (others=>'0');")
+        self._insert_text_line_with_indent(f"signal romData\t:\tstd_logic_vector({self.number_of_bits_for_word}-1 "
+                                           "downto 0)\t\t\t:= (others=>'0');")
+        self._insert_text_line_with_indent(f"signal phase\t:\tnatural range 0 to {self.initiation_interval}-1"
+                                           "\t\t\t:= 0;")
+        self._insert_text_line_with_indent(f"signal classIndex\t:\tunsigned({bits_for_class}-1 downto 0)"
+                                           "\t\t\t:= (others=>'0');")
+        self._insert_text_line_with_indent("")
+
+    def _add_architecture_process_section(self):
+        self._add_architecture_input_mapping("unsigned")
+        self._insert_text_line_with_indent("")
+        self._add_architecture_process_traverse()
+        self._add_architecture_output()
+        self._insert_text_line_with_indent("")
+
+    def _add_copy_slot(self, source: str, destination: str, fields: [str]):
+        for field in fields:
+            self._insert_text_line_with_indent(f"slot{field}({destination}) <= slot{field}({source});")
+
+    def _add_architecture_process_traverse(self):
+        bits = self._number_of_bits_per_feature
+        bits_for_child = self._number_of_bits_for_child
+        bits_for_feature_index = self._number_of_bits_for_feature_index
+        word_bits = self.number_of_bits_for_word
+        fields = ["Features", "Address", "Class", "Done"]
+        next_slot = 2 % self.number_of_slots
+
+        # the root is the first split (or the only leaf of the tree)
+        number_of_splits = self.arrays.number_of_splits
+        root_done = "'1'" if self.arrays.root >= number_of_splits else "'0'"
+        root_class = int(self.arrays.leaf_class[self.arrays.root - number_of_splits]) if root_done == "'1'" else 0
+
+        self._insert_text_line_with_indent("traverse : process(clk)")
+        with self._writer.indent():
+            self._insert_text_line_with_indent(f"variable child\t:\tstd_logic_vector({bits_for_child}-1 downto 0);")
+        self._insert_text_line_with_indent("begin")
+        with self._writer.indent():
+            self._insert_text_line_with_indent("if clk='1' and clk'event then")
+            with self._writer.indent():
+                self._insert_text_line_with_indent("if rst='1' then")
+                with self._writer.indent():
+                    self._insert_text_line_with_indent("phase <= 0;")
+                self._insert_text_line_with_indent("elsif en='1' then")
+                with self._writer.indent():
+                    self._insert_text_line_with_indent(f"if phase = {self.initiation_interval}-1 then")
+                    with self._writer.indent():
+                        self._insert_text_line_with_indent("phase <= 0;")
+                    self._insert_text_line_with_indent("else")
+                    with self._writer.indent():
+                        self._insert_text_line_with_indent("phase <= phase + 1;")
+                    self._insert_text_line_with_indent("end if;")
+                    self._insert_text_line_with_indent("")
+
+                    self._insert_text_line_with_indent("-- position 0: the node is read, a new sample replaces "
+                                                       "the finished one")
+                    self._insert_text_line_with_indent("if phase = 0 then")
+                    with self._writer.indent():
+                        self._insert_text_line_with_indent("romData <= ROM(0);")
+                        self._insert_text_line_with_indent("classIndex <= slotClass(0);")
+                        self._insert_text_line_with_indent("slotFeatures(1) <= features;")
+                        self._insert_text_line_with_indent("slotAddress(1) <= (others=>'0');")
+                        self._insert_text_line_with_indent(f"slotClass(1) <= to_unsigned({root_class}, "
+                                                           "classIndex'length);")
+                        self._insert_text_line_with_indent(f"slotDone(1) <= {root_done};")
+                    self._insert_text_line_with_indent("else")
+                    with self._writer.indent():
+                        self._insert_text_line_with_indent("romData <= ROM(to_integer(slotAddress(0)));")
+                        self._add_copy_slot("0", "1", fields)
+                    self._insert_text_line_with_indent("end if;")
+                    self._insert_text_line_with_indent("")
+
+                    self._insert_text_line_with_indent("-- position 1: the next node is chosen")
+                    self._add_copy_slot("1", str(next_slot), fields)
+                    self._insert_text_line_with_indent("if slotDone(1) = '0' then")
+                    with self._writer.indent():
+                        feature = (f"slotFeatures(1)(to_integer(unsigned(romData({word_bits}-1 downto "
+                                   f"{word_bits - bits_for_feature_index}))))")
+                        threshold = (f"unsigned(romData({2 * bits_for_child + bits}-1 downto "
+                                     f"{2 * bits_for_child}))")
+                        self._insert_text_line_with_indent(f"if {feature} > {threshold} then")
+                        with self._writer.indent():
+                            self._insert_text_line_with_indent(f"child := romData({bits_for_child}-1 downto 0);")
+                        self._insert_text_line_with_indent("else")
+                        with self._writer.indent():
+                            self._insert_text_line_with_indent(f"child := romData({2 * bits_for_child}-1 downto "
+                                                               f"{bits_for_child});")
+                        self._insert_text_line_with_indent("end if;")
+                        self._insert_text_line_with_indent(f"if child({bits_for_child}-1) = '1' then")
+                        with self._writer.indent():
+                            self._insert_text_line_with_indent(f"slotDone({next_slot}) <= '1';")
+                            self._insert_text_line_with_indent(f"slotClass({next_slot}) <= resize(unsigned(child("
+                                                               f"{bits_for_child - 1}-1 downto 0)), "
+                                                               "classIndex'length);")
+                        self._insert_text_line_with_indent("else")
+                        with self._writer.indent():
+                            self._insert_text_line_with_indent(f"slotAddress({next_slot}) <= resize(unsigned(child("
+                                                               f"{bits_for_child - 1}-1 downto 0)), "
+                                                               "slotAddress(0)'length);")
+                        self._insert_text_line_with_indent("end if;")
+                    self._insert_text_line_with_indent("end if;")
+
+                    if self.number_of_slots > 2:
+                        self._insert_text_line_with_indent("")
+                        self._insert_text_line_with_indent("-- other positions: the samples wait for their turn")
+                        for position in range(2, self.number_of_slots):
+                            self._add_copy_slot(str(position), str((position + 1) % self.number_of_slots), fields)
+                self._insert_text_line_with_indent("end if;")
+            self._insert_text_line_with_indent("end if;")
+        self._insert_text_line_with_indent("end process traverse;")
+        self._insert_text_line_with_indent("")
+
+
+def select_architecture(tree: Tree, available_luts: int, available_registers: int,
+                        number_of_interleaved_samples: int = 1) -> Tree:
+    # the parallel architecture (a new sample in every clock cycle) is chosen if it fits in the available resources,
+    # otherwise the ROM architecture (if it does not fit either, the one with less LUTs is chosen)
+    parallel_estimate = tree.estimate_resources()
+    if parallel_estimate.fits(available_luts, available_registers):
+        return tree
+
+    rom_tree = RomTree.from_tree(tree, number_of_interleaved_samples)
+    rom_estimate = rom_tree.estimate_resources()
+    if rom_estimate.fits(available_luts, available_registers) or rom_estimate.luts < parallel_estimate.luts:
+        return rom_tree
+
+    return tree
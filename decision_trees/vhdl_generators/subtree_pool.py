@@ -0,0 +1,162 @@
+import numpy as np
+
+from decision_trees.vhdl_generators.leaf_store import LeafStore
+
+# subtrees shared by the trees of the forest (hash-consing)
+# trees trained on the same quantized features often contain identical subtrees (especially near the leaves and with
+# a low number of bits per feature), so every subtree is identified by its structure - (feature, threshold code,
+# left subtree, right subtree) for the splits and the class for the leaves - and stored only once; the forest
+# becomes a DAG of the unique nodes, with one root per tree
+# nodes are numbered in the same way as in TreeArrays - splits 0..S-1, leaves S..S+L-1 (one leaf per class),
+# children of a split always have lower IDs than the split (among the splits)
+
+
+class SubtreePool:
+
+    def __init__(self, trees: []):
+        all_arrays = [tree.arrays for tree in trees]
+        self.number_of_classes = max([arrays.number_of_classes for arrays in all_arrays] + [1])
+
+        # during the construction the leaves are referenced as ~class (negative values) and the splits by their IDs
+        splits_ids = {}
+        splits_keys = []
+        thresholds = []
+        roots = []
+        self.number_of_splits_in_trees = 0
+        for arrays in all_arrays:
+            number_of_splits = arrays.number_of_splits
+            self.number_of_splits_in_trees += number_of_splits
+            nodes_references = np.empty(number_of_splits + arrays.number_of_leaves, dtype=np.intp)
+            nodes_references[number_of_splits:] = ~np.asarray(arrays.leaf_class, dtype=np.intp)
+            feature = arrays.feature.tolist()
+            threshold_code = arrays.threshold_code.tolist()
+            children_left = arrays.children_left.tolist()
+            children_right = arrays.children_right.tolist()
+
+            # postorder traversal, so the references of both children are known
+            nodes_to_visit = [(arrays.root, False)]
+            while nodes_to_visit:
+                node, flag_children_visited = nodes_to_visit.pop()
+                if node >= number_of_splits:
+                    continue
+                if not flag_children_visited:
+                    nodes_to_visit.append((node, True))
+                    nodes_to_visit.append((children_right[node], False))
+                    nodes_to_visit.append((children_left[node], False))
+                    continue
+
+                key = (feature[node], threshold_code[node],
+                       int(nodes_references[children_left[node]]), int(nodes_references[children_right[node]]))
+                split_id = splits_ids.get(key)
+                if split_id is None:
+                    split_id = splits_ids[key] = len(splits_keys)
+                    splits_keys.append(key)
+                    thresholds.append(arrays.threshold[node])
+                nodes_references[node] = split_id
+
+            roots.append(int(nodes_references[arrays.root]))
+
+        number_of_splits = len(splits_keys)
+        keys = np.array(splits_keys, dtype=np.int64).reshape(-1, 4)
+
+        def to_node(references: np.ndarray) -> np.ndarray:
+            references = np.asarray(references, dtype=np.intp)
+            return np.where(references >= 0, references, number_of_splits + ~references)
+
+        self.feature = keys[:, 0].astype(np.intp)
+        self.threshold_code = keys[:, 1]
+        self.threshold = np.array(thresholds, dtype=np.float64)
+        self.children_left = to_node(keys[:, 2])
+        self.children_right = to_node(keys[:, 3])
+        self.leaf_class = np.arange(self.number_of_classes, dtype=np.intp)
+        self.roots = to_node(roots)
+
+    @property
+    def number_of_splits(self) -> int:
+        return len(self.feature)
+
+    @property
+    def number_of_nodes(self) -> int:
+        return self.number_of_splits + len(self.leaf_class)
+
+    @property
+    def sharing_ratio(self) -> float:
+        # number of splits of all the trees per one unique split - the leaves are not counted, all the leaves
+        # with the same class are one node of the pool, whether any subtree is shared or not
+        return self.number_of_splits_in_trees / max(self.number_of_splits, 1)
+
+    def references_counts(self) -> np.ndarray:
+        # number of the references of each node - from the splits (both children can be the same node)
+        # and from the roots of the trees
+        counts = np.bincount(self.roots, minlength=self.number_of_nodes)
+        counts += np.bincount(self.children_left, minlength=self.number_of_nodes)
+        counts += np.bincount(self.children_right, minlength=self.number_of_nodes)
+
+        return counts
+
+    def thresholds_for(self, input_data: np.ndarray) -> np.ndarray:
+        if np.issubdtype(input_data.dtype, np.integer):
+            return self.threshold_code
+        return self.threshold
+
+    def apply(self, input_data: np.ndarray) -> np.ndarray:
+        # returns (number_of_samples x number_of_trees) matrix of the leaves of the pool (leaf ID is the class)
+        # all the trees are traversed at once, in the same way as in TreeArrays.apply
+        input_data = np.asarray(input_data)
+        number_of_splits = self.number_of_splits
+        thresholds = self.thresholds_for(input_data)
+
+        nodes = np.tile(self.roots, (len(input_data), 1))
+        samples = np.repeat(np.arange(len(input_data)), len(self.roots))
+        nodes = nodes.ravel()
+        positions = np.flatnonzero(nodes < number_of_splits)
+        while len(positions) > 0:
+            current_nodes = nodes[positions]
+            go_left = input_data[samples[positions], self.feature[current_nodes]] <= thresholds[current_nodes]
+            nodes[positions] = np.where(go_left, self.children_left[current_nodes],
+                                        self.children_right[current_nodes])
+            positions = positions[nodes[positions] < number_of_splits]
+
+        return (nodes - number_of_splits).reshape(len(input_data), len(self.roots))
+
+    def predict_trees(self, input_data: np.ndarray) -> np.ndarray:
+        # returns (number_of_samples x number_of_trees) matrix of the classes chosen by each of the trees
+        return self.leaf_class[self.apply(input_data)]
+
+    def shared_subtrees(self) -> np.ndarray:
+        # splits referenced more than once - implemented only once in the vhdl
+        return np.flatnonzero(self.references_counts()[:self.number_of_splits] >= 2)
+
+    def decision_terms(self, node: int, flag_shared: np.ndarray, flag_expand_node: bool) -> (LeafStore, np.ndarray):
+        # paths from the node to its leaves, the shared subtrees inside of it are not expanded (they are the "leaves"
+        # of the paths), returned as LeafStore with the classes of the leaves (-1 for the shared subtrees)
+        # and the shared subtree of each of the paths (-1 for the leaves)
+        # flag_expand_node - the node itself is expanded even if it is shared (the node is the shared subtree)
+        number_of_splits = self.number_of_splits
+        path_lengths = []
+        path_split_ids = []
+        path_directions = []
+        classes = []
+        subtrees = []
+
+        nodes_to_visit = [(node, [], [])]
+        while nodes_to_visit:
+            node, split_ids, directions = nodes_to_visit.pop()
+            if node < number_of_splits and not (flag_shared[node] and (len(split_ids) > 0 or not flag_expand_node)):
+                # right child is visited after the whole left subtree
+                nodes_to_visit.append((self.children_right[node], split_ids + [node], directions + [1]))
+                nodes_to_visit.append((self.children_left[node], split_ids + [node], directions + [0]))
+                continue
+
+            path_lengths.append(len(split_ids))
+            path_split_ids.extend(split_ids)
+            path_directions.extend(directions)
+            classes.append(self.leaf_class[node - number_of_splits] if node >= number_of_splits else -1)
+            subtrees.append(node if node < number_of_splits else -1)
+
+        path_indptr = np.zeros(len(path_lengths) + 1, dtype=np.intp)
+        np.cumsum(path_lengths, out=path_indptr[1:])
+
+        return (LeafStore(path_indptr, np.array(path_split_ids, dtype=np.intp),
+                          np.array(path_directions, dtype=np.uint8), np.array(classes, dtype=np.intp)),
+                np.array(subtrees, dtype=np.intp))
@@ -0,0 +1,107 @@
+from enum import Enum, auto
+
+import numpy as np
+
+from decision_trees.utils.convert_to_fixed_point import get_max_code
+
+# all the comparisions of one feature can be replaced by one range encoder of the feature:
+# unique thresholds of the feature t_0 < t_1 < ... < t_m-1 split its range into m + 1 intervals and the index
+# of the interval of the value (number of the thresholds lower than the value, np.searchsorted) gives the results
+# of all the comparisions - value > t_j if and only if the index is greater than j
+# - THERMOMETER - the encoder registers one bit per threshold (bit j is set if the value is greater than t_j),
+# - INTERVAL_INDEX - the encoder registers the index of the interval (chain of the comparisions with the thresholds,
+#   synthesised as a function of the bits of the feature), the decision logic compares it with the constants
+# in both cases the splitResult bits are assigned from the registered values, so decideClass is not changed
+
+
+class ThresholdEncoding(Enum):
+    # one comparator per split (the original architecture)
+    COMPARATORS = auto()
+    THERMOMETER = auto()
+    INTERVAL_INDEX = auto()
+
+
+class FeatureIntervals:
+    # thresholds of the features, only the thresholds inside of the range of the features (the other comparisions
+    # always give the same result and no comparator is needed, see VHDLCreator._add_process_compare)
+    # thresholds of the feature features[k] are in threshold_codes[indptr[k]:indptr[k + 1]] (sorted, unique)
+    # split i is compared with the threshold of split_rank[i] in the list of the feature split_slot[i]
+    # (split_slot is -1 for the splits without a comparator)
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, threshold_code: np.ndarray,
+                 number_of_bits_per_feature: int):
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold)
+        self.threshold_code = np.asarray(threshold_code)
+
+        flag_comparator = (self.threshold_code >= 0) & (self.threshold_code < get_max_code(number_of_bits_per_feature))
+        comparators = np.flatnonzero(flag_comparator)
+        pairs, first_split, pairs_indices = np.unique(
+            np.stack([self.feature[comparators], self.threshold_code[comparators]], axis=1).astype(np.int64),
+            axis=0, return_index=True, return_inverse=True
+        )
+        pairs_indices = pairs_indices.ravel()
+
+        self.features, features_first_pair = np.unique(pairs[:, 0], return_index=True)
+        self.indptr = np.append(features_first_pair, len(pairs)).astype(np.intp)
+        self.threshold_codes = pairs[:, 1]
+        self.thresholds = self.threshold[comparators[first_split]]
+
+        pairs_slot = np.repeat(np.arange(len(self.features)), np.diff(self.indptr))
+        self.split_slot = np.full(len(self.feature), -1, dtype=np.intp)
+        self.split_rank = np.zeros(len(self.feature), dtype=np.intp)
+        self.split_slot[comparators] = pairs_slot[pairs_indices]
+        self.split_rank[comparators] = pairs_indices - self.indptr[pairs_slot[pairs_indices]]
+
+    @property
+    def number_of_thresholds(self) -> np.ndarray:
+        # for each of the features
+        return np.diff(self.indptr)
+
+    @property
+    def number_of_bits_for_index(self) -> np.ndarray:
+        # index of the interval is in the range 0..number_of_thresholds
+        return np.maximum([int(number).bit_length() for number in self.number_of_thresholds], 1)
+
+    def interval_indices(self, input_data: np.ndarray) -> np.ndarray:
+        # (number_of_features x number_of_samples) indices of the intervals, for the integer codes of the features
+        # the codes of the thresholds are used (the same as in TreeArrays.thresholds_for)
+        input_data = np.asarray(input_data)
+        if np.issubdtype(input_data.dtype, np.integer):
+            # codes of the thresholds in the range of the features fit in the type of the codes of the features,
+            # so searchsorted does not have to convert the values
+            thresholds = self.threshold_codes.astype(input_data.dtype)
+        else:
+            thresholds = self.thresholds
+        dtype = np.uint8 if self.number_of_thresholds.max(initial=0) < 256 else np.uint16
+
+        # one row per feature, so the values of each feature are contiguous
+        features_values = np.ascontiguousarray(input_data[:, self.features].T)
+        indices = np.empty((len(self.features), len(input_data)), dtype=dtype)
+        for slot in range(len(self.features)):
+            # side="left" - number of the thresholds lower than the value, so a value equal to the threshold
+            # is in the interval to the left of it (value <= threshold), NaN values are placed after all thresholds
+            indices[slot] = np.searchsorted(thresholds[self.indptr[slot]:self.indptr[slot + 1]],
+                                            features_values[slot], side="left")
+
+        return indices
+
+    def compute_split_results(self, input_data: np.ndarray) -> np.ndarray:
+        # the same values as comparator_model.compute_split_results, the splits without a comparator
+        # are compared directly
+        # the matrix is computed with one row per split and returned transposed, so it does not have to be copied
+        # by pack_split_results
+        input_data = np.asarray(input_data)
+        if len(self.features) == 0:
+            split_results = np.empty((len(input_data), len(self.feature)), dtype=bool)
+        else:
+            # the splits without a comparator read the first feature, their results are replaced below
+            split_results = (self.interval_indices(input_data)[np.maximum(self.split_slot, 0)]
+                             > self.split_rank.astype(np.uint16)[:, None]).T
+
+        not_encoded = np.flatnonzero(self.split_slot < 0)
+        if len(not_encoded) > 0:
+            thresholds = self.threshold_code if np.issubdtype(input_data.dtype, np.integer) else self.threshold
+            split_results[:, not_encoded] = ~(input_data[:, self.feature[not_encoded]] <= thresholds[not_encoded])
+
+        return split_results
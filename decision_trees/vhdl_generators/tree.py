@@ -1,34 +1,46 @@
 from decision_trees.vhdl_generators.VHDLCreator import VHDLCreator
+from decision_trees.vhdl_generators.tree_arrays import TreeArrays
+from decision_trees.vhdl_generators.leaf_store import LeafStore
+from decision_trees.vhdl_generators import comparator_model
+from decision_trees.vhdl_generators import leaf_minimizer
+from decision_trees.vhdl_generators import predictor_compiler
+from decision_trees.vhdl_generators import resource_estimator
+from decision_trees.vhdl_generators import threshold_encoder
+from decision_trees.vhdl_generators import vhdl_writer
+from decision_trees.vhdl_generators.threshold_encoder import ThresholdEncoding, FeatureIntervals
+
+import hashlib
+import sys
 
 import numpy as np
+import sklearn.base
 import sklearn.tree
 
-from decision_trees.utils.convert_to_fixed_point import convert_to_fixed_point
+from decision_trees.utils.convert_to_fixed_point import convert_threshold_to_fixed_point_code
+from decision_trees.utils.convert_to_fixed_point import get_threshold_code_dtype
+from decision_trees.utils.convert_to_fixed_point import get_fraction_bits, convert_to_signed_fixed_point_code
 from decision_trees.utils.constants import ClassifierType
 
 
 class Split:
+    # value_code - value_to_compare as an integer, the same value that is used in vhdl
+    # (value_to_compare * 2^number_of_bits)
+    __slots__ = ("id", "var_idx", "value_to_compare", "value_code")
 
-    id = 0
-    var_idx = 0
-    value_to_compare = 0.0
-
-    def __init__(self, id_, var_idx_, value_to_compare_):
+    def __init__(self, id_, var_idx_, value_to_compare_, value_code_):
         self.id = id_
         self.var_idx = var_idx_
         self.value_to_compare = value_to_compare_
+        self.value_code = value_code_
 
     def show(self):
-        print("Split[", self.id, "], var_idx: ", self.var_idx, ", value to compare: ", self.value_to_compare)
+        print("Split[", self.id, "], var_idx: ", self.var_idx, ", value to compare: ", self.value_to_compare,
+              ", value code: ", self.value_code)
 
 
 class Leaf:
-
-    id = 0
-    class_idx = 0
-
-    following_split_IDs = []
-    following_split_compare_values = []
+    # leaves are stored in the LeafStore of the Tree, objects of this class are only created on request (Tree.leaves)
+    __slots__ = ("id", "class_idx", "following_split_IDs", "following_split_compare_values")
 
     def __init__(self, id_, class_idx_, following_split_IDs_, following_split_compare_values_):
         self.id = id_
@@ -52,90 +64,370 @@ class Leaf:
         print(compare_values)
 
 
-# TODO: while the tree structure takes into account the number of bits used for compare values...
-# TODO cont: ... it is not implemented in vhdl conversion
-
-# TODO add code that retrains the network on already limited representation
-
-class Tree(VHDLCreator):
+# hashes of the source of the modules generating the vhdl, indexed by the class of the tree (see vhdl_hash)
+_generator_sources_hashes = {}
 
-    def __init__(self, name: str, number_of_features: int, number_of_bits_per_feature: int):
-        self._current_split_index = 0
-        self._current_leaf_index = 0
 
-        self.splits = []
-        self.leaves = []
+def _generator_source_hash(tree_class) -> str:
+    # the vhdl of the tree is emitted by the modules of its class and of its base classes, with the vhdl writer
+    # and the threshold encoders - any change of their source changes vhdl_hash of all the trees, so the files
+    # of the trees named by vhdl_hash are generated again (no version has to be changed by hand)
+    if tree_class not in _generator_sources_hashes:
+        modules = [sys.modules[cls.__module__] for cls in tree_class.__mro__
+                   if cls.__module__.startswith("decision_trees.")]
+        hash_ = hashlib.sha256()
+        for module in modules + [vhdl_writer, threshold_encoder]:
+            with open(module.__file__, "rb") as source_file:
+                hash_.update(source_file.read())
+        _generator_sources_hashes[tree_class] = hash_.hexdigest()
 
-        VHDLCreator.__init__(self, name, ClassifierType.DECISION_TREE.name,
-                             number_of_features, number_of_bits_per_feature)
+    return _generator_sources_hashes[tree_class]
 
-    def build(self, tree):
-        self._current_split_index = 0
-        self._current_leaf_index = 0
 
-        self.splits = []
-        self.leaves = []
+# TODO add code that retrains the network on already limited representation
 
-        following_splits_IDs = []
-        following_splits_compare_values = []
+class Tree(VHDLCreator):
 
-        features_names = []
-        for i in range(0, self._number_of_features):
-            features_names.append(i)
+    def __init__(self, name: str, number_of_features: int, number_of_bits_per_feature: int,
+                 number_of_pipeline_stages: int = 1,
+                 threshold_encoding: ThresholdEncoding = ThresholdEncoding.COMPARATORS,
+                 number_of_bits_per_leaf_value: int = 16):
+        if number_of_pipeline_stages < 1:
+            raise ValueError("Number of pipeline stages has to be at least 1!")
+
+        # number of register stages of the decideClass part of the generated vhdl - the paths of the leaves are
+        # split by level between the stages, so each stage has to calculate only a part of the AND network
+        # (1 is the original architecture, with one decideClass process)
+        self.number_of_pipeline_stages = number_of_pipeline_stages
+        # how the splitResult bits are calculated - one comparator per split, or one range encoder per feature
+        # (see threshold_encoder)
+        self.threshold_encoding = threshold_encoding
+        self._feature_intervals = None
+        self._splits = []
+        self._leaf_store = None
+        self.arrays = None
+        self._leaf_path_masks = None
+        # minimized product terms of the classes (set by minimize), used instead of the leaves in the vhdl
+        self._decision_terms = None
+        # values of the leaves of the regression tree (None for the classification trees) - the class of the leaf
+        # is the index of its value in leaf_values, so the decision logic is the same as for the classification,
+        # the output of the vhdl is the signed fixed point code of the value (leaf_values_codes)
+        # the values (means of the targets of the leaves) are stored as float32, as the class distributions
+        self.leaf_values = None
+        self.number_of_bits_per_leaf_value = number_of_bits_per_leaf_value
+        self.number_of_fraction_bits = None
 
-        features = [
-            features_names[i] if i != sklearn.tree._tree.TREE_UNDEFINED else "undefined!"
-            for i in tree.tree_.feature
-        ]
+        VHDLCreator.__init__(self, name, ClassifierType.DECISION_TREE.name,
+                             number_of_features, number_of_bits_per_feature)
 
-        self._preorder(tree.tree_, features, following_splits_IDs, following_splits_compare_values, 0)
+    # splits and leaf store of the tree loaded from a file (set_arrays) are created only when they are needed
+    @property
+    def splits(self) -> [Split]:
+        if self._splits is None:
+            arrays = self.arrays
+            self._splits = [
+                Split(i, int(arrays.feature[i]), float(arrays.threshold[i]), int(arrays.threshold_code[i]))
+                for i in range(arrays.number_of_splits)
+            ]
+        return self._splits
+
+    @property
+    def leaf_store(self) -> LeafStore:
+        if self._leaf_store is None:
+            self._leaf_store = LeafStore.from_arrays(self.arrays)
+        return self._leaf_store
+
+    @property
+    def decision_store(self) -> LeafStore:
+        # conditions checked by decideClass - the minimized terms of the classes, or the paths of the leaves
+        if self._decision_terms is not None:
+            return self._decision_terms
+        return self.leaf_store
+
+    @property
+    def feature_intervals(self) -> FeatureIntervals:
+        if self._feature_intervals is None:
+            self._feature_intervals = FeatureIntervals(self.arrays.feature, self.arrays.threshold,
+                                                       self.arrays.threshold_code, self._number_of_bits_per_feature)
+        return self._feature_intervals
+
+    @property
+    def leaves(self) -> [Leaf]:
+        # Leaf objects are created from the leaf store every time, use leaf_store directly where it is possible
+        leaf_store = self.leaf_store
+        if leaf_store.class_distributions is not None:
+            classes_values = leaf_store.class_distributions[:, None, :]
+        else:
+            # only the class is stored, so it is returned as one-hot class values
+            classes_values = np.eye(self.arrays.number_of_classes)[leaf_store.classes][:, None, :]
+
+        leaves = []
+        for leaf_id in range(leaf_store.number_of_leaves):
+            split_ids, directions = leaf_store.path(leaf_id)
+            leaves.append(Leaf(leaf_id, classes_values[leaf_id], split_ids.tolist(), directions.tolist()))
+
+        return leaves
+
+    @property
+    def number_of_classes(self) -> int:
+        return self.arrays.number_of_classes
+
+    @property
+    def flag_regression(self) -> bool:
+        return self.leaf_values is not None
+
+    @property
+    def leaf_values_codes(self) -> np.ndarray:
+        # value = code / 2^number_of_fraction_bits
+        return convert_to_signed_fixed_point_code(self.leaf_values, self.number_of_fraction_bits,
+                                                  self.number_of_bits_per_leaf_value)
+
+    def set_leaf_values(self, leaf_values: np.ndarray, number_of_bits_per_leaf_value: int = None,
+                        number_of_fraction_bits: int = None):
+        # if number_of_fraction_bits is not given, the highest precision in which all the values fit is used
+        # (RandomForest sets the same format for all its trees)
+        if number_of_bits_per_leaf_value is not None:
+            self.number_of_bits_per_leaf_value = number_of_bits_per_leaf_value
+        self.leaf_values = np.asarray(leaf_values, dtype=np.float32)
+        if number_of_fraction_bits is None:
+            number_of_fraction_bits = get_fraction_bits(float(np.abs(self.leaf_values).max(initial=0.0)),
+                                                        self.number_of_bits_per_leaf_value)
+        self.number_of_fraction_bits = number_of_fraction_bits
+
+    @property
+    def _number_of_bits_for_output(self) -> int:
+        if self.flag_regression:
+            return self.number_of_bits_per_leaf_value
+        return self._number_of_bits_for_class_index
+
+    def _find_used_features(self) -> np.ndarray:
+        return self._features_with_comparators(self.arrays.feature, self.arrays.threshold_code,
+                                               self._number_of_bits_per_feature)
+
+    def set_arrays(self, arrays: TreeArrays):
+        # used instead of build, when the tree is already available in the form of arrays
+        self.arrays = arrays
+        self._splits = None
+        self._leaf_store = None
+        self._leaf_path_masks = None
+        self._decision_terms = None
+        self._feature_intervals = None
+
+    def minimize(self):
+        # removes the redundant splits and merges the leaves with the same class (predictions do not change),
+        # then minimizes the conditions of each class used in the vhdl (see leaf_minimizer)
+        # class distributions of the merged leaves are not known, so they are not kept
+        self.set_arrays(leaf_minimizer.simplify_tree_arrays(self.arrays))
+        self._decision_terms = leaf_minimizer.minimize_class_terms(self.arrays, self.leaf_store)
+
+    def build(self, tree, flag_keep_class_distributions: bool = False):
+        # class distributions of the leaves (scikit tree_.value) are kept (as float32) only if requested,
+        # otherwise only the chosen class is stored
+        # for the regression trees the unique values of the leaves are stored (see leaf_values)
+        tree_ = tree.tree_
+        flag_regression = sklearn.base.is_regressor(tree)
+        if flag_regression and tree_.n_outputs != 1:
+            raise ValueError("Only the regression trees with one output are supported!")
+        is_split = tree_.feature != sklearn.tree._tree.TREE_UNDEFINED
+
+        # preorder traversal of the scikit tree - splits are numbered in the order they are visited,
+        # leaves are numbered from left to right
+        split_nodes = []
+        leaf_nodes = []
+        nodes_to_visit = [0]
+        while nodes_to_visit:
+            node = nodes_to_visit.pop()
+            if is_split[node]:
+                split_nodes.append(node)
+                nodes_to_visit.append(tree_.children_right[node])
+                nodes_to_visit.append(tree_.children_left[node])
+            else:
+                leaf_nodes.append(node)
+
+        split_nodes = np.array(split_nodes, dtype=np.intp)
+        leaf_nodes = np.array(leaf_nodes, dtype=np.intp)
+        number_of_splits = len(split_nodes)
+
+        # index of each scikit node in the TreeArrays (split ID for splits, number of splits + leaf ID for leaves)
+        nodes_indices = np.empty(tree_.node_count, dtype=np.intp)
+        nodes_indices[split_nodes] = np.arange(number_of_splits)
+        nodes_indices[leaf_nodes] = number_of_splits + np.arange(len(leaf_nodes))
+
+        # all the thresholds are converted at once (rounded down, so the quantized data is split in the same way
+        # as by scikit)
+        thresholds_codes = convert_threshold_to_fixed_point_code(tree_.threshold[split_nodes],
+                                                                 self._number_of_bits_per_feature)
+        leaves_values = tree_.value[leaf_nodes]
+        if flag_regression:
+            leaf_values, leaf_class = np.unique(leaves_values[:, 0, 0], return_inverse=True)
+            leaf_class = leaf_class.ravel()
+        else:
+            leaf_class = np.argmax(leaves_values[:, 0, :], axis=1)
+
+        self.set_arrays(TreeArrays(
+            tree_.feature[split_nodes].astype(np.intp),
+            thresholds_codes / float(1 << self._number_of_bits_per_feature),
+            thresholds_codes.astype(get_threshold_code_dtype(self._number_of_bits_per_feature)),
+            nodes_indices[tree_.children_left[split_nodes]],
+            nodes_indices[tree_.children_right[split_nodes]],
+            leaf_class,
+            int(nodes_indices[0]),
+            len(leaf_values) if flag_regression else leaves_values.shape[-1],
+        ))
+
+        self._leaf_store = LeafStore.from_arrays(
+            self.arrays, leaves_values[:, 0, :] if flag_keep_class_distributions and not flag_regression else None
+        )
+        if flag_regression:
+            self.set_leaf_values(leaf_values)
 
     def predict(self, input_data: np.ndarray) -> np.ndarray:
-        result_data = np.empty(len(input_data))
-
-        for i in range(len(input_data)):
-            result_data[i] = self._predict_one_sample(input_data[i])
-
-        return result_data
+        # whole batch is processed at once, results are the same as for _predict_one_sample
+        # (the values of the leaves for the regression trees)
+        return self._classes_values(self.arrays.predict(input_data))
+
+    def _classes_values(self, classes: np.ndarray) -> np.ndarray:
+        if self.flag_regression:
+            return self.leaf_values[classes]
+        return classes
+
+    def predict_fixed_point(self, input_data: np.ndarray) -> np.ndarray:
+        # values calculated by the generated vhdl of the regression tree
+        if not self.flag_regression:
+            raise ValueError("Only the regression trees have the fixed point outputs!")
+        return self.predict_output_codes(input_data) / 2.0 ** self.number_of_fraction_bits
+
+    def predict_output_codes(self, input_data: np.ndarray) -> np.ndarray:
+        return self._output_codes(self.arrays.predict(input_data)[:, None])
+
+    def _output_codes(self, trees_classes: np.ndarray) -> np.ndarray:
+        # output of the vhdl for the class chosen by the tree (one column)
+        if self.flag_regression:
+            return self.leaf_values_codes[trees_classes[:, 0]]
+        return trees_classes[:, 0]
+
+    def apply(self, input_data: np.ndarray) -> np.ndarray:
+        # returns ID of the leaf reached by each of the samples
+        return self.arrays.apply(input_data)
+
+    def apply_hardware(self, input_data: np.ndarray) -> np.ndarray:
+        # batched version of _predict_one_sample - all the splits are compared for every sample
+        # and the leaves are chosen by matching their paths, exactly as it is done in the vhdl implementation
+        # returns the ID of the chosen leaf (the term of decision_store) for each sample, -1 if none was matched
+        if self._leaf_path_masks is None:
+            self._leaf_path_masks = comparator_model.LeafPathMasks(self.decision_store)
+
+        input_data = np.asarray(input_data)
+        if self.threshold_encoding != ThresholdEncoding.COMPARATORS:
+            # split results are taken from the indices of the intervals of the features
+            return comparator_model.resolve_leaves(input_data, self.feature_intervals.compute_split_results,
+                                                   self._leaf_path_masks)
+
+        return comparator_model.predict_leaves(input_data, self.arrays.feature,
+                                               self.arrays.thresholds_for(input_data), self._leaf_path_masks)
+
+    def predict_hardware(self, input_data: np.ndarray) -> np.ndarray:
+        leaves_ids = self.apply_hardware(input_data)
+
+        # when no leaf was matched _predict_one_sample returns 0 (argmax of the initial [-1] value)
+        return self._classes_values(np.where(leaves_ids >= 0, self.decision_store.classes[leaves_ids], 0))
+
+    def compile_predictor(self, path: str):
+        # returns module with generated predict (batch) and predict_one_sample functions,
+        # the module is cached in the path and generated again only if the tree changes
+        if self.flag_regression:
+            raise ValueError("Compiled predictors of the regression trees are not supported!")
+        return predictor_compiler.compile_predictor(self.filename, [self.arrays], path, False)
 
     def _predict_one_sample(self, input_data):
         # this code works in a similar way to how vhdl implementation of the tree works
 
-        chosen_class_index = [-1]
+        chosen_class = 0
+        flag_integer_data = np.issubdtype(np.asarray(input_data).dtype, np.integer)
         # first calculate all the comparisions
         compare_results = [None] * len(self.splits)
         for i, split in enumerate(self.splits):
-            if input_data[split.var_idx] <= split.value_to_compare:
+            value_to_compare = split.value_code if flag_integer_data else split.value_to_compare
+            if input_data[split.var_idx] <= value_to_compare:
                 compare_results[i] = 0
             else:
                 compare_results[i] = 1
 
         # now go through all leaves and check if it following compare values are same as one calculated above
-        for leaf in self.leaves:
+        leaf_store = self.decision_store
+        path_indptr = leaf_store.path_indptr.tolist()
+        path_split_ids = leaf_store.path_split_ids.tolist()
+        path_directions = leaf_store.path_directions.tolist()
+        for leaf_id in range(leaf_store.number_of_leaves):
             number_of_correct_results = 0
 
-            for j in range(0, len(leaf.following_split_IDs)):
-                split_id = leaf.following_split_IDs[j]
-                expected_result = leaf.following_split_compare_values[j]
-                real_result = compare_results[split_id]
+            for j in range(path_indptr[leaf_id], path_indptr[leaf_id + 1]):
+                expected_result = path_directions[j]
+                real_result = compare_results[path_split_ids[j]]
 
                 if expected_result == real_result:
                     number_of_correct_results += 1
 
-            if number_of_correct_results == len(leaf.following_split_IDs):
-                chosen_class_index = leaf.class_idx
-
-        # find the most important class
-        chosen_class = np.argmax(chosen_class_index[0])
+            if number_of_correct_results == path_indptr[leaf_id + 1] - path_indptr[leaf_id]:
+                # class of the leaf (the most important class)
+                chosen_class = leaf_store.classes[leaf_id]
 
+        if self.flag_regression:
+            return float(self.leaf_values[chosen_class])
         return chosen_class
 
+    @property
+    def latency(self) -> int:
+        # number of clock cycles from the input to the output of the generated vhdl (compare + decideClass stages)
+        return 1 + self.number_of_pipeline_stages
+
+    @property
+    def initiation_interval(self) -> int:
+        # all the stages are registered, so a new sample can be provided in every clock cycle
+        return 1
+
+    def pipeline_stages_levels(self) -> np.ndarray:
+        # stage k of decideClass checks the path levels from levels[k] to levels[k + 1] - 1
+        number_of_stages = self.number_of_pipeline_stages
+        depth = int(self.decision_store.path_lengths.max())
+        return -(-np.arange(number_of_stages + 1) * depth // number_of_stages)
+
+    def estimate_resources(self) -> resource_estimator.ResourceEstimate:
+        # estimated FPGA resources and latency of the design generated by create_vhdl_file
+        return self._estimate_lane_resources().for_lanes(self.number_of_lanes)
+
+    def _estimate_lane_resources(self) -> resource_estimator.ResourceEstimate:
+        # resources of one lane
+        return resource_estimator.estimate_tree(self)
+
+    def _vhdl_parameters(self) -> tuple:
+        parameters = (self._number_of_bits_per_feature, self.number_of_pipeline_stages, self.number_of_classes,
+                      self.threshold_encoding.name, self.number_of_lanes)
+        if self.flag_regression:
+            parameters += (self.number_of_bits_per_leaf_value, tuple(self.leaf_values_codes.tolist()))
+        return parameters
+
+    def vhdl_hash(self) -> str:
+        # hash of everything that the generated vhdl (apart from the names) depends on
+        leaf_store = self.decision_store
+        arrays_to_hash = (self.used_features, self.arrays.feature, self.arrays.threshold_code,
+                          leaf_store.path_indptr, leaf_store.path_split_ids, leaf_store.path_directions,
+                          leaf_store.classes)
+
+        hash_ = hashlib.sha256()
+        hash_.update(str((_generator_source_hash(type(self)), self._vhdl_parameters(),
+                          [len(array) for array in arrays_to_hash])).encode())
+        for array in arrays_to_hash:
+            hash_.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+
+        return hash_.hexdigest()
+
     def print_parameters(self):
         # self.print_leaves()
         # self.print_splits()
         print("Depth: ", self.find_depth())
         print("Number of splits: ", len(self.splits))
-        print("Number of leaves: ", len(self.leaves))
+        print("Number of leaves: ", self.leaf_store.number_of_leaves)
 
     def print_splits(self):
         print("Splits: ")
@@ -150,217 +442,222 @@ class Tree(VHDLCreator):
             leaf.show()
 
     def find_depth(self):
-        following_splits_number = []
-
-        for leaf in self.leaves:
-            following_splits_number.append(len(leaf.following_split_IDs))
-
-        return max(following_splits_number)
+        return int(self.leaf_store.path_lengths.max())
 
     def _add_additional_headers(self):
-        text = ""
-        return text
+        return
 
     def _add_entity_generics_section(self):
-        text = ""
-        return text
+        return
 
     def _add_architecture_component_section(self):
-        text = ""
-        return text
+        return
+
+    def _add_architecture_constant_section(self):
+        if not self.flag_regression:
+            return
+
+        # values of the leaves indexed by the class, shared by all the lanes
+        leaf_values_codes = self.leaf_values_codes.tolist()
+        self._insert_text_line_with_indent(f"-- values of the leaves, value = code / 2^{self.number_of_fraction_bits}")
+        self._insert_text_line_with_indent(f"type leaf_values_t\tis array(0 to {len(leaf_values_codes)}-1) of "
+                                           f"signed({self.number_of_bits_per_leaf_value}-1 downto 0);")
+        self._insert_text_line_with_indent("constant LEAF_VALUES\t:\tleaf_values_t\t:= (")
+        with self._writer.indent():
+            for class_index, code in enumerate(leaf_values_codes):
+                separator = "," if class_index != len(leaf_values_codes) - 1 else ""
+                self._insert_text_line_with_indent(f"{class_index} => to_signed({code}, "
+                                                   f"{self.number_of_bits_per_leaf_value}){separator}")
+        self._insert_text_line_with_indent(");")
+        self._insert_text_line_with_indent("")
+
+    def _add_architecture_output(self):
+        # the value of the leaf is read from the constant table, so the latency does not change
+        if self.flag_regression:
+            self._insert_text_line_with_indent(self._output_name + " <= std_logic_vector("
+                                               "LEAF_VALUES(to_integer(classIndex)));")
+            return
+        self._insert_text_line_with_indent(self._output_name + " <= std_logic_vector(classIndex);")
 
     def _add_architecture_signal_section(self):
-        text = ""
-
-        text += self._insert_text_line_with_indent("type " + "features_t" + "\t" + "is array("
-                                                   + str(self._number_of_features) + "-1 downto 0)"
-                                                   + " of std_logic_vector(" + str(self._number_of_bits_per_feature)
-                                                   + "-1 downto 0);")
-
-        text += self._insert_text_line_with_indent("signal " + "features" + "\t\t:\t" + "features_t"
-                                                   + "\t\t\t" + ":= (others=>(others=>'0'));")
-
-        text += self._insert_text_line_with_indent("signal " + "splitResult" + "\t:\t" + "std_logic_vector("
-                                                   + str(len(self.splits)) + "-1 downto 0)"
-                                                   + "\t\t\t" + ":= (others=>'0');")
-        text += self._insert_text_line_with_indent("signal " + "classIndex" + "\t:\t" + "unsigned("
-                                                   + str(self._number_of_bits_for_class_index) + "-1 downto 0)"
-                                                   + "\t\t\t" + ":= (others=>'0');")
-
-        text += self._insert_text_line_with_indent("")
-
-        return text
+        self._add_features_signal()
+        self._add_split_result_signal(len(self.splits))
+        if self.threshold_encoding != ThresholdEncoding.COMPARATORS:
+            self._add_architecture_encoder_signals()
+
+        # partial results of the leaves paths and delayed split results, used in the pipelined decideClass
+        for stage in range(1, self.number_of_pipeline_stages):
+            self._insert_text_line_with_indent("signal " + "leafMatch_" + str(stage - 1) + "\t:\t"
+                                               + "std_logic_vector("
+                                               + str(self.decision_store.number_of_leaves) + "-1 downto 0)"
+                                               + "\t\t\t" + ":= (others=>'0');")
+            self._insert_text_line_with_indent("signal " + "splitResultDelayed_" + str(stage) + "\t:\t"
+                                               + "std_logic_vector(" + str(len(self.splits))
+                                               + "-1 downto 0)" + "\t\t\t" + ":= (others=>'0');")
+
+        self._insert_text_line_with_indent("signal " + "classIndex" + "\t:\t" + "unsigned("
+                                           + str(self._number_of_bits_for_class_index) + "-1 downto 0)"
+                                           + "\t\t\t" + ":= (others=>'0');")
+
+        self._insert_text_line_with_indent("")
 
     def _add_architecture_process_section(self):
-        text = ""
-
-        text += self._add_architecture_input_mapping()
-        text += self._add_architecture_process_compare()
-        text += self._add_architecture_process_decide_class()
-        text += self._insert_text_line_with_indent("output <= std_logic_vector(classIndex);")
-        text += self._insert_text_line_with_indent("")
-
-        return text
-
-    def _add_architecture_input_mapping(self):
-        text = ""
-
-        for i in range(0, self._number_of_features):
-            text += self._insert_text_line_with_indent("features(" + str(i) + ") <= input("
-                                                       + str(self._number_of_bits_per_feature*(i+1)-1) + " downto "
-                                                       + str(self._number_of_bits_per_feature*i) + ");")
-
-        return text
+        self._add_architecture_input_mapping()
+        self._add_architecture_process_compare()
+        self._add_architecture_process_decide_class()
+        self._add_architecture_output()
+        self._insert_text_line_with_indent("")
 
     def _add_architecture_process_compare(self):
-        # create the code for all the compares done in the splits
-        text = ""
-
-        text += self._insert_text_line_with_indent("compare : process(clk)")
-        text += self._insert_text_line_with_indent("begin")
-        self.current_indent += 1
-        text += self._insert_text_line_with_indent("if clk='1' and clk'event then")
-        self.current_indent += 1
-        text += self._insert_text_line_with_indent("if rst='1' then")
-        text += self._insert_text_line_with_indent("elsif en='1' then")
-        self.current_indent += 1
-
-        # insert all splits
-        for (split, i) in zip(self.splits, range(0, len(self.splits))):
-            text += self._insert_text_line_with_indent(
-                "if unsigned(features(" +
-                str(split.var_idx) + ")) <= to_unsigned(" +
-                str(int(split.value_to_compare)) +
-                ", features'length) then")
-
-            self.current_indent += 1
-            text += self._insert_text_line_with_indent("splitResult(" + str(i) + ") <= '1';")
-            self.current_indent -= 1
-            text += self._insert_text_line_with_indent("else")
-            self.current_indent += 1
-            text += self._insert_text_line_with_indent("splitResult(" + str(i) + ") <= '0';")
-            self.current_indent -= 1
-            text += self._insert_text_line_with_indent("end if;")
-
-        self.current_indent -= 1
-        text += self._insert_text_line_with_indent("end if;")
-        self.current_indent -= 1
-        text += self._insert_text_line_with_indent("end if;")
-        self.current_indent -= 1
-        text += self._insert_text_line_with_indent("end process compare;")
-        text += self._insert_text_line_with_indent("")
-
-        return text
-
-    def _add_architecture_process_decide_class(self):
-        text = ""
-
-        # create the code for all the leaves
-        text += self._insert_text_line_with_indent("decideClass : process(clk)")
-        text += self._insert_text_line_with_indent("begin")
-        self.current_indent += 1
-        text += self._insert_text_line_with_indent("if clk='1' and clk'event then")
-        self.current_indent += 1
-        text += self._insert_text_line_with_indent("if rst='1' then")
-        text += self._insert_text_line_with_indent("")
-        text += self._insert_text_line_with_indent("elsif en='1' then")
-        self.current_indent += 1
-
-        for leaf in self.leaves:
-
-            text += self._insert_text_line_with_indent("if ( ")
-            self.current_indent += 1
-
-            for split_id, split_compare_value in zip(leaf.following_split_IDs, leaf.following_split_compare_values):
+        if self.threshold_encoding != ThresholdEncoding.COMPARATORS:
+            self._add_architecture_process_encode()
+            self._add_architecture_split_results_from_encoders()
+            return
+
+        self._add_process_compare([split.var_idx for split in self.splits],
+                                  [split.value_code for split in self.splits])
+
+    # range encoders of the features (see threshold_encoder) - the encode process registers the thermometer code
+    # (or the index of the interval) of each feature, then the splitResult bits are assigned from them
+
+    def _encoder_signal(self, slot: int) -> str:
+        if self.threshold_encoding == ThresholdEncoding.THERMOMETER:
+            return "thermometer_" + str(slot)
+        return "intervalIndex_" + str(slot)
+
+    def _add_architecture_encoder_signals(self):
+        feature_intervals = self.feature_intervals
+        numbers_of_thresholds = feature_intervals.number_of_thresholds
+        numbers_of_bits_for_index = feature_intervals.number_of_bits_for_index
+
+        for slot, feature in enumerate(feature_intervals.features):
+            if self.threshold_encoding == ThresholdEncoding.THERMOMETER:
+                signal_type = "std_logic_vector(" + str(numbers_of_thresholds[slot]) + "-1 downto 0)"
+            else:
+                signal_type = "unsigned(" + str(numbers_of_bits_for_index[slot]) + "-1 downto 0)"
+
+            self._insert_text_line_with_indent("signal " + self._encoder_signal(slot) + "\t:\t" + signal_type
+                                               + "\t\t\t" + ":= (others=>'0');" + "\t-- feature " + str(feature))
+
+    def _add_architecture_process_encode(self):
+        feature_intervals = self.feature_intervals
+        feature_positions = self._feature_positions()
+
+        with self._clocked_process("encode"):
+            for slot, feature in enumerate(feature_intervals.features):
+                position = str(feature_positions[feature])
+                encoder_signal = self._encoder_signal(slot)
+                threshold_codes = feature_intervals.threshold_codes[
+                    feature_intervals.indptr[slot]:feature_intervals.indptr[slot + 1]].tolist()
+
+                for j, threshold_code in enumerate(threshold_codes):
+                    condition = ("unsigned(features(" + position + ")) <= to_unsigned(" + str(threshold_code)
+                                 + ", features(" + position + ")'length)")
+
+                    if self.threshold_encoding == ThresholdEncoding.THERMOMETER:
+                        # bit j is set when the value is greater than the j-th threshold
+                        self._insert_text_line_with_indent("if " + condition + " then")
+                        with self._writer.indent():
+                            self._insert_text_line_with_indent(encoder_signal + "(" + str(j) + ") <= '0';")
+                        self._insert_text_line_with_indent("else")
+                        with self._writer.indent():
+                            self._insert_text_line_with_indent(encoder_signal + "(" + str(j) + ") <= '1';")
+                        self._insert_text_line_with_indent("end if;")
+                        continue
+
+                    # index of the interval - number of the thresholds lower than the value
+                    self._insert_text_line_with_indent(("if " if j == 0 else "elsif ") + condition + " then")
+                    with self._writer.indent():
+                        self._insert_text_line_with_indent(encoder_signal + " <= to_unsigned(" + str(j) + ", "
+                                                           + encoder_signal + "'length);")
+
+                if self.threshold_encoding == ThresholdEncoding.INTERVAL_INDEX:
+                    self._insert_text_line_with_indent("else")
+                    with self._writer.indent():
+                        self._insert_text_line_with_indent(encoder_signal + " <= to_unsigned("
+                                                           + str(len(threshold_codes)) + ", "
+                                                           + encoder_signal + "'length);")
+                    self._insert_text_line_with_indent("end if;")
+        self._insert_text_line_with_indent("")
+
+    def _add_architecture_split_results_from_encoders(self):
+        # same values as in the compare process: '0' when the value is not greater than the threshold,
+        # the splits with the thresholds outside of the range of the features are constant
+        feature_intervals = self.feature_intervals
+
+        for i, (slot, rank) in enumerate(zip(feature_intervals.split_slot.tolist(),
+                                             feature_intervals.split_rank.tolist())):
+            if slot < 0:
+                value = "'0'" if self.splits[i].value_code >= 0 else "'1'"
+            elif self.threshold_encoding == ThresholdEncoding.THERMOMETER:
+                value = self._encoder_signal(slot) + "(" + str(rank) + ")"
+            else:
+                value = "'1' when " + self._encoder_signal(slot) + " > " + str(rank) + " else '0'"
 
-                text += self._insert_text_line_with_indent(
-                    "splitResult(" + str(split_id) + ") = '" + str(split_compare_value) + "'")
+            self._insert_text_line_with_indent("splitResult(" + str(i) + ") <= " + value + ";")
+        self._insert_text_line_with_indent("")
 
-                if split_id != leaf.following_split_IDs[-1]:
-                    text += self._insert_text_line_with_indent("and")
+    def _add_architecture_process_decide_class(self):
+        if self.number_of_pipeline_stages == 1:
+            self._add_process_decide_class(self.decision_store, np.arange(len(self.splits)), "classIndex",
+                                           "decideClass")
+            return
+
+        self._insert_text_line_with_indent(f"-- pipelined decideClass: {self.number_of_pipeline_stages} stages"
+                                           f", latency: {self.latency} clock cycles"
+                                           f", initiation interval: {self.initiation_interval} clock cycle")
+
+        levels = self.pipeline_stages_levels()
+        for stage in range(self.number_of_pipeline_stages):
+            self._add_architecture_pipeline_stage(stage, levels[stage], levels[stage + 1])
+            self._insert_text_line_with_indent("")
+
+    def _add_architecture_pipeline_stage(self, stage: int, first_level: int, last_level: int):
+        # stage checks the split results of the path levels from first_level to last_level - 1
+        # and combines them with the partial result of the leaf from the previous stage
+        # the last stage sets the class index, as decideClass in the not pipelined version
+        flag_last_stage = stage == self.number_of_pipeline_stages - 1
+        split_result_name = "splitResult" if stage == 0 else "splitResultDelayed_" + str(stage)
+
+        with self._clocked_process("decideClass_" + str(stage), flag_empty_reset_branch=True):
+            if not flag_last_stage:
+                self._insert_text_line_with_indent(
+                    "splitResultDelayed_" + str(stage + 1) + " <= " + split_result_name + ";")
+
+            leaf_store = self.decision_store
+            for leaf_id in range(leaf_store.number_of_leaves):
+                split_ids, directions = leaf_store.path(leaf_id)
+
+                conditions = []
+                if stage > 0:
+                    conditions.append("leafMatch_" + str(stage - 1) + "(" + str(leaf_id) + ") = '1'")
+                for split_id, split_compare_value in zip(split_ids[first_level:last_level],
+                                                         directions[first_level:last_level]):
+                    conditions.append(split_result_name + "(" + str(split_id) + ") = '"
+                                      + str(split_compare_value) + "'")
+
+                if flag_last_stage:
+                    result = "classIndex <= to_unsigned(" + str(leaf_store.classes[leaf_id]) + ", classIndex'length);"
                 else:
-                    text += self._insert_text_line_with_indent(" ) then")
-                    self.current_indent += 1
-
-                    result = leaf.class_idx
-
-                    # find the most important class
-                    result_as_class = np.argmax(result[0])
-
-                    text += self._insert_text_line_with_indent(
-                        "classIndex <= to_unsigned(" + str(result_as_class) + ", classIndex'length);"
-                    )
-                    self.current_indent -= 1
-                    text += self._insert_text_line_with_indent("end if;")
-            self.current_indent -= 1
-
-        self.current_indent -= 1
-        text += self._insert_text_line_with_indent("end if;")
-        self.current_indent -= 1
-        text += self._insert_text_line_with_indent("end if;")
-        self.current_indent -= 1
-        text += self._insert_text_line_with_indent("end process decideClass;")
-
-        return text
-
-    def _add_new_leaf(self, id, class_idx, following_splits_IDs, following_splits_compare_values):
-        new_leaf = Leaf(id, class_idx, following_splits_IDs, following_splits_compare_values)
-        self.leaves.append(new_leaf)
-        self._current_leaf_index += 1
-
-    def _add_new_split(self, id, var_idx, value_to_compare):
-        new_split = Split(id, var_idx, value_to_compare)
-        self.splits.append(new_split)
-        self._current_split_index += 1
-
-    def _preorder(self, tree_, features, following_splits_IDs, following_splits_compare_values, node):
-
-        # if the node is not the end of the path (it is not a leaf)
-        if tree_.feature[node] != sklearn.tree._tree.TREE_UNDEFINED:
-            following_splits_IDs.append(self._current_split_index)
-
-            # use this to print the features before and after the conversion to fixed point
-            # print("Feature: " + str(tree_.threshold[node]) + ", after conversion: "
-            # + str(convert_to_fixed_point(tree_.threshold[node], self._number_of_bits_per_feature)))
-
-            # then create a split
-            self._add_new_split(
-                self._current_split_index,
-                features[node],
-                convert_to_fixed_point(tree_.threshold[node], self._number_of_bits_per_feature)
-            )
-
-            # run the code for the left side of the tree (comparision wan not true,
-            # hence 0 into list of following splits
-            following_splits_compare_values.append(0)
-
-            self._preorder(
-                tree_,
-                features,
-                list(following_splits_IDs),
-                list(following_splits_compare_values),
-                tree_.children_left[node]
-            )
-
-            # now do something similar to the right side.
-            # first remove appended 0 value (False)
-            following_splits_compare_values.pop()
-            # and add 1 (the comparision result is True)
-            following_splits_compare_values.append(1)
-
-            self._preorder(
-                tree_,
-                features,
-                list(following_splits_IDs),
-                list(following_splits_compare_values),
-                tree_.children_right[node]
-            )
-
-        else:
-            # otherwise the node is a leaf
-            self._add_new_leaf(
-                self._current_leaf_index,
-                tree_.value[node],
-                following_splits_IDs,
-                following_splits_compare_values
-            )
+                    result = "leafMatch_" + str(stage) + "(" + str(leaf_id) + ") <= '1';"
+
+                if len(conditions) == 0:
+                    # leaf without any conditions (only possible in the first stage)
+                    self._insert_text_line_with_indent(result)
+                    continue
+
+                self._insert_text_line_with_indent("if ( ")
+                with self._writer.indent():
+                    for j, condition in enumerate(conditions):
+                        self._insert_text_line_with_indent(condition)
+                        if j != len(conditions) - 1:
+                            self._insert_text_line_with_indent("and")
+                    self._insert_text_line_with_indent(" ) then")
+                    with self._writer.indent():
+                        self._insert_text_line_with_indent(result)
+                    if not flag_last_stage:
+                        self._insert_text_line_with_indent("else")
+                        with self._writer.indent():
+                            self._insert_text_line_with_indent("leafMatch_" + str(stage) + "(" + str(leaf_id)
+                                                               + ") <= '0';")
+                    self._insert_text_line_with_indent("end if;")
@@ -0,0 +1,60 @@
+import numpy as np
+
+# value used for the children of the leaves (same convention as in scikit-learn)
+TREE_LEAF = -1
+
+
+class TreeArrays:
+    # struct-of-arrays form of the built Tree
+    # nodes 0..S-1 are the splits (node index is equal to the split ID),
+    # nodes S..S+L-1 are the leaves (node index minus S is equal to the leaf ID)
+    # feature, threshold and children arrays are indexed by split ID, leaf_class is indexed by leaf ID
+    # threshold_code holds the thresholds as integers (threshold * 2^number_of_bits), used for integer input data
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, threshold_code: np.ndarray,
+                 children_left: np.ndarray, children_right: np.ndarray,
+                 leaf_class: np.ndarray, root: int, number_of_classes: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.threshold_code = threshold_code
+        self.children_left = children_left
+        self.children_right = children_right
+        self.leaf_class = leaf_class
+        self.root = root
+        self.number_of_classes = number_of_classes
+
+    @property
+    def number_of_splits(self) -> int:
+        return len(self.feature)
+
+    @property
+    def number_of_leaves(self) -> int:
+        return len(self.leaf_class)
+
+    def thresholds_for(self, input_data: np.ndarray) -> np.ndarray:
+        if np.issubdtype(input_data.dtype, np.integer):
+            return self.threshold_code
+        return self.threshold
+
+    def apply(self, input_data: np.ndarray) -> np.ndarray:
+        # moves the whole batch through the tree one level at a time and returns the ID of the leaf for each sample
+        input_data = np.asarray(input_data)
+        number_of_splits = self.number_of_splits
+
+        thresholds = self.thresholds_for(input_data)
+
+        nodes = np.full(len(input_data), self.root, dtype=np.intp)
+        # only the samples that did not reach a leaf yet are processed in each iteration
+        rows = np.flatnonzero(nodes < number_of_splits)
+        while len(rows) > 0:
+            current_nodes = nodes[rows]
+            # same comparision as in _predict_one_sample: left (0) if value <= threshold, right (1) otherwise
+            # (written this way, and not with >, to make sure that NaN values go to the same side)
+            go_left = input_data[rows, self.feature[current_nodes]] <= thresholds[current_nodes]
+            nodes[rows] = np.where(go_left, self.children_left[current_nodes], self.children_right[current_nodes])
+            rows = rows[nodes[rows] < number_of_splits]
+
+        return nodes - number_of_splits
+
+    def predict(self, input_data: np.ndarray) -> np.ndarray:
+        return self.leaf_class[self.apply(input_data)]
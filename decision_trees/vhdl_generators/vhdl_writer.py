@@ -0,0 +1,42 @@
+import contextlib
+import os
+
+# size of the buffer of the generated files, lines are written to the file as soon as the buffer is full,
+# so the memory used by the generator does not depend on the size of the file
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+class VHDLWriter:
+    # writes lines of the generated vhdl, the indentation is changed with the indent context manager:
+    # with writer.indent():
+    #     writer.line("...")
+
+    def __init__(self, file_to_write):
+        self._file = file_to_write
+        self._indent_text = ""
+
+    def line(self, text_to_insert: str = ""):
+        self._file.write(self._indent_text + text_to_insert + "\n")
+
+    @contextlib.contextmanager
+    def indent(self, number_of_levels: int = 1):
+        previous_indent_text = self._indent_text
+        self._indent_text += "\t" * number_of_levels
+        try:
+            yield self
+        finally:
+            self._indent_text = previous_indent_text
+
+
+@contextlib.contextmanager
+def open_vhdl_file(file_path: str, buffer_size: int = DEFAULT_BUFFER_SIZE):
+    # the file is written under a temporary name and renamed when it is complete, so an interrupted generation
+    # (or a few processes writing the same file) never leaves an incomplete file
+    temporary_file_path = file_path + "." + str(os.getpid()) + ".tmp"
+    try:
+        with open(temporary_file_path, "w", buffering=buffer_size) as file_to_write:
+            yield VHDLWriter(file_to_write)
+        os.replace(temporary_file_path, file_path)
+    finally:
+        if os.path.exists(temporary_file_path):
+            os.remove(temporary_file_path)
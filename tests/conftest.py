@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from sklearn import datasets
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+from decision_trees.utils.convert_to_fixed_point import quantize_data
+from decision_trees.vhdl_generators.random_forest import RandomForest
+from decision_trees.vhdl_generators.tree import Tree
+
+# the tests compare the converted classifiers with the scikit ones on the digits dataset, quantized to each of
+# these numbers of bits - the scikit classifiers are trained on the quantized data, so their thresholds are halfway
+# between two codes and the converted classifiers have to give exactly the same results
+NUMBERS_OF_BITS = [2, 4, 8]
+
+
+class QuantizedDigits:
+
+    def __init__(self, number_of_bits: int):
+        digits = datasets.load_digits()
+        # the values of the features are 0..16, the hardware inputs are the codes 0..2^n-1, so 1.0 is saturated
+        data = digits.data / 16
+        number_of_train_samples = len(data) * 2 // 3
+
+        self.number_of_bits = number_of_bits
+        self.number_of_features = data.shape[1]
+        self.train_data, self.test_data = quantize_data(data[:number_of_train_samples],
+                                                        data[number_of_train_samples:],
+                                                        number_of_bits, flag_saturate=True)
+        self.train_target = digits.target[:number_of_train_samples]
+        self.test_target = digits.target[number_of_train_samples:]
+
+    @property
+    def test_codes(self) -> np.ndarray:
+        return (self.test_data * (1 << self.number_of_bits)).astype(np.int64)
+
+
+@pytest.fixture(scope="session", params=NUMBERS_OF_BITS, ids=lambda number_of_bits: f"{number_of_bits}bits")
+def digits(request) -> QuantizedDigits:
+    return QuantizedDigits(request.param)
+
+
+@pytest.fixture(scope="session")
+def decision_tree(digits) -> DecisionTreeClassifier:
+    return DecisionTreeClassifier(max_depth=8, random_state=42).fit(digits.train_data, digits.train_target)
+
+
+@pytest.fixture(scope="session")
+def random_forest(digits) -> RandomForestClassifier:
+    return RandomForestClassifier(n_estimators=7, max_depth=6, random_state=42).fit(digits.train_data,
+                                                                                      digits.train_target)
+
+
+# the regressors predict the digit (as a float value), so their leaves hold the means of the digits
+@pytest.fixture(scope="session")
+def regression_tree(digits) -> DecisionTreeRegressor:
+    return DecisionTreeRegressor(max_depth=8, random_state=42).fit(digits.train_data, digits.train_target / 1.0)
+
+
+@pytest.fixture(scope="session")
+def regression_forest(digits) -> RandomForestRegressor:
+    return RandomForestRegressor(n_estimators=7, max_depth=6, random_state=42).fit(digits.train_data,
+                                                                                     digits.train_target / 1.0)
+
+
+def build_tree(decision_tree: DecisionTreeClassifier, digits: QuantizedDigits, **kwargs) -> Tree:
+    tree = Tree("tree", digits.number_of_features, digits.number_of_bits, **kwargs)
+    tree.build(decision_tree)
+    return tree
+
+
+def build_forest(random_forest: RandomForestClassifier, digits: QuantizedDigits, **kwargs) -> RandomForest:
+    forest = RandomForest("forest", digits.number_of_features, digits.number_of_bits, **kwargs)
+    forest.build(random_forest)
+    return forest
+
+
+def scikit_votes(random_forest: RandomForestClassifier, input_data: np.ndarray) -> np.ndarray:
+    # the converted forest chooses the class with the most votes of the trees (the lowest one if there is a tie),
+    # scikit averages the probabilities, so the votes are counted from the predictions of its trees
+    trees_classes = np.stack([tree.predict(input_data).astype(np.intp) for tree in random_forest.estimators_],
+                             axis=1)
+    votes = np.zeros((len(input_data), len(random_forest.classes_)), dtype=np.intp)
+    np.add.at(votes, (np.arange(len(input_data))[:, None], trees_classes), 1)
+    return votes
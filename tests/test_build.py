@@ -0,0 +1,27 @@
+import numpy as np
+
+from decision_trees.vhdl_generators.random_forest import RandomForest
+
+from conftest import build_tree, build_forest
+
+
+def test_thresholds_of_scikit(digits, decision_tree):
+    # the quantized data is split in the same way as by scikit (its thresholds are between two codes)
+    tree = build_tree(decision_tree, digits)
+    tree_ = decision_tree.tree_
+    scikit_splits = np.flatnonzero(tree_.children_left != -1)
+
+    assert np.array_equal(np.sort(tree.arrays.feature), np.sort(tree_.feature[scikit_splits]))
+    assert np.array_equal(np.sort(tree.arrays.threshold_code),
+                          np.sort(np.floor(tree_.threshold[scikit_splits] * (1 << digits.number_of_bits))))
+    assert np.array_equal(tree.arrays.threshold * (1 << digits.number_of_bits), tree.arrays.threshold_code)
+
+
+def test_parallel_build_as_serial(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    parallel_forest = RandomForest("forest", digits.number_of_features, digits.number_of_bits)
+    parallel_forest.build(random_forest, n_jobs=2)
+
+    for tree, parallel_tree in zip(forest.random_forest, parallel_forest.random_forest):
+        assert tree.vhdl_hash() == parallel_tree.vhdl_hash()
+    assert np.array_equal(parallel_forest.predict_trees(digits.test_data), forest.predict_trees(digits.test_data))
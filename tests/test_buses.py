@@ -0,0 +1,59 @@
+import re
+
+import numpy as np
+import pytest
+
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+
+from conftest import build_tree, build_forest
+
+
+def _ports_widths(path) -> dict:
+    # widths of the std_logic_vector ports of the entity
+    text = path.read_text()
+    return {name: int(width) for name, width in re.findall(r"(\w+)\s*:\s*(?:in|out) std_logic_vector\((\d+)-1", text)}
+
+
+def test_tree_buses_of_scikit_features(digits, decision_tree, tmp_path):
+    tree = build_tree(decision_tree, digits)
+    tree_ = decision_tree.tree_
+    splits = np.flatnonzero(tree_.children_left != -1)
+    codes = np.floor(tree_.threshold[splits] * (1 << digits.number_of_bits))
+    features = np.unique(tree_.feature[splits][(codes >= 0) & (codes < (1 << digits.number_of_bits) - 1)])
+
+    tree.create_vhdl_file(str(tmp_path))
+
+    assert np.array_equal(tree.used_features, features)
+    # 10 classes of the digits need 4 bits
+    assert _ports_widths(tmp_path / "tree.vhd") == {"input": len(features) * digits.number_of_bits, "output": 4}
+
+
+def test_forest_bus_is_the_union_of_the_trees(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    shared_forest = build_forest(random_forest, digits, flag_shared_comparators=True)
+    trees_features = np.unique(np.concatenate([tree.used_features for tree in forest.random_forest]))
+
+    assert np.array_equal(forest.used_features, trees_features)
+    assert np.array_equal(shared_forest.used_features, trees_features)
+
+
+def test_input_features_order_of_the_bus(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+    unused_features = np.setdiff1d(np.arange(digits.number_of_features), tree.used_features)
+    input_features = list(unused_features[:2]) + list(tree.used_features[::-1])
+    tree.input_features = input_features
+
+    selected_codes = tree.select_input_features(digits.test_codes)
+    result = simulate(tree, digits.test_data, expected=decision_tree.predict(digits.test_data))
+
+    assert np.array_equal(selected_codes, digits.test_codes[:, input_features])
+    assert result.number_of_mismatches == 0
+
+
+def test_input_features_without_features_of_the_comparators(digits, decision_tree, tmp_path):
+    tree = build_tree(decision_tree, digits)
+    used_features = tree.used_features
+    tree.input_features = list(used_features[1:])
+
+    with pytest.raises(ValueError, match=str(used_features[0])):
+        tree.create_vhdl_file(str(tmp_path))
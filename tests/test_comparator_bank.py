@@ -0,0 +1,36 @@
+import numpy as np
+
+from decision_trees.vhdl_generators.comparator_bank import ComparatorBank
+
+from conftest import build_forest, scikit_votes
+
+
+def test_unique_comparisions_of_scikit(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    comparisions = set()
+    for decision_tree in random_forest.estimators_:
+        tree_ = decision_tree.tree_
+        splits = np.flatnonzero(tree_.children_left != -1)
+        codes = np.floor(tree_.threshold[splits] * (1 << digits.number_of_bits)).astype(np.int64)
+        comparisions.update(zip(tree_.feature[splits].tolist(), codes.tolist()))
+
+    comparator_bank = ComparatorBank(forest.random_forest)
+
+    assert comparator_bank.number_of_comparators == len(comparisions)
+    assert set(zip(comparator_bank.feature.tolist(), comparator_bank.threshold_code.tolist())) == comparisions
+    assert comparator_bank.sharing_ratio >= 1
+
+
+def test_predict_trees_as_scikit(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    comparator_bank = ComparatorBank(forest.random_forest)
+    expected = np.stack([tree.predict(digits.test_data) for tree in random_forest.estimators_], axis=1)
+
+    assert np.array_equal(comparator_bank.predict_trees(digits.test_data), expected)
+    assert np.array_equal(comparator_bank.predict_trees(digits.test_codes), expected)
+
+
+def test_forest_with_shared_comparators_as_scikit_votes(digits, random_forest):
+    forest = build_forest(random_forest, digits, flag_shared_comparators=True)
+
+    assert np.array_equal(forest.predict_votes(digits.test_codes), scikit_votes(random_forest, digits.test_data))
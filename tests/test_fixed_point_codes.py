@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from decision_trees.utils.convert_to_fixed_point import quantize_data, quantize_data_to_codes
+
+from conftest import build_tree, build_forest, scikit_votes
+
+
+def test_tree_predict_on_codes_as_scikit(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+    expected = decision_tree.predict(digits.test_data)
+
+    assert np.array_equal(tree.predict(digits.test_codes), expected)
+    assert np.array_equal(tree.predict_hardware(digits.test_codes), expected)
+
+
+def test_forest_predict_on_codes_as_scikit_votes(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    expected = np.argmax(scikit_votes(random_forest, digits.test_data), axis=1)
+
+    assert np.array_equal(forest.predict(digits.test_data), expected)
+    assert np.array_equal(forest.predict(digits.test_codes), expected)
+
+
+def test_codes_of_the_quantized_data(digits):
+    codes = quantize_data_to_codes(digits.test_data, digits.number_of_bits)
+
+    assert np.array_equal(codes, digits.test_codes)
+
+
+def test_out_of_range_data_is_rejected_or_saturated(digits):
+    data = np.array([[-0.25, 0.5, 1.0]])
+    max_code = (1 << digits.number_of_bits) - 1
+
+    with pytest.raises(ValueError):
+        quantize_data_to_codes(data, digits.number_of_bits)
+    with pytest.raises(ValueError):
+        quantize_data(data, data, digits.number_of_bits)
+
+    codes = quantize_data_to_codes(data, digits.number_of_bits, flag_saturate=True)
+    _, quantized = quantize_data(data, data, digits.number_of_bits, flag_saturate=True)
+
+    assert codes.tolist() == [[0, 1 << (digits.number_of_bits - 1), max_code]]
+    assert np.array_equal(quantized * (1 << digits.number_of_bits), codes)
@@ -0,0 +1,18 @@
+import numpy as np
+
+from conftest import build_forest, scikit_votes
+
+
+def test_votes_as_scikit(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+
+    assert np.array_equal(forest.predict_votes(digits.test_data), scikit_votes(random_forest, digits.test_data))
+
+
+def test_predict_as_one_sample_model(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    test_data = digits.test_data[:50]
+
+    expected = [forest._predict_one_sample(sample) for sample in test_data]
+
+    assert np.array_equal(forest.predict(test_data), expected)
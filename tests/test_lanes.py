@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+from decision_trees.vhdl_generators.rom_tree import RomTree
+
+from conftest import build_tree, build_forest, scikit_votes
+
+
+@pytest.mark.parametrize("number_of_lanes", [2, 3])
+def test_tree_lanes_as_scikit(digits, decision_tree, number_of_lanes):
+    tree = build_tree(decision_tree, digits, number_of_pipeline_stages=2)
+    single_lane_result = simulate(tree, digits.test_data)
+    tree.number_of_lanes = number_of_lanes
+    # the last line of the lanes is not full
+    test_data = digits.test_data[:number_of_lanes * 50 + 1]
+
+    result = simulate(tree, test_data, expected=decision_tree.predict(test_data))
+
+    assert result.number_of_mismatches == 0
+    assert result.flag_timing_as_declared and result.latency == single_lane_result.latency
+    # 51 lines of the samples, the last one reaches the output latency-1 cycles after it is sent
+    assert result.number_of_cycles == 51 + tree.latency - 1
+    assert result.samples_per_cycle > single_lane_result.samples_per_cycle
+
+
+@pytest.mark.parametrize("flag_shared_comparators", [False, True])
+def test_forest_lanes_as_scikit(digits, random_forest, flag_shared_comparators):
+    forest = build_forest(random_forest, digits, flag_shared_comparators=flag_shared_comparators)
+    forest.number_of_lanes = 2
+
+    result = simulate(forest, digits.test_data, expected=np.argmax(scikit_votes(random_forest, digits.test_data),
+                                                                   axis=1))
+
+    assert result.number_of_mismatches == 0 and result.flag_timing_as_declared
+
+
+def test_rom_tree_lanes_as_scikit(digits, decision_tree):
+    tree = RomTree.from_tree(build_tree(decision_tree, digits), 2)
+    tree.number_of_lanes = 2
+    test_data = digits.test_data[:101]
+
+    result = simulate(tree, test_data, expected=decision_tree.predict(test_data))
+
+    assert result.number_of_mismatches == 0 and result.flag_timing_as_declared
+
+
+def test_lanes_ports_and_resources(digits, decision_tree, tmp_path):
+    tree = build_tree(decision_tree, digits)
+    estimate = tree.estimate_resources()
+    tree.number_of_lanes = 3
+
+    tree.create_vhdl_file(str(tmp_path))
+    tree.create_stimulus_files(digits.test_data[:7], str(tmp_path))
+
+    lanes_estimate = tree.estimate_resources()
+    input_width = len(tree.used_features) * digits.number_of_bits
+    text = (tmp_path / "tree.vhd").read_text()
+    assert f"in std_logic_vector({3 * input_width}-1 downto 0)" in text
+    assert f"out std_logic_vector({3 * 4}-1 downto 0)" in text
+    # 7 samples in 3 lines, the last sample is repeated in the last line
+    stimulus_lines = (tmp_path / "tree_stimulus.txt").read_text().split()
+    assert [len(line) for line in stimulus_lines] == [3 * input_width] * 3
+    assert stimulus_lines[2][:input_width] == stimulus_lines[2][input_width:2 * input_width]
+    assert (lanes_estimate.luts, lanes_estimate.register_bits) == (3 * estimate.luts, 3 * estimate.register_bits)
+    with pytest.raises(ValueError):
+        tree.number_of_lanes = 0
@@ -0,0 +1,40 @@
+import numpy as np
+
+from decision_trees.vhdl_generators import leaf_minimizer
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+
+from conftest import build_tree, build_forest, scikit_votes
+
+
+def test_minimized_tree_as_scikit(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+    number_of_leaves = tree.leaf_store.number_of_leaves
+
+    tree.minimize()
+
+    expected = decision_tree.predict(digits.test_data)
+    assert np.array_equal(tree.predict(digits.test_data), expected)
+    assert np.array_equal(tree.predict_hardware(digits.test_codes), expected)
+    assert simulate(tree, digits.test_data, expected=expected).number_of_mismatches == 0
+    assert tree.leaf_store.number_of_leaves <= number_of_leaves
+    assert tree.decision_store.number_of_leaves <= tree.leaf_store.number_of_leaves
+
+
+def test_minimized_forest_as_scikit(digits, random_forest):
+    forest = build_forest(random_forest, digits, flag_shared_comparators=True)
+
+    forest.minimize()
+
+    votes = scikit_votes(random_forest, digits.test_data)
+    assert np.array_equal(forest.predict_votes(digits.test_codes), votes)
+    assert simulate(forest, digits.test_data, expected=np.argmax(votes, axis=1)).number_of_mismatches == 0
+
+
+def test_too_large_trees_are_not_minimized(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+    arrays = leaf_minimizer.simplify_tree_arrays(tree.arrays)
+    tree.set_arrays(arrays)
+    size = tree.leaf_store.number_of_leaves ** 2 * len(np.unique(arrays.feature))
+
+    assert leaf_minimizer.minimize_class_terms(arrays, tree.leaf_store, max_size=size - 1) is tree.leaf_store
+    assert leaf_minimizer.minimize_class_terms(arrays, tree.leaf_store, max_size=size) is not tree.leaf_store
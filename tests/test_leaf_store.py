@@ -0,0 +1,30 @@
+import numpy as np
+
+from conftest import build_tree
+
+
+def test_paths_as_scikit_decision_paths(digits, decision_tree):
+    # the path of the leaf reached by the sample has the same length as its scikit decision path (without the leaf)
+    # and all its comparisions give the stored directions
+    tree = build_tree(decision_tree, digits)
+    leaf_store = tree.leaf_store
+    leaves_ids = tree.apply(digits.test_data)
+    scikit_path_lengths = np.asarray(decision_tree.decision_path(digits.test_data).sum(axis=1)).ravel() - 1
+
+    assert np.array_equal(leaf_store.path_lengths[leaves_ids], scikit_path_lengths)
+    for sample, leaf_id in zip(digits.test_codes, leaves_ids):
+        split_ids, directions = leaf_store.path(leaf_id)
+        results = sample[tree.arrays.feature[split_ids]] > tree.arrays.threshold_code[split_ids]
+        assert np.array_equal(results, directions.astype(bool))
+
+
+def test_classes_and_distributions_of_scikit(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+    tree_with_distributions = build_tree(decision_tree, digits)
+    tree_with_distributions.build(decision_tree, flag_keep_class_distributions=True)
+    scikit_leaves = np.flatnonzero(decision_tree.tree_.children_left == -1)
+    distributions = decision_tree.tree_.value[scikit_leaves, 0, :]
+
+    assert np.array_equal(tree.leaf_store.classes, np.argmax(distributions, axis=1))
+    assert tree.leaf_store.class_distributions is None
+    assert np.allclose(tree_with_distributions.leaf_store.class_distributions, distributions)
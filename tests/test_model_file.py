@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+
+from decision_trees.vhdl_generators.model_file import save_model, load_model
+from decision_trees.vhdl_generators.rom_tree import RomTree
+from decision_trees.vhdl_generators.threshold_encoder import ThresholdEncoding
+
+from conftest import build_tree, build_forest, scikit_votes
+
+
+def test_tree_round_trip(digits, decision_tree, tmp_path):
+    tree = build_tree(decision_tree, digits, number_of_pipeline_stages=2,
+                      threshold_encoding=ThresholdEncoding.THERMOMETER)
+    tree.minimize()
+    tree.number_of_lanes = 2
+    path = str(tmp_path / "tree")
+
+    save_model(tree, path)
+    loaded_tree = load_model(path)
+
+    assert np.array_equal(loaded_tree.predict(digits.test_data), decision_tree.predict(digits.test_data))
+    assert np.array_equal(loaded_tree.predict_hardware(digits.test_codes), decision_tree.predict(digits.test_data))
+    assert loaded_tree.vhdl_hash() == tree.vhdl_hash()
+    assert (loaded_tree.number_of_pipeline_stages, loaded_tree.threshold_encoding, loaded_tree.number_of_lanes) \
+        == (2, ThresholdEncoding.THERMOMETER, 2)
+
+
+def test_forest_round_trip(digits, random_forest, tmp_path):
+    forest = build_forest(random_forest, digits, flag_shared_comparators=True, vote_fan_in=3,
+                          flag_shared_subtrees=True)
+    path = str(tmp_path / "forest")
+
+    save_model(forest, path)
+    loaded_forest = load_model(path)
+
+    assert np.array_equal(loaded_forest.predict_votes(digits.test_data), scikit_votes(random_forest,
+                                                                                      digits.test_data))
+    assert (loaded_forest.flag_shared_comparators, loaded_forest.flag_shared_subtrees, loaded_forest.vote_fan_in) \
+        == (True, True, 3)
+
+
+def test_rom_forest_round_trip(digits, random_forest, tmp_path):
+    forest = build_forest(random_forest, digits)
+    forest.use_rom_architecture(2)
+    path = str(tmp_path / "forest")
+
+    save_model(forest, path)
+    loaded_forest = load_model(path)
+
+    assert all(isinstance(tree, RomTree) for tree in loaded_forest.random_forest)
+    assert [tree.vhdl_hash() for tree in loaded_forest.random_forest] == [tree.vhdl_hash()
+                                                                          for tree in forest.random_forest]
+    assert loaded_forest.latency == forest.latency
+
+
+def test_saving_replaces_the_model(digits, decision_tree, random_forest, tmp_path):
+    path = str(tmp_path / "model")
+
+    save_model(build_forest(random_forest, digits), path)
+    save_model(build_tree(decision_tree, digits), path)
+
+    # only the new model is left, without the temporary directories
+    assert os.listdir(str(tmp_path)) == ["model"]
+    assert np.array_equal(load_model(path).predict(digits.test_data), decision_tree.predict(digits.test_data))
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from decision_trees.vhdl_generators.parallel_predict import split_into_chunks
+
+from conftest import build_forest, scikit_votes
+
+
+@pytest.mark.parametrize("flag_use_processes", [False, True], ids=["threads", "processes"])
+def test_parallel_votes_as_scikit(digits, random_forest, flag_use_processes):
+    forest = build_forest(random_forest, digits)
+    votes = scikit_votes(random_forest, digits.test_data)
+
+    assert np.array_equal(forest.predict_votes(digits.test_data, 3, flag_use_processes), votes)
+    assert np.array_equal(forest.predict(digits.test_codes, 2, flag_use_processes), np.argmax(votes, axis=1))
+
+
+def test_split_into_chunks():
+    assert split_into_chunks(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert split_into_chunks(2, 4) == [(0, 1), (1, 2)]
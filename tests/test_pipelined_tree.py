@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+
+from conftest import build_tree
+
+
+@pytest.mark.parametrize("number_of_pipeline_stages", [1, 2, 3])
+def test_pipelined_tree_as_scikit(digits, decision_tree, number_of_pipeline_stages):
+    tree = build_tree(decision_tree, digits, number_of_pipeline_stages=number_of_pipeline_stages)
+
+    result = simulate(tree, digits.test_data, expected=decision_tree.predict(digits.test_data))
+
+    assert result.number_of_mismatches == 0
+    # the comparators and each of the stages of decideClass are registered
+    assert tree.latency == number_of_pipeline_stages + 1
+    assert result.flag_timing_as_declared and result.latency == tree.latency
+
+
+def test_pipelined_tree_vhdl(digits, decision_tree, tmp_path):
+    paths = []
+    for number_of_pipeline_stages in (1, 3):
+        tree = build_tree(decision_tree, digits, number_of_pipeline_stages=number_of_pipeline_stages)
+        path = tmp_path / str(number_of_pipeline_stages)
+        path.mkdir()
+        tree.create_vhdl_file(str(path))
+        paths.append(path / "tree.vhd")
+
+    assert paths[0].read_text() != paths[1].read_text()
+    assert np.array_equal(tree.predict_hardware(digits.test_codes), decision_tree.predict(digits.test_data))
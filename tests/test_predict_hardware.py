@@ -0,0 +1,25 @@
+import numpy as np
+
+from conftest import build_tree
+
+
+def test_predict_hardware_as_scikit(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+
+    assert np.array_equal(tree.predict_hardware(digits.test_data), decision_tree.predict(digits.test_data))
+
+
+def test_predict_hardware_as_one_sample_model(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+    test_data = digits.test_data[:50]
+
+    expected = [tree._predict_one_sample(sample) for sample in test_data]
+
+    assert np.array_equal(tree.predict_hardware(test_data), expected)
+
+
+def test_apply_hardware_matches_one_leaf(digits, decision_tree):
+    # the paths of the leaves do not overlap, so every sample matches exactly the leaf reached by the traversal
+    tree = build_tree(decision_tree, digits)
+
+    assert np.array_equal(tree.apply_hardware(digits.test_data), tree.apply(digits.test_data))
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+
+from conftest import build_tree, build_forest, scikit_votes
+
+
+def test_compiled_tree_as_scikit(digits, decision_tree, tmp_path):
+    tree = build_tree(decision_tree, digits)
+    module = tree.compile_predictor(str(tmp_path))
+    expected = decision_tree.predict(digits.test_data)
+
+    assert np.array_equal(module.predict(digits.test_data), expected)
+    assert [module.predict_one_sample(sample) for sample in digits.test_data[:50]] == expected[:50].tolist()
+
+
+def test_compiled_forest_as_scikit_votes(digits, random_forest, tmp_path):
+    forest = build_forest(random_forest, digits)
+    module = forest.compile_predictor(str(tmp_path))
+    votes = scikit_votes(random_forest, digits.test_data)
+
+    assert np.array_equal(module.predict(digits.test_data), np.argmax(votes, axis=1))
+    assert np.array_equal(module.predict_trees(digits.test_data), forest.predict_trees(digits.test_data))
+
+
+def test_compiled_module_is_cached(digits, decision_tree, tmp_path):
+    tree = build_tree(decision_tree, digits)
+    tree.compile_predictor(str(tmp_path))
+    files = os.listdir(str(tmp_path))
+
+    tree.compile_predictor(str(tmp_path))
+
+    assert os.listdir(str(tmp_path)) == files and len(files) == 1
@@ -0,0 +1,20 @@
+import numpy as np
+
+from decision_trees.vhdl_generators.quick_scorer import QuickScorer
+
+from conftest import build_forest
+
+
+def test_predict_trees_as_scikit(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    expected = np.stack([tree.predict(digits.test_data) for tree in random_forest.estimators_], axis=1)
+
+    assert np.array_equal(QuickScorer(forest.random_forest).predict_trees(digits.test_data), expected)
+
+
+def test_apply_as_the_trees(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    expected = np.stack([tree.apply(digits.test_data) for tree in forest.random_forest], axis=1)
+
+    # a small block of samples is used, so the samples are processed in several blocks
+    assert np.array_equal(QuickScorer(forest.random_forest).apply(digits.test_data, block_memory=4096), expected)
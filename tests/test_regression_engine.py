@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+
+from decision_trees.utils.constants import ClassifierType, get_classifier, is_regressor
+
+from conftest import build_tree, build_forest
+
+
+def test_regression_forest_as_scikit(digits, regression_forest):
+    forest = build_forest(regression_forest, digits)
+    expected = regression_forest.predict(digits.test_data)
+
+    assert forest.flag_regression
+    # the values of the leaves are stored as float32
+    assert np.allclose(forest.predict(digits.test_data), expected, rtol=1e-5)
+    assert np.allclose(forest.predict(digits.test_codes), expected, rtol=1e-5)
+    assert np.array_equal(forest.predict_mean(digits.test_data), forest.predict(digits.test_data))
+
+
+def test_shared_comparators_regression_forest_as_scikit(digits, regression_forest):
+    forest = build_forest(regression_forest, digits, flag_shared_comparators=True)
+
+    assert np.allclose(forest.predict(digits.test_codes), regression_forest.predict(digits.test_data), rtol=1e-5)
+    # the leaves of the subtree pool are the classes, local to each of the regression trees
+    with pytest.raises(ValueError):
+        build_forest(regression_forest, digits, flag_shared_comparators=True, flag_shared_subtrees=True)
+
+
+@pytest.mark.parametrize("flag_use_processes", [False, True])
+def test_parallel_regression_as_serial(digits, regression_forest, flag_use_processes):
+    forest = build_forest(regression_forest, digits)
+
+    assert np.array_equal(forest.predict(digits.test_data, n_jobs=3, flag_use_processes=flag_use_processes),
+                          forest.predict(digits.test_data))
+
+
+def test_regression_tree_as_scikit(digits, regression_tree):
+    tree = build_tree(regression_tree, digits)
+
+    assert tree.flag_regression
+    assert np.allclose(tree.predict(digits.test_data), regression_tree.predict(digits.test_data), rtol=1e-5)
+    assert np.allclose(tree.predict_hardware(digits.test_codes), regression_tree.predict(digits.test_data),
+                       rtol=1e-5)
+
+
+def test_classifiers_and_regressors_are_not_mixed(digits, random_forest, regression_forest, decision_tree):
+    with pytest.raises(ValueError):
+        build_forest(random_forest, digits).predict_mean(digits.test_data)
+    with pytest.raises(ValueError):
+        build_forest(regression_forest, digits).predict_votes(digits.test_data)
+    with pytest.raises(ValueError):
+        build_tree(decision_tree, digits).predict_fixed_point(digits.test_data)
+
+
+def test_regressors_types():
+    assert isinstance(get_classifier(ClassifierType.DECISION_TREE_REGRESSOR), DecisionTreeRegressor)
+    assert is_regressor(ClassifierType.DECISION_TREE_REGRESSOR) and is_regressor(ClassifierType.RANDOM_FOREST_REGRESSOR)
+    assert not is_regressor(ClassifierType.DECISION_TREE) and not is_regressor(ClassifierType.RANDOM_FOREST)
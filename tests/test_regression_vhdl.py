@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+from decision_trees.vhdl_generators.model_file import save_model, load_model
+
+from conftest import build_tree, build_forest
+
+
+def test_regression_tree_as_scikit(digits, regression_tree):
+    tree = build_tree(regression_tree, digits, number_of_bits_per_leaf_value=12)
+    expected = regression_tree.predict(digits.test_data)
+
+    result = simulate(tree, digits.test_data)
+
+    assert np.allclose(tree.predict(digits.test_data), expected)
+    # the values of the leaves are rounded to the nearest fixed point code
+    assert np.all(np.abs(tree.predict_fixed_point(digits.test_data) - expected)
+                  <= 2.0 ** -(tree.number_of_fraction_bits + 1))
+    assert result.number_of_mismatches == 0 and result.flag_timing_as_declared
+    assert np.array_equal(result.outputs, tree.predict_output_codes(digits.test_data))
+
+
+@pytest.mark.parametrize("number_of_trees", [4, 7])
+def test_regression_forest_as_scikit(digits, regression_forest, number_of_trees):
+    # the average of 4 trees is a shift, of 7 trees a multiplication
+    forest = build_forest(regression_forest, digits)
+    forest.set_trees(forest.random_forest[:number_of_trees])
+    expected = np.mean([tree.predict(digits.test_data) for tree in regression_forest.estimators_[:number_of_trees]],
+                       axis=0)
+
+    result = simulate(forest, digits.test_data)
+
+    assert np.allclose(forest.predict(digits.test_data), expected)
+    # rounding of the leaf values and of the average, each below one least significant bit
+    assert np.all(np.abs(forest.predict_fixed_point(digits.test_data) - expected)
+                  < 2.0 ** -(forest.number_of_fraction_bits - 1))
+    assert result.number_of_mismatches == 0 and result.flag_timing_as_declared
+    assert (forest.average_multiplier()[0] == 1) == (number_of_trees == 4)
+
+
+@pytest.mark.parametrize("flag_shared_comparators", [False, True])
+def test_regression_forest_vhdl(digits, regression_forest, flag_shared_comparators, tmp_path):
+    forest = build_forest(regression_forest, digits, flag_shared_comparators=flag_shared_comparators,
+                          number_of_bits_per_leaf_value=10)
+
+    forest.create_vhdl_file(str(tmp_path))
+    result = simulate(forest, digits.test_data)
+
+    assert "out std_logic_vector(10-1 downto 0)" in (tmp_path / "forest.vhd").read_text()
+    assert result.number_of_mismatches == 0 and result.flag_timing_as_declared
+
+
+def test_regression_forest_round_trip(digits, regression_forest, tmp_path):
+    forest = build_forest(regression_forest, digits, number_of_bits_per_leaf_value=12)
+    path = str(tmp_path / "forest")
+
+    save_model(forest, path)
+    loaded_forest = load_model(path)
+
+    assert np.array_equal(loaded_forest.predict(digits.test_data), forest.predict(digits.test_data))
+    assert np.array_equal(loaded_forest.predict_output_codes(digits.test_data),
+                          forest.predict_output_codes(digits.test_data))
+    assert loaded_forest.number_of_bits_per_leaf_value == 12
@@ -0,0 +1,48 @@
+import numpy as np
+
+from conftest import build_tree, build_forest
+
+
+def _scikit_comparisions(decision_tree, number_of_bits: int) -> set:
+    # (feature, code) of the splits of the scikit tree that need a comparator (code inside the range of the features)
+    tree_ = decision_tree.tree_
+    splits = np.flatnonzero(tree_.children_left != -1)
+    codes = np.floor(tree_.threshold[splits] * (1 << number_of_bits)).astype(np.int64)
+    return {(int(feature), int(code)) for feature, code in zip(tree_.feature[splits], codes)
+            if 0 <= code < (1 << number_of_bits) - 1}
+
+
+def test_tree_comparators_of_scikit(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+    estimate = tree.estimate_resources()
+    tree_ = decision_tree.tree_
+    splits = np.flatnonzero(tree_.children_left != -1)
+    codes = np.floor(tree_.threshold[splits] * (1 << digits.number_of_bits))
+    max_code = (1 << digits.number_of_bits) - 1
+
+    assert estimate.number_of_comparators == np.count_nonzero((codes >= 0) & (codes < max_code))
+    assert estimate.latency == tree.latency and estimate.luts > 0
+
+
+def test_pipeline_stages_add_registers(digits, decision_tree):
+    estimates = [build_tree(decision_tree, digits, number_of_pipeline_stages=stages).estimate_resources()
+                 for stages in (1, 2, 3)]
+
+    assert [estimate.latency for estimate in estimates] == [2, 3, 4]
+    assert estimates[0].register_bits < estimates[1].register_bits < estimates[2].register_bits
+
+
+def test_forest_shared_comparators_of_scikit(digits, random_forest):
+    forest = build_forest(random_forest, digits, flag_shared_comparators=True)
+    comparisions = set().union(*(_scikit_comparisions(tree, digits.number_of_bits)
+                                 for tree in random_forest.estimators_))
+
+    estimate = forest.estimate_resources()
+
+    assert estimate.number_of_comparators == len(comparisions)
+    # the trees are only the decideClass processes, so their pipeline stages are not used
+    for tree in forest.random_forest:
+        tree.number_of_pipeline_stages = 3
+    stages_estimate = forest.estimate_resources()
+    assert (stages_estimate.register_bits, stages_estimate.luts, stages_estimate.latency) \
+        == (estimate.register_bits, estimate.luts, estimate.latency)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from decision_trees.vhdl_generators import rom_tree
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+from decision_trees.vhdl_generators.rom_tree import RomTree
+
+from conftest import build_tree, build_forest, scikit_votes
+
+
+@pytest.mark.parametrize("number_of_interleaved_samples", [1, 2, 3])
+def test_rom_tree_as_scikit(digits, decision_tree, number_of_interleaved_samples):
+    tree = RomTree.from_tree(build_tree(decision_tree, digits), number_of_interleaved_samples)
+    expected = decision_tree.predict(digits.test_data)
+
+    result = simulate(tree, digits.test_data, expected=expected)
+
+    assert np.array_equal(tree.predict_hardware(digits.test_codes), expected)
+    assert result.number_of_mismatches == 0
+    assert result.flag_timing_as_declared and result.latency == tree.latency
+    assert tree.number_of_levels >= decision_tree.get_depth()
+    assert tree.number_of_levels % number_of_interleaved_samples == 1 % number_of_interleaved_samples
+    assert len(tree.rom_words()) == tree.rom_size
+
+
+def test_rom_forest_as_scikit(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    forest.use_rom_architecture(2)
+    # the ring takes a new sample only every few cycles, so a part of the samples is enough
+    test_data = digits.test_data[:100]
+    expected = np.argmax(scikit_votes(random_forest, test_data), axis=1)
+
+    result = simulate(forest, test_data, expected=expected)
+
+    assert all(isinstance(tree, RomTree) for tree in forest.random_forest)
+    assert len({tree.number_of_levels for tree in forest.random_forest}) == 1
+    assert result.number_of_mismatches == 0 and result.flag_timing_as_declared
+
+
+def test_select_architecture(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+    estimate = tree.estimate_resources()
+
+    assert rom_tree.select_architecture(tree, estimate.luts, estimate.register_bits) is tree
+    assert isinstance(rom_tree.select_architecture(tree, 1, 1), RomTree)
+
+
+def test_forest_select_architecture(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    estimate = forest.estimate_resources()
+
+    forest.select_architecture(estimate.luts, estimate.register_bits)
+    assert not any(isinstance(tree, RomTree) for tree in forest.random_forest)
+    # the ROM architecture is used by all the trees if any of them chooses it in its part of the resources
+    flag_rom = any(isinstance(rom_tree.select_architecture(tree, 1, 1), RomTree) for tree in forest.random_forest)
+    forest.select_architecture(len(forest.random_forest), len(forest.random_forest))
+    assert [isinstance(tree, RomTree) for tree in forest.random_forest] == [flag_rom] * len(forest.random_forest)
@@ -0,0 +1,51 @@
+import numpy as np
+
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+from decision_trees.vhdl_generators.subtree_pool import SubtreePool
+
+from conftest import build_forest, scikit_votes
+
+
+def test_predict_trees_as_scikit(digits, random_forest):
+    subtree_pool = SubtreePool(build_forest(random_forest, digits).random_forest)
+    expected = np.stack([tree.predict(digits.test_data) for tree in random_forest.estimators_], axis=1)
+
+    assert np.array_equal(subtree_pool.predict_trees(digits.test_data), expected)
+    assert np.array_equal(subtree_pool.predict_trees(digits.test_codes), expected)
+
+
+def test_unique_splits(digits, random_forest):
+    subtree_pool = SubtreePool(build_forest(random_forest, digits).random_forest)
+    number_of_scikit_splits = sum(int(np.count_nonzero(tree.tree_.children_left != -1))
+                                  for tree in random_forest.estimators_)
+    keys = np.stack([subtree_pool.feature, subtree_pool.threshold_code, subtree_pool.children_left,
+                     subtree_pool.children_right], axis=1)
+    splits = np.arange(subtree_pool.number_of_splits)
+
+    assert subtree_pool.number_of_splits_in_trees == number_of_scikit_splits
+    assert subtree_pool.sharing_ratio == number_of_scikit_splits / subtree_pool.number_of_splits >= 1
+    assert len(np.unique(keys, axis=0)) == subtree_pool.number_of_splits
+    # children of the splits are the leaves or the splits with the lower IDs
+    for children in (subtree_pool.children_left, subtree_pool.children_right):
+        assert np.all((children < splits) | (children >= subtree_pool.number_of_splits))
+
+
+def test_identical_trees_are_shared(digits, random_forest):
+    trees = build_forest(random_forest, digits).random_forest
+    subtree_pool = SubtreePool(trees)
+
+    doubled_subtree_pool = SubtreePool(trees + trees)
+
+    assert doubled_subtree_pool.number_of_splits == subtree_pool.number_of_splits
+    assert doubled_subtree_pool.sharing_ratio == 2 * subtree_pool.sharing_ratio
+    assert set(subtree_pool.roots) <= set(doubled_subtree_pool.shared_subtrees())
+
+
+def test_forest_with_shared_subtrees_as_scikit(digits, random_forest):
+    forest = build_forest(random_forest, digits, flag_shared_comparators=True, flag_shared_subtrees=True)
+    votes = scikit_votes(random_forest, digits.test_data)
+
+    result = simulate(forest, digits.test_data, expected=np.argmax(votes, axis=1))
+
+    assert np.array_equal(forest.predict_votes(digits.test_codes), votes)
+    assert result.number_of_mismatches == 0 and result.flag_timing_as_declared
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+
+from conftest import build_tree, build_forest, scikit_votes
+
+
+def _read_binary_lines(path, number_of_bits: int) -> np.ndarray:
+    # values of the lines of a stimulus file - the first value is in the least significant bits
+    lines = path.read_text().split()
+    return np.array([[int(line[start - number_of_bits:start or None], 2)
+                      for start in range(len(line), 0, -number_of_bits)] for line in lines])
+
+
+def test_stimulus_files_of_scikit(digits, decision_tree, tmp_path):
+    tree = build_tree(decision_tree, digits)
+
+    tree.create_stimulus_files(digits.test_data, str(tmp_path))
+    tree.create_testbench_file(str(tmp_path))
+
+    stimulus = _read_binary_lines(tmp_path / "tree_stimulus.txt", digits.number_of_bits)
+    expected = _read_binary_lines(tmp_path / "tree_expected.txt", 4)
+    assert np.array_equal(stimulus, digits.test_codes[:, tree.used_features])
+    assert np.array_equal(expected[:, 0], decision_tree.predict(digits.test_data))
+    testbench = (tmp_path / "tb_tree.vhd").read_text()
+    assert "tree_stimulus.txt" in testbench and "tree_expected.txt" in testbench
+
+
+def test_simulated_tree_as_scikit(digits, decision_tree):
+    tree = build_tree(decision_tree, digits, number_of_pipeline_stages=2)
+
+    result = simulate(tree, digits.test_data, expected=decision_tree.predict(digits.test_data))
+
+    assert result.number_of_mismatches == 0 and result.number_of_samples == len(digits.test_data)
+    assert result.flag_timing_as_declared and result.latency == result.declared_latency == tree.latency
+    # one sample in each cycle - the last one leaves the pipeline latency-1 cycles after it is sent
+    assert result.output_cycles[-1] == len(digits.test_data) + tree.latency - 2
+
+
+@pytest.mark.parametrize("enable_pattern", [[1, 0], [1, 1, 0]])
+def test_enable_pattern(digits, random_forest, enable_pattern):
+    forest = build_forest(random_forest, digits)
+    result = simulate(forest, digits.test_data)
+
+    gated_result = simulate(forest, digits.test_data, enable_pattern=enable_pattern)
+
+    assert gated_result.number_of_mismatches == 0 and gated_result.latency == result.latency
+    assert np.array_equal(gated_result.outputs, result.outputs)
+    assert gated_result.output_cycles[-1] > result.output_cycles[-1]
+    assert gated_result.samples_per_second(1e6) < result.samples_per_second(1e6)
+
+
+def test_simulation_finds_mismatches(digits, random_forest):
+    forest = build_forest(random_forest, digits)
+    expected = np.argmax(scikit_votes(random_forest, digits.test_data), axis=1)
+    expected[:3] = (expected[:3] + 1) % 10
+
+    result = simulate(forest, digits.test_data, expected=expected)
+
+    assert np.array_equal(result.mismatches, [0, 1, 2])
+    with pytest.raises(ValueError):
+        simulate(forest, digits.test_data, enable_pattern=[0])
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+from decision_trees.vhdl_generators.threshold_encoder import FeatureIntervals, ThresholdEncoding
+
+from conftest import build_tree, build_forest, scikit_votes
+
+
+@pytest.mark.parametrize("threshold_encoding", list(ThresholdEncoding), ids=lambda encoding: encoding.name)
+@pytest.mark.parametrize("number_of_pipeline_stages", [1, 2])
+def test_encoded_tree_as_scikit(digits, decision_tree, threshold_encoding, number_of_pipeline_stages):
+    tree = build_tree(decision_tree, digits, number_of_pipeline_stages=number_of_pipeline_stages,
+                      threshold_encoding=threshold_encoding)
+    expected = decision_tree.predict(digits.test_data)
+
+    result = simulate(tree, digits.test_data, expected=expected)
+
+    assert np.array_equal(tree.predict_hardware(digits.test_codes), expected)
+    assert result.number_of_mismatches == 0
+    assert result.flag_timing_as_declared and result.latency == tree.latency
+
+
+@pytest.mark.parametrize("threshold_encoding", [ThresholdEncoding.THERMOMETER, ThresholdEncoding.INTERVAL_INDEX],
+                         ids=lambda encoding: encoding.name)
+def test_encoded_forest_as_scikit(digits, random_forest, threshold_encoding):
+    forest = build_forest(random_forest, digits)
+    forest.set_threshold_encoding(threshold_encoding)
+
+    result = simulate(forest, digits.test_data, expected=np.argmax(scikit_votes(random_forest, digits.test_data),
+                                                                   axis=1))
+
+    assert result.number_of_mismatches == 0 and result.flag_timing_as_declared
+
+
+def test_split_results_of_the_comparisions(digits, decision_tree):
+    arrays = build_tree(decision_tree, digits).arrays
+    feature_intervals = FeatureIntervals(arrays.feature, arrays.threshold, arrays.threshold_code,
+                                         digits.number_of_bits)
+    expected = digits.test_codes[:, arrays.feature] > arrays.threshold_code
+
+    assert np.array_equal(feature_intervals.compute_split_results(digits.test_codes), expected)
+    assert np.array_equal(feature_intervals.compute_split_results(digits.test_data), expected)
+    # the interval of a value is the number of the thresholds of its feature lower than the value
+    indices = feature_intervals.interval_indices(digits.test_codes)
+    indptr = feature_intervals.indptr
+    for slot, feature in enumerate(feature_intervals.features):
+        thresholds = feature_intervals.threshold_codes[indptr[slot]:indptr[slot + 1]]
+        assert np.array_equal(indices[slot], (digits.test_codes[:, feature, None] > thresholds).sum(axis=1))
@@ -0,0 +1,20 @@
+import numpy as np
+
+from conftest import build_tree
+
+
+def test_predict_as_scikit(digits, decision_tree):
+    tree = build_tree(decision_tree, digits)
+
+    assert np.array_equal(tree.arrays.predict(digits.test_data), decision_tree.predict(digits.test_data))
+
+
+def test_apply_reaches_the_leaves_of_scikit(digits, decision_tree):
+    # leaves are numbered from left to right, as the leaves of the scikit tree in the order of their node IDs
+    tree = build_tree(decision_tree, digits)
+    scikit_leaves = np.flatnonzero(decision_tree.tree_.children_left == -1)
+
+    leaves_ids = tree.arrays.apply(digits.test_data)
+
+    assert tree.arrays.number_of_leaves == len(scikit_leaves)
+    assert np.array_equal(leaves_ids, np.searchsorted(scikit_leaves, decision_tree.apply(digits.test_data)))
@@ -0,0 +1,52 @@
+import os
+
+from decision_trees.vhdl_generators import tree as tree_module
+
+from conftest import build_tree, build_forest
+
+
+def _read_files(path) -> dict:
+    return {file_name: (path / file_name).read_text() for file_name in os.listdir(str(path))}
+
+
+def test_parallel_files_as_serial(digits, random_forest, tmp_path):
+    forest = build_forest(random_forest, digits)
+    serial_path = tmp_path / "serial"
+    parallel_path = tmp_path / "parallel"
+    serial_path.mkdir()
+    parallel_path.mkdir()
+
+    forest.create_vhdl_file(str(serial_path))
+    forest.create_vhdl_file(str(parallel_path), n_jobs=2)
+
+    files = _read_files(serial_path)
+    trees_files = [file_name for file_name in files if file_name.startswith("DECISION_TREE_")]
+    assert _read_files(parallel_path) == files
+    assert len(trees_files) == len({tree.vhdl_hash() for tree in forest.random_forest})
+
+
+def test_unchanged_trees_are_not_written_again(digits, random_forest, tmp_path):
+    forest = build_forest(random_forest, digits)
+    forest.create_vhdl_file(str(tmp_path))
+    modification_times = {file_name: os.stat(str(tmp_path / file_name)).st_mtime_ns
+                          for file_name in os.listdir(str(tmp_path)) if file_name.startswith("DECISION_TREE_")}
+
+    forest._trees_components = forest._create_trees_components()
+    assert forest._create_trees_vhdl_files(str(tmp_path), 2) == []
+    forest._trees_components = None
+    assert {file_name: os.stat(str(tmp_path / file_name)).st_mtime_ns
+            for file_name in modification_times} == modification_times
+
+
+def test_hash_of_the_vhdl(digits, decision_tree, monkeypatch):
+    tree = build_tree(decision_tree, digits)
+    vhdl_hash = tree.vhdl_hash()
+
+    # names are not a part of the hash, the parameters of the architecture are
+    tree.set_names("other", "other")
+    assert tree.vhdl_hash() == vhdl_hash
+    assert build_tree(decision_tree, digits, number_of_pipeline_stages=2).vhdl_hash() != vhdl_hash
+
+    # any change of the source of the generator changes the hashes
+    monkeypatch.setattr(tree_module, "_generator_sources_hashes", {type(tree): "changed source"})
+    assert tree.vhdl_hash() != vhdl_hash
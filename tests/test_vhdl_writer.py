@@ -0,0 +1,52 @@
+import functools
+import os
+
+import pytest
+
+from decision_trees.vhdl_generators import vhdl_writer
+
+from conftest import build_forest
+
+
+def test_indent(tmp_path):
+    path = str(tmp_path / "file.vhd")
+
+    with vhdl_writer.open_vhdl_file(path) as writer:
+        writer.line("a")
+        with writer.indent():
+            writer.line("b")
+            with writer.indent(2):
+                writer.line("c")
+        writer.line()
+
+    with open(path) as file_to_read:
+        assert file_to_read.read() == "a\n\tb\n\t\t\tc\n\n"
+
+
+def test_interrupted_file_is_not_left(tmp_path):
+    path = str(tmp_path / "file.vhd")
+
+    with pytest.raises(RuntimeError):
+        with vhdl_writer.open_vhdl_file(path) as writer:
+            writer.line("a")
+            raise RuntimeError()
+
+    assert os.listdir(str(tmp_path)) == []
+
+
+@pytest.mark.parametrize("buffer_size", [1, 4096])
+def test_buffer_size_does_not_change_the_files(digits, random_forest, tmp_path, monkeypatch, buffer_size):
+    forest = build_forest(random_forest, digits, flag_shared_comparators=True)
+    default_path = tmp_path / "default"
+    path = tmp_path / "buffered"
+    default_path.mkdir()
+    path.mkdir()
+
+    forest.create_vhdl_file(str(default_path))
+    monkeypatch.setattr(vhdl_writer, "open_vhdl_file",
+                        functools.partial(vhdl_writer.open_vhdl_file, buffer_size=buffer_size))
+    forest.create_vhdl_file(str(path))
+
+    assert sorted(os.listdir(str(path))) == sorted(os.listdir(str(default_path))) != []
+    for file_name in os.listdir(str(default_path)):
+        assert (path / file_name).read_text() == (default_path / file_name).read_text()
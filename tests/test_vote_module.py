@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from decision_trees.vhdl_generators.cycle_simulator import simulate
+
+from conftest import build_forest, scikit_votes
+
+
+@pytest.mark.parametrize("vote_fan_in, vote_latency", [(2, 7), (4, 4), (8, 3)])
+def test_vote_module_as_scikit(digits, random_forest, vote_fan_in, vote_latency):
+    # 7 trees and 10 classes - the adder trees and the comparator tree have ceil(log_fan_in(n)) levels
+    forest = build_forest(random_forest, digits, vote_fan_in=vote_fan_in)
+    expected = np.argmax(scikit_votes(random_forest, digits.test_data), axis=1)
+
+    result = simulate(forest, digits.test_data, expected=expected)
+
+    assert result.number_of_mismatches == 0
+    assert forest.vote_latency == vote_latency
+    assert result.flag_timing_as_declared and result.latency == forest.latency
+
+
+@pytest.mark.parametrize("flag_shared_comparators", [False, True])
+def test_vote_module_latency(digits, random_forest, flag_shared_comparators):
+    forest = build_forest(random_forest, digits, flag_shared_comparators=flag_shared_comparators)
+
+    result = simulate(forest, digits.test_data)
+
+    assert result.number_of_mismatches == 0
+    assert result.latency == forest.latency == forest._trees_latency + forest.vote_latency
+    assert result.samples_per_cycle > 0.5
+
+
+def test_vote_fan_in_has_to_be_at_least_2(digits):
+    with pytest.raises(ValueError):
+        build_forest(None, digits, vote_fan_in=1)